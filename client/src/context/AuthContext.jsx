@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
+import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
 
 const AuthContext = createContext();
 
@@ -16,8 +16,32 @@ export function AuthProvider({ children }) {
     localStorage.removeItem('refreshToken');
   }, []);
 
-  const refreshAccessToken = useCallback(async () => {
-    if (!refreshToken) {
+  // Tokens are shared by every tab through localStorage; follow the changes other tabs make
+  useEffect(() => {
+    const onStorage = (event) => {
+      if (event.key === 'accessToken') setToken(event.newValue);
+      if (event.key === 'refreshToken') setRefreshToken(event.newValue);
+      if (event.key === 'user') setUser(event.newValue ? JSON.parse(event.newValue) : null);
+    };
+    window.addEventListener('storage', onStorage);
+    return () => window.removeEventListener('storage', onStorage);
+  }, []);
+
+  // Adopt the pair another tab rotated to, if it differs from presentedToken
+  const adoptStoredTokens = useCallback((presentedToken) => {
+    const storedRefreshToken = localStorage.getItem('refreshToken');
+    if (!storedRefreshToken || storedRefreshToken === presentedToken) return null;
+    const storedAccessToken = localStorage.getItem('accessToken');
+    setToken(storedAccessToken);
+    setRefreshToken(storedRefreshToken);
+    return storedAccessToken;
+  }, []);
+
+  const rotateTokens = useCallback(async () => {
+    // Each refresh token works once, so never present one another tab has already rotated
+    const presentedToken = localStorage.getItem('refreshToken') || refreshToken;
+    if (presentedToken !== refreshToken) return adoptStoredTokens(refreshToken);
+    if (!presentedToken) {
       logout();
       return null;
     }
@@ -25,7 +49,7 @@ export function AuthProvider({ children }) {
       const res = await fetch(`${process.env.REACT_APP_API_BASE_URL}/api/auth/refresh-token`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ token: refreshToken }),
+        body: JSON.stringify({ token: presentedToken }),
       });
 
       if (res.ok) {
@@ -38,16 +62,29 @@ export function AuthProvider({ children }) {
           localStorage.setItem('refreshToken', data.refreshToken);
         }
         return data.accessToken;
-      } else {
-        logout();
-        return null;
       }
+      // Another tab may have won a race for the same token
+      const adopted = adoptStoredTokens(presentedToken);
+      if (adopted) return adopted;
+      logout();
+      return null;
     } catch (err) {
       console.error('Refresh token error:', err);
       logout();
       return null;
     }
-  }, [refreshToken, logout]);
+  }, [refreshToken, logout, adoptStoredTokens]);
+
+  // One refresh at a time per tab: concurrent 401s wait for the same one
+  const refreshInFlight = useRef(null);
+  const refreshAccessToken = useCallback(() => {
+    if (!refreshInFlight.current) {
+      refreshInFlight.current = rotateTokens().finally(() => {
+        refreshInFlight.current = null;
+      });
+    }
+    return refreshInFlight.current;
+  }, [rotateTokens]);
 
   // Auto-refresh token shortly before expiry (optional)
   useEffect(() => {
@@ -65,9 +102,10 @@ export function AuthProvider({ children }) {
     if (!payload || !payload.exp) return;
 
     const expiresInMs = payload.exp * 1000 - Date.now();
+    // Spread over 30 s so tabs sharing a token do not all refresh at once; the first one updates the rest
     const timeoutId = setTimeout(() => {
       refreshAccessToken();
-    }, expiresInMs - 60000);
+    }, expiresInMs - 60000 - Math.random() * 30000);
 
     return () => clearTimeout(timeoutId);
   }, [token, refreshAccessToken]);
@@ -3,22 +3,51 @@ import json
 import os
 import math
 import logging
+import threading
+import bisect
+import hashlib
+from functools import lru_cache, wraps
+import time
 from datetime import datetime, timezone, timedelta
 import base64
-from flask_jwt_extended import create_access_token
+import numpy as np
+from flask_jwt_extended import create_access_token, create_refresh_token
 from flask import Flask, request, jsonify, make_response, g
+from flask.ctx import _AppCtxGlobals
 from flask_cors import CORS
 from flask_pymongo import PyMongo
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import scrypt
 import bcrypt
 from bson import ObjectId
 from dotenv import load_dotenv
 from pathlib import Path
-from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
-from free_access import require_trial_access
+from flask_jwt_extended import JWTManager, decode_token, jwt_required, get_jwt_identity
+from free_access import entitlement_claims, require_trial_access, require_admin
 from utils.password_utils import verify_password
+from spatial_index import (
+    StationGrid, StationIndex, StationMatrix, build_province_indexes, chord_to_km, geohash, to_unit_vector,
+)
+from idf_tables import build_curve_tables
+from data_loader import (
+    DATA_DIR, dataset_fingerprint, province_dirs, read_annual_maxima, read_idf_coefficients, read_provinces,
+)
+from dataset_snapshot import SNAPSHOT_PATH, open_snapshot
+from station_names import StationNameIndex, normalize_name
+from gumbel import GumbelEngine, parse_return_periods, return_period_key
+from idf_equation import MAX_EVALUATIONS, IDFEquation
+from hyetograph import METHODS as HYETOGRAPH_METHODS, build_hyetographs, validate_storm
+from rational import IntensityTable, parse_catchments, peak_flows, validate_catchments
+from sewer import IntensityCurve, SewerNetwork
+from idf_raster import RASTER_PATH, open_raster
+from idw import CELL_RADIUS_KM, DEFAULT_NEIGHBOURS, DEFAULT_POWER, MAX_NEIGHBOURS, MAX_POWER, blend_curves, quantize
+from idf_tables import RETURN_PERIODS
+from ttl_cache import TTLCache
+from db_indexes import ensure_indexes
+from pymongo.errors import DuplicateKeyError
+from refresh_tokens import DEFAULT_CAPACITY as DEFAULT_REFRESH_REVOCATION_CAPACITY, RefreshTokenRevocations
+from password_pool import DEFAULT_MAX_QUEUED, DEFAULT_WORKERS, PasswordPool, PasswordPoolBusy
+from password_hashes import DEFAULT_METHOD as DEFAULT_PASSWORD_HASH_METHOD, hash_password, method_prefix
 
 logging.basicConfig(level=logging.DEBUG)
 logging.getLogger("pymongo").setLevel(logging.WARNING)
@@ -29,63 +58,443 @@ load_dotenv(dotenv_path=env_path)
 IDF_DATA = {}
 STATIONS_DATA_BY_PROVINCE = {}
 STATIONS_DATA = []
+# Processed /api/idf/curves payloads, computed once in load_data()
+IDF_CURVES = {}
+IDF_CURVES_JSON = {}
+# Gumbel refits of the Table 1 annual maxima for arbitrary return periods; the
+# series are read on the first request and fitted parameters cached per station
+GUMBEL_ENGINE = GumbelEngine(lambda: read_annual_maxima(DATA_DIR))
+# Table 3 R = A*T^B coefficients for intensities at any duration, read on first use
+IDF_EQUATION = IDFEquation(lambda: read_idf_coefficients(DATA_DIR))
+# Spatial indexes over IDF-capable stations only, keyed by province code
+IDF_STATION_INDEX_BY_PROVINCE = {}
+IDF_STATION_INDEX = StationIndex([])
+IDF_STATION_MATRIX = StationMatrix([], [])
+MAX_BATCH_POINTS = 5000
+# /api/nearest-station answers keyed by (province, normalized city name, geohash cell of the point)
+NEAREST_STATION_CACHE = TTLCache(
+    maxsize=int(os.getenv('NEAREST_STATION_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('NEAREST_STATION_CACHE_TTL', '3600')),
+)
+NEAREST_STATION_CACHE_PRECISION = int(os.getenv('NEAREST_STATION_CACHE_PRECISION', '7'))
+# User documents by id; the TTL bounds how long a change made outside this process can go unseen
+USER_CACHE = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '60')),
+)
+# Access tokens carry role and trial_end claims (free_access.entitlement_claims). Refreshing
+# re-reads them from the user document (through USER_CACHE), so an entitlement change reaches a
+# client within this TTL plus USER_CACHE_TTL; /api/admin/tokens/revoke ends its tokens sooner,
+# but only on the worker that handles that request (see REVOKED_TOKENS)
+ACCESS_TOKEN_MINUTES = int(os.getenv('ACCESS_TOKEN_MINUTES', '15'))
+REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_DAYS', '30'))
+# User id -> revocation time; an entry only has to outlive the tokens issued before it.
+# In-memory, so a revocation applies to the worker process that received it.
+REVOKED_TOKENS = TTLCache(maxsize=int(os.getenv('REVOKED_TOKENS_SIZE', '100000')), ttl=REFRESH_TOKEN_DAYS * 86400)
+# Refresh jti -> the pair it was just rotated into. Two tabs, or two requests that both got a 401,
+# often present the same refresh token; within this window the later ones get the same pair.
+# In-memory, so on another worker such a request gets a 401 instead.
+ROTATED_REFRESH_TOKENS = TTLCache(
+    maxsize=int(os.getenv('ROTATED_REFRESH_TOKENS_SIZE', '10000')),
+    ttl=float(os.getenv('REFRESH_REUSE_GRACE_SECONDS', '30')),
+)
+# Fields each auth query reads. USER_FIELDS is what g.user and /api/user/profile expose,
+# so cached user documents never hold password hashes.
+USER_FIELDS = {'username': 1, 'role': 1, 'trial_active': 1, 'trial_start': 1, 'trial_end': 1,
+               'trial_days': 1, 'trial_duration_days': 1}
+LOGIN_FIELDS = {'password_hash': 1, 'role': 1, 'trial_start': 1, 'trial_duration_days': 1}
+# Create the indexes in db_indexes.INDEXES when the app starts
+ENSURE_INDEXES = os.getenv('ENSURE_INDEXES', '1') == '1'
+
+# Used and revoked refresh token jtis: a Bloom filter in memory, synced with MongoDB in the background
+REFRESH_REVOCATIONS = RefreshTokenRevocations(
+    lambda: mongo.db.revoked_refresh_tokens,
+    capacity=int(os.getenv('REFRESH_REVOCATION_CAPACITY', str(DEFAULT_REFRESH_REVOCATION_CAPACITY))),
+    sync_seconds=float(os.getenv('REFRESH_REVOCATION_SYNC_SECONDS', '30')),
+)
+
+# Password checks run in worker processes; logins beyond workers + max queued get a 503
+PASSWORD_POOL = PasswordPool(
+    workers=int(os.getenv('PASSWORD_POOL_WORKERS', str(DEFAULT_WORKERS))),
+    max_queued=int(os.getenv('PASSWORD_POOL_MAX_QUEUED', str(DEFAULT_MAX_QUEUED))),
+    timeout=float(os.getenv('PASSWORD_VERIFY_TIMEOUT', '5')),
+)
+# werkzeug method string for new hashes; a login with a hash made any other way upgrades it
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+method_prefix(PASSWORD_HASH_METHOD)  # fail at startup on a method werkzeug cannot make
+
+# Rational Method depth tables, aligned with IDF_STATION_MATRIX.stations
+RATIONAL_TABLE = IntensityTable([], lambda station: None)
+RATIONAL_TABLE_LOCK = threading.Lock()
+NDJSON_CHUNK_ROWS = 2000
+# STATIONS_DATA only grows between load_data() calls, so a position handed out by any index stays valid.
+# STATION_ORDER_KEYS[position] is (source folder, index in its file), the order /api/stations pages
+# in and its cursor, the same in every worker whatever order lazy mode loaded provinces in.
+STATION_ORDER_KEYS = []
+# Viewport grid into STATIONS_DATA, and the page order for /api/stations: (positions, keys) for
+# all stations and per province code. Rebound, never mutated, when a province loads.
+STATIONS_GRID = StationGrid([])
+STATION_PAGE_ORDER = (([], []), {})
+STATIONS_PAGE_LIMIT = 1000
+# Accent-folding n-gram index over station names (positions into STATIONS_DATA)
+STATION_NAME_INDEX = StationNameIndex([], lambda station: None)
+STATIONS_MAX_PAGE_LIMIT = 5000
+
+# 'eager' loads every province at import; 'lazy' maps the dataset snapshot and
+# loads a province's stations and IDF tables the first time a request needs it
+DATA_LOAD_MODE = os.getenv('DATA_LOAD_MODE', 'eager').lower()
+LAZY_SNAPSHOT = None
+LAZY_PROVINCE_LOCK = threading.Lock()
+LOADED_PROVINCES = set()
+IDF_STATION_PROVINCE = {}
+STATIONS_BY_PROVINCE_AND_ID = {}
+
+# Process pool size for reading province JSON files; 0 means one per CPU, 1 reads serially
+DATA_LOAD_WORKERS = int(os.getenv('DATA_LOAD_WORKERS', '0'))
+# Machine-readable summary of the last load_data() run, served on /api/admin/load-report
+LOAD_REPORT = {"provinces": {}}
+
+# Content hash of the loaded data files, used as the ETag of read-only endpoints.
+# Bump API_CACHE_VERSION whenever those responses change for the same data (shape or results).
+API_CACHE_VERSION = '2'
+DATASET_VERSION = None
+# Gridded IDF depths (idf_raster.py), None until built for the current data
+IDF_RASTER = None
+
+class LazyUserGlobals(_AppCtxGlobals):
+    """
+    flask.g whose 'token_claims' and 'user' are only looked up on first
+    access, through the g.<name>_loader set by load_user.
+    """
+    LAZY_ATTRIBUTES = ('token_claims', 'user')
+
+    def __getattr__(self, name):
+        if name in self.LAZY_ATTRIBUTES:
+            loader = self.__dict__.pop(name + '_loader', None)
+            value = loader() if loader else None
+            setattr(self, name, value)
+            return value
+        return super().__getattr__(name)
+
+def revoke_user_tokens(user_id):
+    """Reject every token issued to the user before now, e.g. after their role or trial changed."""
+    # Whole seconds like iat, so a token issued later in the same second (a new login) still works
+    REVOKED_TOKENS.set(str(user_id), int(time.time()))
+
+def token_revoked(payload):
+    revoked_at = REVOKED_TOKENS.get(str(payload.get('sub')))
+    return revoked_at is not None and payload.get('iat', 0) < revoked_at
+
+def invalidate_user(user_id=None):
+    """Drop one cached user document (or all of them) after it changes."""
+    if user_id is None:
+        USER_CACHE.clear()
+    else:
+        USER_CACHE.pop(str(user_id))
 
-def load_data():
-    print("--- Starting data loading process ---")
-    loaded_provinces = []
-    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-    for province_code in os.listdir(DATA_DIR):
-        province_path = os.path.join(DATA_DIR, province_code)
-        if os.path.isdir(province_path):
-            stations_file_path = os.path.join(province_path, 'master_stations_enriched_validated.json')
-            corrected_idf_file_path = os.path.join(province_path, 'idf_data_by_station_corrected.json')
-            original_idf_file_path = os.path.join(province_path, 'idf_data_by_station.json')
+class StationStub(dict):
+    """Coordinates-only station used by the lazy global index until its province is loaded."""
 
-            try:
-                if os.path.exists(stations_file_path):
-                    with open(stations_file_path, 'r', encoding='utf-8') as f:
-                        stations = json.load(f)
-                        STATIONS_DATA_BY_PROVINCE[province_code] = stations
-                        STATIONS_DATA.extend(stations)
-                        print(f"Loaded {len(stations)} stations for {province_code}.")
-                else:
-                    print(f"Warning: Station data file not found for {province_code} at {stations_file_path}")
-                    continue
-
-                idf_file_path = None
-                if os.path.exists(corrected_idf_file_path):
-                    idf_file_path = corrected_idf_file_path
-                    print(f"Using corrected IDF data file for {province_code}.")
-                elif os.path.exists(original_idf_file_path):
-                    idf_file_path = original_idf_file_path
-                    print(f"Using original IDF data file for {province_code}.")
-                else:
-                    print(f"Warning: No IDF data file found for {province_code}")
-                    continue
+PROVINCE_CODES = {"BC", "AB", "SK", "MB", "ON", "QC", "NB", "NS", "PE", "NL", "YT", "NT", "NU"}
 
-                with open(idf_file_path, 'r', encoding='utf-8') as f:
-                    idf_data_raw = json.load(f)
+def extract_province_code(province_str):
+    # Whole words only: 'LEONARD CS   NB' must not match ON. Free-text fields end in the code.
+    if not isinstance(province_str, str):
+        return None
+    for word in reversed(re.findall(r'[A-Za-z]+', province_str)):
+        if word in PROVINCE_CODES:
+            return word
+    return None
+
+def station_province_code(station):
+    # Most files carry a free-text 'province' field; the QC master list uses 'provinceCode'
+    return extract_province_code(station.get('province', '')) or extract_province_code(station.get('provinceCode', ''))
+
+def build_station_indexes():
+    global IDF_STATION_INDEX, IDF_STATION_MATRIX
+    idf_stations_by_province = {}
+    idf_stations = []
+    idf_station_codes = []
+    for station in STATIONS_DATA:
+        code = station_province_code(station)
+        has_idf = str(station.get('stationId')) in IDF_DATA
+        if code:
+            # Provinces without IDF stations still get an (empty) index so
+            # lookups there do not silently fall back to other provinces
+            bucket = idf_stations_by_province.setdefault(code, [])
+            if has_idf:
+                bucket.append(station)
+        if has_idf:
+            idf_stations.append(station)
+            idf_station_codes.append(code)
+
+    IDF_STATION_INDEX_BY_PROVINCE.clear()
+    IDF_STATION_INDEX_BY_PROVINCE.update(build_province_indexes(idf_stations_by_province))
+    IDF_STATION_INDEX = StationIndex(idf_stations)
+    IDF_STATION_MATRIX = StationMatrix(idf_stations, idf_station_codes)
+    print(f"Built spatial index over {len(IDF_STATION_INDEX)} IDF stations in {len(IDF_STATION_INDEX_BY_PROVINCE)} provinces.")
+
+def add_stations(province_code, stations):
+    """Append one folder's stations; existing positions never move."""
+    STATION_ORDER_KEYS.extend((province_code, index) for index in range(len(stations)))
+    STATIONS_DATA.extend(stations)
+
+def page_order(positions):
+    """(positions, order keys) sorted by order key."""
+    positions = sorted(positions, key=STATION_ORDER_KEYS.__getitem__)
+    return positions, [STATION_ORDER_KEYS[p] for p in positions]
+
+def build_stations_grid():
+    global STATIONS_GRID, STATION_PAGE_ORDER
+    positions_by_province = {}
+    for position, station in enumerate(STATIONS_DATA):
+        positions_by_province.setdefault(station_province_code(station), []).append(position)
+    STATION_PAGE_ORDER = (
+        page_order(range(len(STATIONS_DATA))),
+        {code: page_order(positions) for code, positions in positions_by_province.items()},
+    )
+    STATIONS_GRID = StationGrid(STATIONS_DATA)
+
+def build_name_index():
+    global STATION_NAME_INDEX
+    STATION_NAME_INDEX = StationNameIndex(STATIONS_DATA, station_province_code)
+
+def province_report_entry(province_code, status, read_ms, stations=None, idf_data=None, **extra):
+    entry = {
+        "status": status,
+        "read_ms": round(read_ms, 2),
+        "stations": len(stations) if stations is not None else 0,
+        "idf_stations": len(idf_data) if idf_data is not None else 0,
+        "unparsed_idf_keys": [],
+    }
+    entry.update(extra)
+    LOAD_REPORT["provinces"][province_code] = entry
+    return entry
 
-                sample_key = next(iter(idf_data_raw))
-                if sample_key.isalnum():
-                    for station_id, idf_data in idf_data_raw.items():
-                        IDF_DATA[station_id] = idf_data
-                else:
-                    for long_key, idf_data in idf_data_raw.items():
-                        match = re.search(fr"_{province_code}_([0-9A-Z]+)", long_key)
-                        if match:
-                            station_id = match.group(1)
-                            IDF_DATA[station_id] = idf_data
-                        else:
-                            print(f"Warning: Could not parse station ID from key: {long_key}")
-
-                print(f"Loaded IDF data for {province_code}. Current total keys: {len(IDF_DATA)}")
-                loaded_provinces.append(province_code)
-
-            except json.JSONDecodeError as e:
-                print(f"ERROR: Failed to parse JSON data for {province_code}: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred while loading data for {province_code}: {e}")
+def load_provinces_from_json():
+    loaded_provinces = []
+    workers = DATA_LOAD_WORKERS if DATA_LOAD_WORKERS > 0 else (os.cpu_count() or 1)
+    LOAD_REPORT["workers"] = workers
+    for province_code, province, error, read_ms in read_provinces(province_dirs(DATA_DIR), workers):
+        if error:
+            print(f"ERROR: Failed to load data for {province_code}: {error}")
+            province_report_entry(province_code, "error", read_ms, error=error)
+            continue
+        if province is None:
+            print(f"Warning: Station data file not found for {province_code}")
+            province_report_entry(province_code, "missing_stations_file", read_ms)
+            continue
+
+        stations = province['stations']
+        STATIONS_DATA_BY_PROVINCE[province_code] = stations
+        add_stations(province_code, stations)
+        print(f"Loaded {len(stations)} stations for {province_code}.")
+
+        if province['idf_data'] is None:
+            print(f"Warning: No IDF data file found for {province_code}")
+            province_report_entry(province_code, "missing_idf_file", read_ms, stations)
+            continue
+        print(f"Using IDF data file {os.path.basename(province['idf_file'])} for {province_code}.")
+
+        IDF_DATA.update(province['idf_data'])
+        for long_key in province['unparsed_keys']:
+            print(f"Warning: Could not parse station ID from key: {long_key}")
+        province_report_entry(
+            province_code, "loaded", read_ms, stations, province['idf_data'],
+            idf_file=os.path.basename(province['idf_file']),
+            unparsed_idf_keys=province['unparsed_keys'],
+        )
+
+        print(f"Loaded IDF data for {province_code}. Current total keys: {len(IDF_DATA)}")
+        loaded_provinces.append(province_code)
+    return loaded_provinces
+
+def load_provinces_from_snapshot(snapshot):
+    for province_code in snapshot.provinces:
+        start = time.perf_counter()
+        stations = snapshot.province_stations(province_code)
+        idf_data = snapshot.idf_data(province_code)
+        STATIONS_DATA_BY_PROVINCE[province_code] = stations
+        add_stations(province_code, stations)
+        IDF_DATA.update(idf_data)
+        province_report_entry(province_code, "loaded", (time.perf_counter() - start) * 1000, stations, idf_data)
+    return list(snapshot.provinces)
+
+def load_province_from_snapshot(province_code):
+    start = time.perf_counter()
+    stations = LAZY_SNAPSHOT.province_stations(province_code)
+    idf_data = LAZY_SNAPSHOT.idf_data(province_code)
+    curves, curves_json = build_curve_tables(idf_data)
+
+    # Publish the tables before the index so a reader never finds a station without its data
+    IDF_DATA.update(idf_data)
+    IDF_CURVES.update(curves)
+    IDF_CURVES_JSON.update(curves_json)
+    STATIONS_DATA_BY_PROVINCE[province_code] = stations
+    add_stations(province_code, stations)
+    for station in stations:
+        STATIONS_BY_PROVINCE_AND_ID.setdefault((province_code, str(station.get('stationId'))), station)
+    idf_stations = [s for s in stations if str(s.get('stationId')) in idf_data]
+    IDF_STATION_INDEX_BY_PROVINCE[province_code] = StationIndex(idf_stations)
+    build_stations_grid()
+    build_name_index()
+    province_report_entry(province_code, "loaded", (time.perf_counter() - start) * 1000, stations, idf_data)
+    print(f"Lazily loaded {len(stations)} stations and {len(idf_data)} IDF data sets for {province_code}.")
+
+def ensure_provinces_loaded(province_codes=None):
+    """In lazy mode, load the given provinces (all of them for None) exactly once; no-op in eager mode."""
+    if LAZY_SNAPSHOT is None:
+        return
+    known = LAZY_SNAPSHOT.provinces
+    codes = known if province_codes is None else [code for code in province_codes if code in known]
+    pending = [code for code in codes if code not in LOADED_PROVINCES]
+    if not pending:
+        return
+    with LAZY_PROVINCE_LOCK:
+        for code in pending:
+            if code not in LOADED_PROVINCES:
+                load_province_from_snapshot(code)
+                LOADED_PROVINCES.add(code)
+
+def materialize_station(station):
+    """Swap a lazy-index stub for the full station dict, loading its province if needed."""
+    if not isinstance(station, StationStub):
+        return station
+    ensure_provinces_loaded([station['province']])
+    return STATIONS_BY_PROVINCE_AND_ID[(station['province'], station['stationId'])]
+
+def init_lazy_data(snapshot):
+    global LAZY_SNAPSHOT, IDF_STATION_INDEX, IDF_STATION_MATRIX
+    stubs = [
+        StationStub(stationId=station_id, lat=lat, lon=lon, province=province_code)
+        for station_id, lat, lon, province_code in snapshot.idf_station_coordinates()
+    ]
+    IDF_STATION_PROVINCE.update(snapshot.idf_station_provinces())
+    IDF_STATION_INDEX = StationIndex(stubs)
+    IDF_STATION_MATRIX = StationMatrix(stubs, [stub['province'] for stub in stubs])
+    LAZY_SNAPSHOT = snapshot
+    print(f"Lazy data mode: indexed {len(stubs)} IDF stations across {', '.join(snapshot.provinces)}; provinces load on first use.")
+
+@lru_cache(maxsize=4096)
+def station_hyetographs(station_id, method, duration, time_step):
+    """(step end times, depths per step and return period) for one storm, or None without IDF data; cached per parameter tuple."""
+    idf_station_data = IDF_DATA.get(station_id)
+    if not idf_station_data:
+        return None
+    times, depths = build_hyetographs(idf_station_data, method, duration, time_step)
+    times.flags.writeable = False
+    depths.flags.writeable = False
+    return times, depths
+
+@lru_cache(maxsize=8192)
+def interpolated_candidates(lat_key, lon_key, province_code, k):
+    """
+    (unit vector, station, curve) for every IDF station that can be among the
+    k nearest to a site quantized to (lat_key, lon_key); cached per cell.
+    province_code None searches all provinces.
+    """
+    ensure_provinces_loaded([province_code])
+    station_index = IDF_STATION_INDEX_BY_PROVINCE[province_code] if province_code else IDF_STATION_INDEX
+    nearest = station_index.nearest(lat_key, lon_key, k)
+    if len(nearest) == k:
+        # The site is within CELL_RADIUS_KM of the key, so its k nearest are within this radius of the key
+        nearest = station_index.within(lat_key, lon_key, nearest[-1][0] + 2 * CELL_RADIUS_KM)
+    candidates = []
+    for _, station in nearest:
+        station = materialize_station(station)
+        curve = IDF_CURVES.get(str(station.get('stationId')))
+        if curve:
+            candidates.append((to_unit_vector(float(station['lat']), float(station['lon'])), station, curve))
+    return tuple(candidates)
+
+def interpolated_curve_json(lat, lon, province_code, k, power):
+    """Serialized IDW curve for a site, or None without IDF stations."""
+    site = to_unit_vector(lat, lon)
+    neighbours = sorted(
+        ((chord_to_km(math.dist(site, vec)), station, curve)
+         for vec, station, curve in interpolated_candidates(quantize(lat), quantize(lon), province_code, k)),
+        key=lambda neighbour: neighbour[0],
+    )[:k]
+    if not neighbours:
+        return None
+    rows, weights = blend_curves([curve for _, _, curve in neighbours], [d for d, _, _ in neighbours], power)
+    stations = [
+        {
+            "stationId": str(station.get('stationId')),
+            "name": station.get('stationName') or station.get('name'),
+            "distance_km": round(distance_km, 2),
+            "weight": round(weight, 4),
+        }
+        for (distance_km, station, _), weight in zip(neighbours, weights.tolist())
+    ]
+    payload = {"data": rows, "lat": lat, "lon": lon, "method": "idw", "power": power, "stations": stations}
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def rational_table(station_matrix):
+    """The IntensityTable aligned with station_matrix, rebuilt whenever the matrix is."""
+    global RATIONAL_TABLE
+    if RATIONAL_TABLE.stations is not station_matrix.stations:
+        with RATIONAL_TABLE_LOCK:
+            if RATIONAL_TABLE.stations is not station_matrix.stations:
+                RATIONAL_TABLE = IntensityTable(
+                    station_matrix.stations, lambda station: IDF_DATA.get(str(station.get('stationId')))
+                )
+    return RATIONAL_TABLE
+
+def set_dataset_version(fingerprint):
+    global DATASET_VERSION, IDF_RASTER
+    DATASET_VERSION = hashlib.sha256(f"{API_CACHE_VERSION}:{fingerprint}".encode('utf-8')).hexdigest()[:32]
+    LOAD_REPORT["dataset_version"] = DATASET_VERSION
+    # The raster is only used when it was built from exactly this data
+    IDF_RASTER = open_raster(RASTER_PATH, fingerprint)
+    LOAD_REPORT["idf_raster"] = IDF_RASTER is not None
+
+def load_data():
+    global LAZY_SNAPSHOT
+    print("--- Starting data loading process ---")
+    start = time.perf_counter()
+    # A reload starts from empty tables and drops everything memoized from the previous data
+    LAZY_SNAPSHOT = None
+    for table in (STATIONS_DATA, STATION_ORDER_KEYS, STATIONS_DATA_BY_PROVINCE, STATIONS_BY_PROVINCE_AND_ID,
+                  IDF_DATA, IDF_CURVES, IDF_CURVES_JSON, IDF_STATION_PROVINCE, IDF_STATION_INDEX_BY_PROVINCE,
+                  LOADED_PROVINCES):
+        table.clear()
+    build_stations_grid()
+    build_name_index()
+    GUMBEL_ENGINE.reset()
+    IDF_EQUATION.reset()
+    NEAREST_STATION_CACHE.clear()
+    station_hyetographs.cache_clear()
+    interpolated_candidates.cache_clear()
+    LOAD_REPORT.clear()
+    LOAD_REPORT.update({
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "mode": DATA_LOAD_MODE,
+        "source": "json",
+        "workers": 1,
+        "provinces": {},
+    })
+    snapshot = open_snapshot(SNAPSHOT_PATH, DATA_DIR)
+    if DATA_LOAD_MODE == 'lazy':
+        if snapshot is not None:
+            LOAD_REPORT["source"] = "snapshot"
+            set_dataset_version(snapshot.fingerprint)
+            init_lazy_data(snapshot)
+            LOAD_REPORT["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            if not IDF_STATION_PROVINCE:
+                raise Exception("No IDF data was loaded. The application cannot start without IDF data.")
+            return
+        print("Warning: Lazy data mode needs a current dataset snapshot (python dataset_snapshot.py); loading eagerly.")
+
+    if snapshot is not None:
+        print(f"Loading dataset snapshot {SNAPSHOT_PATH}")
+        LOAD_REPORT["source"] = "snapshot"
+        set_dataset_version(snapshot.fingerprint)
+        loaded_provinces = load_provinces_from_snapshot(snapshot)
+    else:
+        set_dataset_version(dataset_fingerprint(DATA_DIR))
+        loaded_provinces = load_provinces_from_json()
+    LOAD_REPORT["read_ms"] = round((time.perf_counter() - start) * 1000, 2)
 
     if loaded_provinces:
         print("\n--- Data loading complete ---")
@@ -99,6 +508,21 @@ def load_data():
     if not IDF_DATA:
         raise Exception("No IDF data was loaded. The application cannot start without IDF data.")
 
+    build_station_indexes()
+    build_stations_grid()
+    build_name_index()
+
+    curves, curves_json = build_curve_tables(IDF_DATA)
+    IDF_CURVES.update(curves)
+    IDF_CURVES_JSON.update(curves_json)
+    print(f"Precomputed IDF intensity curves for {len(IDF_CURVES)} stations.")
+
+    LOAD_REPORT.update({
+        "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        "stations": len(STATIONS_DATA),
+        "idf_stations": len(IDF_DATA),
+    })
+
 try:
     load_data()
 except Exception as e:
@@ -109,10 +533,13 @@ mongo = PyMongo()
 
 def create_app():
     app = Flask(__name__)
+    app.app_ctx_globals_class = LazyUserGlobals
     app.debug = True
 
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default_secret')
     app.config['MONGO_URI'] = os.getenv('MONGO_URI')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=REFRESH_TOKEN_DAYS)
 
     mongo.init_app(app)
 
@@ -120,7 +547,15 @@ def create_app():
         database_name = app.config['MONGO_URI'].rsplit('/', 1)[-1].split('?')[0]
         mongo.db = mongo.cx.get_database(database_name)
 
-    jwt = JWTManager(app)
+    if mongo.cx and ENSURE_INDEXES:
+        # In the background so an unreachable database does not hold up startup
+        threading.Thread(target=ensure_indexes, args=(mongo.db,), name='ensure-indexes', daemon=True).start()
+
+    jwt_manager = JWTManager(app)
+
+    @jwt_manager.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return token_revoked(jwt_payload)
 
     CORS(
         app,
@@ -160,25 +595,6 @@ def create_app():
             response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 200
 
-    def duration_to_minutes(duration_str):
-        if not isinstance(duration_str, str):
-            return None
-        duration_str = duration_str.lower().strip()
-        if 'min' in duration_str:
-            return int(duration_str.replace('min', '').strip())
-        elif 'h' in duration_str:
-            return int(float(duration_str.replace('h', '').strip()) * 60)
-        return None
-
-    def extract_province_code(province_str):
-        CODES = ["BC", "AB", "SK", "MB", "ON", "QC", "NB", "NS", "PE", "NL", "YT", "NT", "NU"]
-        if not isinstance(province_str, str):
-            return None
-        for code in CODES:
-            if code in province_str:
-                return code
-        return None
-
     def haversine(lat1, lon1, lat2, lon2):
         R = 6371  # Radius of Earth in km
         phi1 = math.radians(lat1)
@@ -216,29 +632,44 @@ def create_app():
             logging.error(f"Exception in legacy_verify for hash {hash_val}: {e}")
             return False
 
-    def verify_password(plain_password, password_hash):
-        if not password_hash:
-            return False
-        if password_hash.startswith('pbkdf2:sha256:') or password_hash.startswith('pbkdf2:sha256$'):
-            return check_password_hash(password_hash, plain_password)
-        elif password_hash.startswith('$2b$') or password_hash.startswith('$2a$'):
-            return bcrypt.checkpw(plain_password.encode('utf-8'), password_hash.encode('utf-8'))
-        elif password_hash.startswith('scrypt:'):
+    def verify_password(plain_password, user):
+        """
+        Check a login against the user's stored hash off the request thread,
+        replacing the hash with a PASSWORD_HASH_METHOD one if it was made
+        otherwise; raises PasswordPoolBusy when the pool is saturated.
+        """
+        old_hash = user.get('password_hash')
+        ok, new_hash = PASSWORD_POOL.verify_and_rehash(plain_password, old_hash, PASSWORD_HASH_METHOD)
+        if ok and new_hash:
             try:
-                parts = password_hash.split('$')
-                if len(parts) == 4:
-                    _, params, salt_b64, key_b64 = parts
-                    salt = base64.b64decode(salt_b64)
-                    key = base64.b64decode(key_b64)
-                    derived = scrypt.hash(plain_password, salt, N=32768, r=8, p=1, buflen=len(key))
-                    return derived == key
-                else:
-                    return False
+                # Matching the old hash keeps a concurrent password change from being overwritten
+                result = mongo.db.users.update_one({'_id': user['_id'], 'password_hash': old_hash},
+                                                   {'$set': {'password_hash': new_hash}})
+                if result.modified_count:
+                    invalidate_user(str(user['_id']))
             except Exception as e:
-                app.logger.error(f"Error verifying scrypt hash: {e}")
-                return False
-        else:
-            return False
+                app.logger.error(f"Could not upgrade the password hash of user {user['_id']}: {e}")
+        return ok
+
+    def dataset_cached(cache_control):
+        """
+        Tag successful responses with the dataset version and answer a matching
+        If-None-Match with 304 before the view does any work.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if DATASET_VERSION and request.if_none_match.contains_weak(DATASET_VERSION):
+                    response = app.response_class(status=304)
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(DATASET_VERSION)
+                response.headers['Cache-Control'] = cache_control
+                return response
+            return decorated_function
+        return decorator
 
     @app.errorhandler(Exception)
     def handle_exception(e):
@@ -249,33 +680,55 @@ def create_app():
     def not_found(e):
         return jsonify({"error": "Not Found", "message": "The requested URL was not found on the server."}), 404
 
+    def fetch_user(user_id):
+        """The user document for an id, from USER_CACHE or MongoDB; a copy the caller may modify."""
+        user = USER_CACHE.get(user_id)
+        if user is None:
+            user = mongo.db.users.find_one({'_id': ObjectId(user_id)}, USER_FIELDS)
+            if user is None:
+                return None
+            trial_start = user.get('trial_start')
+            if trial_start and trial_start.tzinfo is None:
+                user['trial_start'] = trial_start.replace(tzinfo=timezone.utc)
+            USER_CACHE.set(user_id, user)
+        return dict(user)
+
+    def claims_from_token(token):
+        """The verified payload of an access token, or None if it is invalid, expired or revoked."""
+        try:
+            # Same key and algorithm create_access_token signed it with
+            payload = decode_token(token)
+        except Exception as e:
+            app.logger.error(f"Error decoding token: {e}")
+            return None
+        # Refresh tokens carry the same claims but are only good at /api/auth/refresh-token
+        if payload.get('type') != 'access' or token_revoked(payload):
+            return None
+        return payload
+
+    def user_from_claims(claims):
+        user_id = claims.get('sub') if claims else None
+        if not user_id:
+            return None
+        try:
+            return fetch_user(str(user_id))
+        except Exception as e:
+            app.logger.error(f"Error loading user: {e}")
+            return None
+
     @app.before_request
     def load_user():
+        # Only remember the token; it is decoded if something reads g.token_claims or g.user,
+        # and the user is only fetched for g.user
         auth_header = request.headers.get("Authorization", "")
         token = auth_header.replace("Bearer ", "") if auth_header else None
         if not token:
+            g.token_claims = None
             g.user = None
             return
-        try:
-            payload = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-            user_id = payload.get('sub')
-            if not user_id:
-                g.user = None
-                return
-            g.user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
-        except Exception as e:
-            app.logger.error(f"Error loading user: {e}")
-            g.user = None
-
-    @app.before_request
-    def make_user_datetimes_aware():
-        user = getattr(g, 'user', None)
-        if user is None:
-            return
+        g.token_claims_loader = lambda: claims_from_token(token)
+        g.user_loader = lambda: user_from_claims(g.token_claims)
 
-        trial_start = user.get('trial_start')
-        if trial_start and trial_start.tzinfo is None:
-            user['trial_start'] = trial_start.replace(tzinfo=timezone.utc)
     @app.route('/api/login', methods=['POST'])
     def login():
         data = request.get_json()
@@ -284,53 +737,178 @@ def create_app():
         username = data.get("username")
         password = data.get("password")
 
-        user = mongo.db.users.find_one({"username": username})
-        if not user or not verify_password(password, user['password_hash']):
+        user = mongo.db.users.find_one({"username": username}, LOGIN_FIELDS)
+        try:
+            valid = bool(user) and verify_password(password, user)
+        except PasswordPoolBusy as e:
+            app.logger.warning(f"Login rejected: {e}")
+            response = jsonify({"error": "Too many login attempts in progress, please retry shortly"})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        if not valid:
             return jsonify({"error": "Invalid username or password"}), 401
 
-        access_token = create_access_token(identity=str(user["_id"]))
-        return jsonify({"token": access_token, "user": {"username": username}}), 200
+        access_token, refresh_token = issue_tokens(str(user["_id"]), entitlement_claims(user))
+        return jsonify({
+            "token": access_token,
+            "accessToken": access_token,
+            "refreshToken": refresh_token,
+            "user": {"username": username},
+        }), 200
+
+    def issue_tokens(user_id, claims):
+        """A new (access token, refresh token) pair; each refresh token has its own jti."""
+        return (create_access_token(identity=user_id, additional_claims=claims),
+                create_refresh_token(identity=user_id, additional_claims=claims))
+
+    def decode_refresh_token(token):
+        """The payload of a valid, unrevoked refresh token; raises jwt.InvalidTokenError otherwise."""
+        payload = decode_token(token)
+        if payload.get('type') != 'refresh' or not payload.get('sub') or not payload.get('jti') or token_revoked(payload):
+            raise jwt.InvalidTokenError("not a usable refresh token")
+        return payload
+
     @app.route('/api/auth/refresh-token', methods=['POST'])
     def refresh_token():
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         refresh_token = data.get('token')
 
         if not refresh_token:
             return jsonify({"error": "Refresh token required"}), 400
 
         try:
-            payload = jwt.decode(refresh_token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            user_id = payload.get('sub')
-            if not user_id:
-                return jsonify({"error": "Invalid refresh token"}), 401
-
-            user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
-
-            if not user:
-                return jsonify({"error": "User not found"}), 404
-
-            # Create a new access token using flask-jwt-extended
-            new_access_token = create_access_token(identity=str(user["_id"]))
-
-            new_refresh_token = refresh_token
-
-            return jsonify({
-                "accessToken": new_access_token,
-                "refreshToken": new_refresh_token
-            })
-
+            payload = decode_refresh_token(refresh_token)
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Refresh token expired"}), 401
-        except jwt.InvalidTokenError:
+        except Exception:
             return jsonify({"error": "Invalid refresh token"}), 401
-        except Exception as e:
-            return jsonify({"error": "Refresh token error", "details": str(e)}), 500
+
+        # Rotation: each refresh token works once
+        if not REFRESH_REVOCATIONS.use(payload['jti'], payload['sub'], payload['exp']):
+            successor = ROTATED_REFRESH_TOKENS.get(payload['jti'])
+            if successor is not None and not REFRESH_REVOCATIONS.is_revoked(successor[2]):
+                new_access_token, new_refresh_token, _ = successor
+                return jsonify({"accessToken": new_access_token, "refreshToken": new_refresh_token})
+            # Only this token is refused; the user's other sessions keep working
+            app.logger.warning(f"Reuse of a rotated refresh token for user {payload['sub']}")
+            return jsonify({"error": "Refresh token already used"}), 401
+
+        # Current role and trial, not the ones frozen into the presented token
+        user = fetch_user(payload['sub'])
+        if not user:
+            return jsonify({"error": "User not found"}), 401
+        new_access_token, new_refresh_token = issue_tokens(payload['sub'], entitlement_claims(user))
+        ROTATED_REFRESH_TOKENS.set(
+            payload['jti'], (new_access_token, new_refresh_token, decode_token(new_refresh_token)['jti']))
+        return jsonify({
+            "accessToken": new_access_token,
+            "refreshToken": new_refresh_token
+        })
+
+    @app.route('/api/auth/logout', methods=['POST'])
+    def logout():
+        data = request.get_json(silent=True) or {}
+        try:
+            payload = decode_refresh_token(data.get('token') or '')
+            REFRESH_REVOCATIONS.revoke(payload['jti'], payload['sub'], payload['exp'])
+        except Exception:
+            pass  # An invalid or expired token cannot be used anyway
+        return jsonify({"message": "Logged out"}), 200
+
+    def find_station_by_name_and_province(city_name, province):
+        """Best name match in the province that has IDF data, or None."""
+        if not city_name or not province:
+            return None
+        ensure_provinces_loaded([province])
+        for position in STATION_NAME_INDEX.search(city_name, province=province, limit=None):
+            station = STATIONS_DATA[position]
+            if str(station.get('stationId')) in IDF_DATA:
+                return station
+        return None
 
     @app.route('/api/stations', methods=['GET'])
+    @dataset_cached('public, max-age=300')
     def get_stations():
-        return jsonify(STATIONS_DATA)
+        query_params = ('fields', 'bbox', 'province', 'limit', 'cursor')
+        if not any(param in request.args for param in query_params):
+            ensure_provinces_loaded()
+            # Folder order, not load order, so every worker sends the same body
+            return jsonify([STATIONS_DATA[p] for p in STATION_PAGE_ORDER[0][0]])
+
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        province_code = request.args.get('province')
+        try:
+            limit = int(request.args.get('limit', STATIONS_PAGE_LIMIT))
+            cursor = request.args.get('cursor')
+            if cursor is not None:
+                # The order key of the last station already returned, as 'ON:17'
+                cursor_province, _, cursor_index = cursor.rpartition(':')
+                cursor = (cursor_province, int(cursor_index))
+            bbox = request.args.get('bbox')
+            if bbox is not None:
+                min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(','))
+                if not all(map(math.isfinite, (min_lon, min_lat, max_lon, max_lat))):
+                    raise ValueError("bbox values must be finite")
+                if min_lon > max_lon or min_lat > max_lat:
+                    raise ValueError("bbox minimums exceed maximums")
+        except ValueError:
+            return jsonify({"error": "Invalid limit, cursor or bbox (expected bbox=minLon,minLat,maxLon,maxLat)."}), 400
+        if not 0 < limit <= STATIONS_MAX_PAGE_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {STATIONS_MAX_PAGE_LIMIT}."}), 400
+
+        ensure_provinces_loaded([province_code] if province_code and bbox is None else None)
+        # One read of each global, so a province loading meanwhile cannot mix old and new indexes
+        grid, (all_stations, by_province) = STATIONS_GRID, STATION_PAGE_ORDER
+        if bbox is not None:
+            positions = grid.within_bbox(min_lon, min_lat, max_lon, max_lat)
+            if province_code:
+                positions = [p for p in positions if station_province_code(STATIONS_DATA[p]) == province_code]
+            positions, keys = page_order(positions)
+        elif province_code:
+            positions, keys = by_province.get(province_code, ([], []))
+        else:
+            positions, keys = all_stations
+
+        start = bisect.bisect_right(keys, cursor) if cursor is not None else 0
+        page = positions[start:start + limit]
+        next_cursor = '%s:%d' % keys[start + len(page) - 1] if page and start + limit < len(positions) else None
+
+        if fields:
+            stations = [{f: STATIONS_DATA[p][f] for f in fields if f in STATIONS_DATA[p]} for p in page]
+        else:
+            stations = [STATIONS_DATA[p] for p in page]
+        return jsonify({"stations": stations, "count": len(stations), "next_cursor": next_cursor})
+
+    @app.route('/api/stations/search', methods=['GET'])
+    @dataset_cached('public, max-age=300')
+    def search_stations():
+        query = request.args.get('q', '').strip()
+        province_code = request.args.get('province') or None
+        try:
+            limit = min(int(request.args.get('limit', 10)), 50)
+            if limit < 1:
+                raise ValueError("limit must be positive")
+        except ValueError:
+            return jsonify({"error": "Invalid limit."}), 400
+        if not query:
+            return jsonify({"results": []})
+
+        ensure_provinces_loaded([province_code] if province_code else None)
+        results = []
+        for position in STATION_NAME_INDEX.search(query, province=province_code, limit=limit):
+            station = STATIONS_DATA[position]
+            results.append({
+                "stationId": station.get('stationId'),
+                "name": station.get('stationName') or station.get('name'),
+                "province": station_province_code(station),
+                "lat": station.get('lat'),
+                "lon": station.get('lon'),
+                "hasIdf": str(station.get('stationId')) in IDF_DATA,
+            })
+        return jsonify({"results": results})
 
     @app.route('/api/nearest-station', methods=['GET'])
+    @dataset_cached('public, max-age=300')
     def nearest_station():
         try:
             lat = float(request.args.get('lat'))
@@ -339,81 +917,494 @@ def create_app():
             print(f"Received request for nearest station for coordinates: Lat: {lat}, Lon: {lon}, Province: {province_code}")
         except (ValueError, TypeError):
             return jsonify({"error": "Invalid latitude, longitude, or province code."}), 400
+        if not (abs(lat) <= 90 and abs(lon) <= 180):
+            return jsonify({"error": "Invalid latitude or longitude."}), 400
         city_name = request.args.get('city_name', '').strip()
 
-        def find_station_by_name_and_province(city_name, province, stations):
-            if not city_name:
-                return None
-            city_name_clean = city_name.lower().replace(' ', '')
-            for station in stations:
-                station_name_field = (station.get('stationName') or station.get('name') or '').lower().replace(' ', '')
-                if city_name_clean in station_name_field and station.get('province', '').upper() == province.upper():
-                    return station
-            return None
-
-        preferred_station = find_station_by_name_and_province(city_name, province_code, STATIONS_DATA)
+        cache_key = (province_code, normalize_name(city_name), geohash(lat, lon, NEAREST_STATION_CACHE_PRECISION))
+        station = NEAREST_STATION_CACHE.get(cache_key)
+        if station is None:
+            station = resolve_nearest_station(lat, lon, province_code, city_name)
+            if station is None:
+                return jsonify({"error": "No nearby station with IDF data found."}), 404
+            # A private copy, so neither the cache nor a response ever touches the shared station dict
+            station = dict(station)
+            NEAREST_STATION_CACHE.set(cache_key, station)
+        distance_km = haversine(lat, lon, float(station['lat']), float(station['lon']))
+        return jsonify(dict(station, distance_km=round(distance_km, 2)))
+
+    def resolve_nearest_station(lat, lon, province_code, city_name):
+        """The station /api/nearest-station answers with: a city name match in the province, else the nearest one."""
+        preferred_station = find_station_by_name_and_province(city_name, province_code)
         if preferred_station and str(preferred_station.get('stationId')) in IDF_DATA:
-            distance_km = haversine(lat, lon, float(preferred_station['lat']), float(preferred_station['lon']))
-            preferred_station['distance_km'] = round(distance_km, 2)
             print(f"Preferred station match by city: {preferred_station.get('stationId')}, Name: {(preferred_station.get('stationName') or preferred_station.get('name') or '')}")
-            return jsonify(preferred_station)
+            return preferred_station
 
-        candidate_stations = [s for s in STATIONS_DATA if extract_province_code(s.get('province', '')) == province_code]
-
-        if not candidate_stations:
+        ensure_provinces_loaded([province_code])
+        station_index = IDF_STATION_INDEX_BY_PROVINCE.get(province_code)
+        if station_index is None:
             print(f"No stations found matching province code '{province_code}'. Falling back to all stations.")
-            candidate_stations = STATIONS_DATA
-
-        sorted_stations = sorted(candidate_stations, key=lambda s: haversine(lat, lon, float(s.get('lat', 0)), float(s.get('lon', 0))))
+            station_index = IDF_STATION_INDEX
 
-        for station in sorted_stations:
-            station_id = str(station.get('stationId'))
-            if station_id in IDF_DATA:
-                distance_km = haversine(lat, lon, float(station.get('lat', 0)), float(station.get('lon', 0)))
-                station['distance_km'] = round(distance_km, 2)
-                print(f"Nearest station with IDF data found: {station_id}, Name: {station.get('name')}, Distance: {station['distance_km']} km")
-                return jsonify(station)
+        nearest = station_index.nearest(lat, lon, k=1)
+        if not nearest:
+            return None
+        distance_km, station = nearest[0]
+        station = materialize_station(station)
+        print(f"Nearest station with IDF data found: {station.get('stationId')}, Name: {station.get('name')}, Distance: {round(distance_km, 2)} km")
+        return station
+
+    @app.route('/api/nearest-station/batch', methods=['POST'])
+    def nearest_station_batch():
+        data = request.get_json(silent=True) or {}
+        points = data.get('points') if isinstance(data, dict) else data
+        if not isinstance(points, list) or not points:
+            return jsonify({"error": "Expected a non-empty 'points' array."}), 400
+        if len(points) > MAX_BATCH_POINTS:
+            return jsonify({"error": f"At most {MAX_BATCH_POINTS} points per request."}), 400
+
+        lats, lons, provinces, city_names = [], [], [], []
+        for i, point in enumerate(points):
+            try:
+                lat = float(point['lat'])
+                lon = float(point['lon'])
+            except (KeyError, ValueError, TypeError):
+                return jsonify({"error": f"Invalid latitude or longitude at index {i}."}), 400
+            if not (abs(lat) <= 90 and abs(lon) <= 180):
+                return jsonify({"error": f"Invalid latitude or longitude at index {i}."}), 400
+            province_code = point.get('province')
+            city_name = point.get('city_name') or ''
+            if not isinstance(province_code, (str, type(None))) or not isinstance(city_name, str):
+                return jsonify({"error": f"'province' and 'city_name' must be strings at index {i}."}), 400
+            lats.append(lat)
+            lons.append(lon)
+            provinces.append(province_code)
+            city_names.append(city_name.strip())
+
+        results = [None] * len(points)
+        ensure_provinces_loaded(set(provinces))
+        for i, (lat, lon, province_code, city_name) in enumerate(zip(lats, lons, provinces, city_names)):
+            preferred_station = find_station_by_name_and_province(city_name, province_code)
+            if preferred_station and str(preferred_station.get('stationId')) in IDF_DATA:
+                distance_km = haversine(lat, lon, float(preferred_station['lat']), float(preferred_station['lon']))
+                results[i] = dict(preferred_station, distance_km=round(distance_km, 2))
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        matches = IDF_STATION_MATRIX.nearest_many(
+            [lats[i] for i in pending],
+            [lons[i] for i in pending],
+            [provinces[i] for i in pending],
+            IDF_STATION_INDEX_BY_PROVINCE,
+        )
+        for i, match in zip(pending, matches):
+            if match is None:
+                results[i] = {"error": "No nearby station with IDF data found."}
             else:
-                print(f"Station {station_id} is nearby but has no IDF data.")
+                distance_km, station = match
+                results[i] = dict(materialize_station(station), distance_km=round(distance_km, 2))
 
-        return jsonify({"error": "No nearby station with IDF data found."}), 404
+        print(f"Resolved nearest stations for {len(points)} points ({len(points) - len(pending)} by city name).")
+        return jsonify({"results": results})
 
     @app.route('/api/idf/curves', methods=['GET'])
     @require_trial_access
+    @dataset_cached('private, max-age=300')
     def idf_curves():
         try:
             stationId = request.args.get('stationId')
             print(f"Received request for IDF curves for station ID: {stationId}")
             if not stationId:
                 return jsonify({"error": "Missing 'stationId' parameter"}), 400
-            idf_station_data = IDF_DATA.get(stationId)
-            if not idf_station_data:
+            ensure_provinces_loaded([IDF_STATION_PROVINCE.get(stationId)])
+            curve_json = IDF_CURVES_JSON.get(stationId)
+            if curve_json is None:
                 print(f"IDF data not found for this station ID: {stationId}")
                 return jsonify({"error": "IDF data not found for this station."}), 404
 
-            processed_data = []
-            for entry in idf_station_data:
-                duration_str = entry.get('duration')
-                duration_in_minutes = duration_to_minutes(duration_str)
-                if duration_in_minutes is not None and duration_in_minutes > 0:
-                    data_point = {'duration': duration_in_minutes}
-                    for rp in ['2', '5', '10', '25', '50', '100']:
-                        depth = entry.get(rp)
-                        if depth is not None:
-                            try:
-                                intensity = float(depth) / (duration_in_minutes / 60.0)
-                                data_point[rp] = intensity
-                            except (ValueError, TypeError):
-                                continue
-                    if len(data_point) > 1:
-                        processed_data.append(data_point)
-
-            processed_data.sort(key=lambda x: x['duration'])
-            return jsonify({"data": processed_data})
+            return app.response_class(curve_json, mimetype='application/json')
 
         except Exception as e:
             app.logger.error(f"Error processing IDF curves: {e}")
-            return jsonify({"error": "Internal server error occurred."}),
+            return jsonify({"error": "Internal server error occurred."}), 500
+
+    @app.route('/api/idf/curves/interpolated', methods=['GET'])
+    @require_trial_access
+    @dataset_cached('private, max-age=300')
+    def idf_curves_interpolated():
+        try:
+            lat = float(request.args.get('lat'))
+            lon = float(request.args.get('lon'))
+            k = int(request.args.get('k', DEFAULT_NEIGHBOURS))
+            power = float(request.args.get('power', DEFAULT_POWER))
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid latitude, longitude, 'k' or 'power'."}), 400
+        if not (abs(lat) <= 90 and abs(lon) <= 180):
+            return jsonify({"error": "Invalid latitude or longitude."}), 400
+        if not 1 <= k <= MAX_NEIGHBOURS or not 0 < power <= MAX_POWER:
+            return jsonify({"error": f"'k' must be 1 to {MAX_NEIGHBOURS} and 'power' in (0, {MAX_POWER:g}]."}), 400
+
+        province_code = request.args.get('province')
+        if province_code:
+            if province_code not in PROVINCE_CODES:
+                return jsonify({"error": f"Unknown province code '{province_code}'."}), 400
+            ensure_provinces_loaded([province_code])
+            if province_code not in IDF_STATION_INDEX_BY_PROVINCE:
+                return jsonify({"error": f"No station with IDF data in {province_code}."}), 404
+
+        curve_json = interpolated_curve_json(lat, lon, province_code, k, power)
+        if curve_json is None:
+            return jsonify({"error": "No nearby station with IDF data found."}), 404
+        return app.response_class(curve_json, mimetype='application/json')
+
+    def raster_or_error():
+        if IDF_RASTER is None:
+            return None, (jsonify({"error": "The IDF raster has not been built for the current data."}), 503)
+        return IDF_RASTER, None
+
+    @app.route('/api/idf/raster/point', methods=['GET'])
+    @require_trial_access
+    @dataset_cached('private, max-age=300')
+    def idf_raster_point():
+        raster, error = raster_or_error()
+        if error:
+            return error
+        try:
+            lat = float(request.args.get('lat'))
+            lon = float(request.args.get('lon'))
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid latitude or longitude."}), 400
+        if not (abs(lat) <= 90 and abs(lon) <= 180):
+            return jsonify({"error": "Invalid latitude or longitude."}), 400
+        found = raster.point(lat, lon)
+        if found is None:
+            return jsonify({"error": "The point is outside the IDF raster."}), 404
+        (row, col), depths = found
+        if np.isnan(depths).all():
+            return jsonify({"error": "No IDF station within range of this point."}), 404
+        depths = np.round(depths.astype(np.float64), 2)
+        intensities = np.round(depths / (np.asarray(raster.durations)[:, None] / 60.0), 2)
+        center_lat, center_lon = raster.cell_center(row, col)
+        return jsonify({
+            "lat": round(center_lat, 6),
+            "lon": round(center_lon, 6),
+            "step": raster.step,
+            "durations": raster.durations,
+            "returnPeriods": raster.return_periods,
+            "depths": np.where(np.isnan(depths), None, depths).tolist(),
+            "intensities": np.where(np.isnan(intensities), None, intensities).tolist(),
+        })
+
+    @app.route('/api/idf/raster/tile', methods=['GET'])
+    @require_trial_access
+    @dataset_cached('private, max-age=300')
+    def idf_raster_tile():
+        raster, error = raster_or_error()
+        if error:
+            return error
+        try:
+            south, west, north, east = (float(request.args.get(key)) for key in ('south', 'west', 'north', 'east'))
+            if not all(map(math.isfinite, (south, west, north, east))):
+                raise ValueError("tile bounds must be finite")
+            duration = int(request.args.get('duration', '60'))
+            stride = int(request.args.get('stride', '1'))
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid 'south', 'west', 'north', 'east', 'duration' or 'stride'."}), 400
+        return_period = request.args.get('returnPeriod', '10')
+        if duration not in raster.durations or return_period not in raster.return_periods or stride < 1:
+            return jsonify({"error": f"'duration' must be one of {raster.durations} minutes, 'returnPeriod' one of "
+                                     f"{raster.return_periods} and 'stride' positive."}), 400
+        try:
+            row0, col0, depths = raster.tile(
+                south, west, north, east,
+                raster.durations.index(duration), raster.return_periods.index(return_period), stride,
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Invalid tile: {e}"}), 400
+        depths = np.round(depths.astype(np.float64), 2)
+        first_lat, first_lon = raster.cell_center(row0, col0)
+        payload = {
+            "duration": duration,
+            "returnPeriod": return_period,
+            "firstCell": {"lat": round(first_lat, 6), "lon": round(first_lon, 6)},
+            "step": raster.step * stride,
+            "depths": np.where(np.isnan(depths), None, depths).tolist(),
+        }
+        return app.response_class(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+
+    @app.route('/api/idf/return-periods', methods=['GET'])
+    @require_trial_access
+    @dataset_cached('private, max-age=300')
+    def idf_return_periods():
+        station_id = request.args.get('stationId')
+        if not station_id:
+            return jsonify({"error": "Missing 'stationId' parameter"}), 400
+        try:
+            return_periods = parse_return_periods(request.args.get('returnPeriods', '2,5,10,25,50,100'))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid 'returnPeriods': {e}"}), 400
+
+        table = GUMBEL_ENGINE.return_period_table(station_id, return_periods)
+        if table is None:
+            return jsonify({"error": "Annual maximum series not found for this station."}), 404
+        return jsonify({
+            "stationId": station_id,
+            "returnPeriods": [return_period_key(t) for t in return_periods],
+            "method": "gumbel-moments",
+            **table,
+        })
+
+    @app.route('/api/idf/intensity', methods=['GET', 'POST'])
+    @require_trial_access
+    def idf_intensity():
+        # GET takes comma-separated lists; POST takes the same keys as JSON arrays
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            station_ids, durations, return_periods = body.get('stationIds'), body.get('durations'), body.get('returnPeriods')
+        else:
+            def split(name):
+                value = request.args.get(name)
+                return [part.strip() for part in value.split(',') if part.strip()] if value else None
+            station_ids, durations, return_periods = split('stationIds'), split('durations'), split('returnPeriods')
+
+        if not isinstance(station_ids, list) or not isinstance(durations, list) or not station_ids or not durations:
+            return jsonify({"error": "'stationIds' and 'durations' (minutes) are required lists"}), 400
+        if return_periods is not None and not isinstance(return_periods, list):
+            return jsonify({"error": "'returnPeriods' must be a list"}), 400
+        station_ids = [str(station_id) for station_id in station_ids]
+        return_periods = [str(rp) for rp in return_periods] if return_periods else list(IDF_EQUATION.return_periods)
+        if len(station_ids) * len(durations) * len(return_periods) > MAX_EVALUATIONS:
+            return jsonify({"error": f"At most {MAX_EVALUATIONS} evaluations per request"}), 400
+        try:
+            intensities = IDF_EQUATION.intensities(station_ids, durations, return_periods)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid 'durations': {e}"}), 400
+        except KeyError as e:
+            missing = e.args[0]
+            if set(missing) & set(station_ids):
+                return jsonify({"error": "Interpolation coefficients not found", "stationIds": missing}), 404
+            return jsonify({"error": f"Return periods must be among {IDF_EQUATION.return_periods}"}), 400
+
+        if np.isnan(intensities).any():
+            intensities = np.where(np.isnan(intensities), None, intensities)
+        payload = {
+            "stationIds": station_ids,
+            "durations": [float(d) for d in durations],
+            "returnPeriods": return_periods,
+            "intensities": intensities.tolist(),
+        }
+        return app.response_class(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+
+    @app.route('/api/idf/hyetograph', methods=['GET'])
+    @require_trial_access
+    @dataset_cached('private, max-age=300')
+    def idf_hyetograph():
+        station_id = request.args.get('stationId')
+        method = request.args.get('method', 'alternating_block')
+        if not station_id:
+            return jsonify({"error": "Missing 'stationId' parameter"}), 400
+        if method not in HYETOGRAPH_METHODS:
+            return jsonify({"error": f"'method' must be one of {', '.join(HYETOGRAPH_METHODS)}"}), 400
+        try:
+            duration = int(request.args.get('duration', '60'))
+            time_step = int(request.args.get('timeStep', '5'))
+            validate_storm(duration, time_step)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid storm: {e}"}), 400
+        return_periods = request.args.get('returnPeriods')
+        return_periods = [rp.strip() for rp in return_periods.split(',')] if return_periods else RETURN_PERIODS
+        if any(rp not in RETURN_PERIODS for rp in return_periods):
+            return jsonify({"error": f"Return periods must be among {RETURN_PERIODS}"}), 400
+
+        ensure_provinces_loaded([IDF_STATION_PROVINCE.get(station_id)])
+        storm = station_hyetographs(station_id, method, duration, time_step)
+        if storm is None:
+            return jsonify({"error": "IDF data not found for this station."}), 404
+        times, depths = storm
+        # A return period with fewer than two tabulated depths has no curve to build a storm from
+        return_periods = [rp for rp in return_periods if np.isfinite(depths[:, RETURN_PERIODS.index(rp)]).all()]
+        columns = [RETURN_PERIODS.index(rp) for rp in return_periods]
+        step_depths = np.round(depths[:, columns], 3)
+        step_intensities = np.round(depths[:, columns] * (60.0 / time_step), 3)
+        return jsonify({
+            "stationId": station_id,
+            "method": method,
+            "duration": duration,
+            "timeStep": time_step,
+            "times": times.tolist(),
+            "depths": {rp: step_depths[:, i].tolist() for i, rp in enumerate(return_periods)},
+            "intensities": {rp: step_intensities[:, i].tolist() for i, rp in enumerate(return_periods)},
+        })
+
+    @app.route('/api/rational/batch', methods=['POST'])
+    @require_trial_access
+    def rational_batch():
+        # Q = C * i * A for many catchments: nearest IDF station, intensity at tc, peak flow
+        try:
+            columns = parse_catchments(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid catchments: {e}"}), 400
+        start = time.perf_counter()
+        errors, rp_columns = validate_catchments(columns)
+        valid = np.flatnonzero(rp_columns >= 0)
+        provinces = [columns['province'][i] for i in valid.tolist()]
+
+        ensure_provinces_loaded(set(provinces) - {None})
+        station_matrix = IDF_STATION_MATRIX
+        positions, distances = station_matrix.nearest_positions(
+            columns['lat'][valid], columns['lon'][valid], provinces, IDF_STATION_INDEX_BY_PROVINCE
+        )
+        matched = positions >= 0
+        if LAZY_SNAPSHOT is not None:
+            ensure_provinces_loaded(set(station_matrix.provinces[np.unique(positions[matched])].tolist()))
+        table = rational_table(station_matrix)
+
+        n = len(errors)
+        station_positions = np.full(n, -1)
+        station_positions[valid] = positions
+        distance_km = np.full(n, np.nan)
+        distance_km[valid] = distances
+        rows = valid[matched]
+        intensity = np.full(n, np.nan)
+        intensity[rows] = table.intensities(positions[matched], columns['tc'][rows], rp_columns[rows])
+        flow = peak_flows(columns['c'], intensity, columns['area'])
+        for i in valid[~matched].tolist():
+            errors[i] = "No nearby station with IDF data found."
+        for i in rows[np.isnan(intensity[rows])].tolist():
+            errors[i] = "No IDF data for this return period at the nearest station."
+        print(f"Computed Rational Method peak flows for {n} catchments "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms ({errors.count(None)} succeeded).")
+
+        def results():
+            station_ids = table.station_ids
+            rows = zip(
+                columns['id'], errors, station_positions.tolist(), np.round(distance_km, 2).tolist(),
+                np.round(intensity, 3).tolist(), np.round(flow, 6).tolist(),
+            )
+            for catchment_id, error, position, distance, i_mm_h, q in rows:
+                if error:
+                    yield {"id": catchment_id, "error": error}
+                else:
+                    yield {"id": catchment_id, "stationId": station_ids[position], "distance_km": distance,
+                           "intensity": i_mm_h, "peakFlow": q}
+
+        # NDJSON streams one result per line, for ?format=ndjson or Accept: application/x-ndjson
+        if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+            def ndjson():
+                lines = []
+                for result in results():
+                    lines.append(json.dumps(result, separators=(',', ':')))
+                    if len(lines) == NDJSON_CHUNK_ROWS:
+                        yield '\n'.join(lines) + '\n'
+                        lines = []
+                if lines:
+                    yield '\n'.join(lines) + '\n'
+            return app.response_class(ndjson(), mimetype='application/x-ndjson')
+        payload = {"units": {"intensity": "mm/h", "area": "ha", "peakFlow": "m3/s"}, "results": list(results())}
+        return app.response_class(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+
+    @app.route('/api/sewer/design', methods=['POST'])
+    @require_trial_access
+    def sewer_design():
+        # Size a dendritic storm sewer network from one station's IDF curve
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"error": "Expected a JSON object with 'nodes' and 'pipes'."}), 400
+        return_period = body.get('returnPeriod', '10')
+        return_period = f'{return_period:g}' if isinstance(return_period, (int, float)) else str(return_period)
+        if return_period not in RETURN_PERIODS:
+            return jsonify({"error": f"'returnPeriod' must be one of {', '.join(RETURN_PERIODS)}"}), 400
+
+        station_id = body.get('stationId')
+        distance_km = None
+        if station_id is None:
+            try:
+                lat, lon = float(body['lat']), float(body['lon'])
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"error": "Give a 'stationId' or the network's 'lat' and 'lon'."}), 400
+            province_code = body.get('province')
+            ensure_provinces_loaded([province_code])
+            positions, distances = IDF_STATION_MATRIX.nearest_positions(
+                [lat], [lon], [province_code], IDF_STATION_INDEX_BY_PROVINCE
+            )
+            if positions[0] < 0:
+                return jsonify({"error": "No nearby station with IDF data found."}), 404
+            station_id = str(IDF_STATION_MATRIX.stations[positions[0]].get('stationId'))
+            distance_km = round(float(distances[0]), 2)
+        station_id = str(station_id)
+        ensure_provinces_loaded([IDF_STATION_PROVINCE.get(station_id)])
+        curve = IDF_CURVES.get(station_id)
+        if curve is None:
+            return jsonify({"error": "IDF data not found for this station."}), 404
+
+        start = time.perf_counter()
+        try:
+            network = SewerNetwork(body.get('nodes', []), body.get('pipes'))
+            design = network.design(IntensityCurve(curve, return_period))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid network: {e}"}), 400
+        print(f"Designed {len(network.pipe_ids)} pipes for station {station_id} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms ({int(design['surcharged'].sum())} surcharged).")
+
+        decimals = {'tc': 2, 'intensity': 3, 'area': 4, 'ca': 4, 'flow': 4, 'diameter': 0, 'capacity': 4, 'velocity': 3, 'travelTime': 3}
+        columns = {key: np.round(design[key], places).tolist() for key, places in decimals.items()}
+        columns['diameter'] = [int(d) for d in columns['diameter']]
+        columns['surcharged'] = design['surcharged'].tolist()
+        node_ids = network.node_ids
+        pipes = [
+            {"id": pipe_id, "from": node_ids[up], "to": node_ids[down], **dict(zip(columns, values))}
+            for pipe_id, up, down, *values in zip(network.pipe_ids, network.upstream, network.downstream, *columns.values())
+        ]
+        payload = {
+            "stationId": station_id,
+            "distance_km": distance_km,
+            "returnPeriod": return_period,
+            "units": {"tc": "min", "intensity": "mm/h", "area": "ha", "flow": "m3/s", "diameter": "mm",
+                      "velocity": "m/s", "travelTime": "min"},
+            "pipes": pipes,
+        }
+        return app.response_class(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+
+    @app.route('/api/admin/load-report', methods=['GET'])
+    @require_admin
+    def load_report():
+        return jsonify(LOAD_REPORT)
+
+    @app.route('/api/admin/cache-stats', methods=['GET'])
+    @require_admin
+    def cache_stats():
+        return jsonify({
+            "nearestStation": dict(NEAREST_STATION_CACHE.stats(), geohash_precision=NEAREST_STATION_CACHE_PRECISION),
+            "users": USER_CACHE.stats(),
+            "revokedTokens": REVOKED_TOKENS.stats(),
+            "rotatedRefreshTokens": ROTATED_REFRESH_TOKENS.stats(),
+            "refreshTokenRevocations": REFRESH_REVOCATIONS.stats(),
+        })
+
+    @app.route('/api/admin/tokens/revoke', methods=['POST'])
+    @require_admin
+    def revoke_tokens():
+        # After a role or trial change: the user's current tokens stop working and they log in again
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('userId')
+        if not user_id:
+            return jsonify({"error": "userId is required"}), 400
+        revoke_user_tokens(user_id)
+        invalidate_user(user_id)
+        return jsonify({"revoked": str(user_id)})
+
+    @app.route('/api/admin/password-pool', methods=['GET'])
+    @require_admin
+    def password_pool_stats():
+        return jsonify(PASSWORD_POOL.stats())
+
+    @app.route('/api/admin/user-cache/invalidate', methods=['POST'])
+    @require_admin
+    def invalidate_user_cache():
+        # For profile or trial edits made outside this process; {"userId": ...} or {} for every user
+        data = request.get_json(silent=True) or {}
+        invalidate_user(data.get('userId'))
+        return jsonify({"invalidated": data.get('userId') or "all"})
+
     @app.route('/')
     def index():
         return {"message": "Backend service is running"}, 200
@@ -452,10 +1443,11 @@ def create_app():
         if not username or not password:
             return jsonify({"error": "Username and password required"}), 400
 
-        if mongo.db.users.find_one({'username': username}):
+        # Cheap guard before the costly hash, and the only one while the unique index is missing
+        if mongo.db.users.find_one({'username': username}, {'_id': 1}):
             return jsonify({"error": "Username already taken"}), 409
 
-        password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        password_hash = hash_password(password, PASSWORD_HASH_METHOD)
         now = datetime.now(timezone.utc)
         trial_days = 7
         trial_start = now
@@ -469,16 +1461,22 @@ def create_app():
             "trial_end": trial_end,
             "trial_days": trial_days
         }
-        mongo.db.users.insert_one(user_doc)
+        try:
+            # The unique username index (db_indexes.py) settles sign-ups racing past the check above
+            mongo.db.users.insert_one(user_doc)
+        except DuplicateKeyError:
+            return jsonify({"error": "Username already taken"}), 409
         return jsonify({"message": "Registration successful"}), 201
 
     @app.route('/api/user/profile', methods=['GET'])
     @jwt_required()
     def user_profile():
         current_user = get_jwt_identity()
-        user = mongo.db.users.find_one({'_id': ObjectId(current_user)}, {'_id': 0, 'password': 0})
+        user = fetch_user(current_user)
         if not user:
             return jsonify({"error": "User not found"}), 404
+        user.pop('_id', None)
+        user.pop('password', None)
         return jsonify(user), 200
 
     @app.route('/api/protected', methods=['GET'])
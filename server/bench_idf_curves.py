@@ -0,0 +1,51 @@
+"""
+Per-request latency of the /api/idf/curves handler body, before and after
+precomputing the curve tables, over every station loaded by load_data().
+
+Usage: python bench_idf_curves.py [rounds]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/benchmark')
+
+import app as backend
+from flask import jsonify
+from idf_tables import build_intensity_curve
+
+
+def per_request_us(handler, station_ids, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for station_id in station_ids:
+            handler(station_id)
+    return (time.perf_counter() - start) / (rounds * len(station_ids)) * 1e6
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    flask_app = backend.create_app()
+    station_ids = list(backend.IDF_CURVES_JSON)
+
+    def before(station_id):
+        # What idf_curves did per request: parse durations, convert depths, sort, serialize
+        response = jsonify({"data": build_intensity_curve(backend.IDF_DATA[station_id])})
+        return response.get_data()
+
+    def after(station_id):
+        response = flask_app.response_class(backend.IDF_CURVES_JSON[station_id], mimetype='application/json')
+        return response.get_data()
+
+    with flask_app.app_context():
+        before_us = per_request_us(before, station_ids, rounds)
+        after_us = per_request_us(after, station_ids, rounds)
+
+    print(f"\nStations: {len(station_ids)}, rounds: {rounds}")
+    print(f"Before (compute per request): {before_us:8.1f} us/request")
+    print(f"After  (precomputed bytes):   {after_us:8.1f} us/request")
+    print(f"Speedup: {before_us / after_us:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
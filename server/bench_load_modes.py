@@ -0,0 +1,60 @@
+"""
+Import time and first-request latency with DATA_LOAD_MODE=eager and lazy.
+
+Each mode runs in a fresh interpreter so nothing is shared between runs.
+Lazy mode needs a current snapshot: python dataset_snapshot.py
+
+Usage: python bench_load_modes.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+PROBE = r'''
+import contextlib, io, json, os, time
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app as backend
+import_s = time.perf_counter() - t0
+
+from flask import g
+flask_app = backend.create_app()
+client = flask_app.test_client()
+timings = {"import_ms": import_s * 1000}
+with contextlib.redirect_stdout(io.StringIO()):
+    t = time.perf_counter()
+    client.get("/api/nearest-station?lat=43.68&lon=-79.63&province=ON")
+    timings["first_nearest_station_ON_ms"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    with flask_app.test_request_context("/api/idf/curves?stationId=7011309"):
+        g.user = {"role": "admin"}
+        flask_app.view_functions["idf_curves"]()
+    timings["first_idf_curves_QC_ms"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    client.get("/api/nearest-station?lat=43.68&lon=-79.63&province=ON")
+    timings["second_nearest_station_ON_ms"] = (time.perf_counter() - t) * 1000
+print(json.dumps(timings))
+'''
+
+
+def run(mode):
+    env = dict(os.environ, DATA_LOAD_MODE=mode)
+    env.setdefault('MONGO_URI', 'mongodb://localhost:27017/benchmark')
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    for mode in ('eager', 'lazy'):
+        timings = run(mode)
+        print(mode.ljust(6), '  '.join(f"{name}={value:.1f}" for name, value in timings.items()))
@@ -0,0 +1,49 @@
+"""
+Fixed-size Bloom filter over strings.
+"""
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and about error_rate false
+    positives while it holds at most capacity keys. Keys cannot be removed;
+    build a new filter to drop them.
+    """
+
+    def __init__(self, capacity, error_rate=1e-6):
+        capacity = max(1, int(capacity))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def stats(self):
+        return {
+            "keys": self.count,
+            "capacity": self.capacity,
+            "bytes": len(self._bits),
+            "hashes": self.hashes,
+            "error_rate": self.error_rate,
+        }
@@ -1,6 +1,7 @@
 import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 from werkzeug.security import generate_password_hash
-from app import app, mongo
 from dotenv import load_dotenv
 from pathlib import Path
 import os
@@ -9,21 +10,31 @@ import json
 # Load environment variables early
 env_path = Path(__file__).parent / '.env'  # Adjust path to your .env
 load_dotenv(dotenv_path=env_path)
-print("Testing MONGO_URI loaded:", os.getenv("MONGO_URI"))
-print("Testing other env var:", os.getenv("EMAIL_USER"))
-assert os.getenv("MONGO_URI") is not None, "MONGO_URI must be set for tests"
+
+# How long the Mongo-backed fixtures wait for the database before skipping
+MONGO_PING_TIMEOUT_MS = 2000
+
 
 @pytest.fixture(scope="session")
 def app_client():
+    # The fixtures below need a live database; without one, the tests using them skip
+    uri = os.getenv("MONGO_URI")
+    if not uri:
+        pytest.skip("MONGO_URI must be set for tests that use the database")
+    try:
+        MongoClient(uri, serverSelectionTimeoutMS=MONGO_PING_TIMEOUT_MS).admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB at MONGO_URI is not reachable: {e}")
+
+    # Imported here so test modules can set their environment before app.py reads it
+    import app as server
+
+    app = server.create_app()
     app.config['TESTING'] = True
-    # Ensure Mongo config is set for testing, e.g.:
-    app.config['MONGO_URI'] = os.getenv("MONGO_URI")
+    mongo = server.mongo
 
     with app.test_client() as client:
         with app.app_context():
-            # Force Mongo to initialize
-            _ = mongo.db
-            print("Mongo DB attribute:", mongo.db)
             assert mongo.db is not None, "Mongo DB not initialized!"
             try:
                 # Ensure test user present
@@ -39,8 +50,10 @@ def app_client():
                 print("Failed DB operation:", e)
                 raise
 
-@pytest.fixture(autouse=True)
-def cleanup_test_users():
+@pytest.fixture
+def cleanup_test_users(app_client):
+    from app import mongo
+
     usernames_to_cleanup = ["newuserInit", "commonTestUser"]  # Add test users
     try:
         for username in usernames_to_cleanup:
@@ -51,7 +64,11 @@ def cleanup_test_users():
             mongo.db.users.delete_one({"username": username})
 
 @pytest.fixture
-def test_user(app_client):
+def client(app_client, cleanup_test_users):
+    return app_client
+
+@pytest.fixture
+def test_user(app_client, cleanup_test_users):
     username = "commonTestUser"
     password = "testpassword"
 
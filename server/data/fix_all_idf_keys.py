@@ -1,59 +1,17 @@
 import json
 import os
 import re
-import unicodedata
+import sys
 
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(__file__)
 BASE_DATA_DIR = os.path.join(SCRIPT_DIR, '..', 'data')
 
-PROVINCES_TO_PROCESS = ['ON', 'QC', 'AB', 'BC', 'SK', 'MB', 'NB', 'NL', 'NS']
+# Name normalization is shared with the API's station name index
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..'))
+from station_names import normalize_name  # noqa: E402
 
-# Example alias map for known station name variants
-ALIAS_MAP = {
-    'sherbrooke a': 'sherbrooke',
-    'montreal st hubert a': 'montreal st hubert',
-    'baie comeau a': 'baie comeau',
-    'lourdes de blanc sablon a': 'lourdes de blanc sablon',
-    'charlevoix (mrc)': 'charlevoix',
-    'gagnon a': 'gagnon',
-    'havre saint pierre a': 'havre saint pierre',
-    'natashquan a': 'natashquan',
-    'iles de la madeleine': 'iles de la madeleine',
-    'la pocatiere': 'la pocatiere',
-    'bagotville a': 'bagotville',
-    'roberval a': 'roberval',
-    'la baie': 'la baie',
-    'la tuque': 'la tuque',
-    'la grande riviere a': 'la grande riviere',
-    'la sarre': 'la sarre',
-    'matagami a': 'matagami',
-    'val d or': 'val d or',
-    'kuujjuaq a': 'kuujjuaq',
-    # Add more aliases here as needed
-}
-
-def normalize_name(name):
-    """Normalize station names for matching."""
-    if not name:
-        return ''
-    # Remove accents
-    name = unicodedata.normalize('NFKD', name)
-    name = ''.join([c for c in name if not unicodedata.combining(c)])
-    # Lowercase
-    name = name.lower()
-    # Remove extra punctuation and replace underscores/hyphens with spaces
-    name = re.sub(r'[\(\)\[\]\.\,]', '', name)
-    name = name.replace('_', ' ').replace('-', ' ')
-    # Remove trailing designators like ' a', ' b', or year spans e.g. ' (1963-1991)'
-    name = re.sub(r'\s+[ab]\b', '', name)
-    name = re.sub(r'\s*\(\d{4}.*\)', '', name)
-    # Collapse multiple spaces to one
-    name = ' '.join(name.split())
-    # Apply alias map
-    if name in ALIAS_MAP:
-        name = ALIAS_MAP[name]
-    return name
+PROVINCES_TO_PROCESS = ['ON', 'QC', 'AB', 'BC', 'SK', 'MB', 'NB', 'NL', 'NS']
 
 def fix_keys_for_province(province_code):
     province_dir = os.path.join(BASE_DATA_DIR, province_code)
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+STATIONS_FILE_NAME = 'master_stations_enriched_validated.json'
+CORRECTED_IDF_FILE_NAME = 'idf_data_by_station_corrected.json'
+ORIGINAL_IDF_FILE_NAME = 'idf_data_by_station.json'
+# Table 1 annual maximum series written by ingest_eccc.py, read on demand by the Gumbel engine
+ANNUAL_MAXIMA_FILE_NAME = 'annual_maxima.json'
+# Table 3 R = A*T^B coefficients written by ingest_eccc.py
+IDF_COEFFICIENTS_FILE_NAME = 'idf_coefficients.json'
+DERIVED_FILE_NAMES = (ANNUAL_MAXIMA_FILE_NAME, IDF_COEFFICIENTS_FILE_NAME)
+
+
+def province_dirs(data_dir=DATA_DIR):
+    """Return (province_code, path) for every province folder, in a stable order."""
+    return [
+        (name, os.path.join(data_dir, name))
+        for name in sorted(os.listdir(data_dir))
+        if os.path.isdir(os.path.join(data_dir, name))
+    ]
+
+
+def province_source_files(province_path):
+    """Return the (stations, idf) files load_data reads for a province; either may be None."""
+    stations_file_path = os.path.join(province_path, STATIONS_FILE_NAME)
+    if not os.path.exists(stations_file_path):
+        return None, None
+    for name in (CORRECTED_IDF_FILE_NAME, ORIGINAL_IDF_FILE_NAME):
+        idf_file_path = os.path.join(province_path, name)
+        if os.path.exists(idf_file_path):
+            return stations_file_path, idf_file_path
+    return stations_file_path, None
+
+
+def normalize_idf_keys(province_code, idf_data_raw):
+    """
+    Map IDF tables to bare station ids.
+
+    Corrected files are already keyed by station id; the original files use
+    long keys such as 'idf_v3-30_..._ON_6010738_BIG_TROUT_LAKE'.
+    Returns (idf_data, unparsed_keys).
+    """
+    if not idf_data_raw:
+        return {}, []
+    sample_key = next(iter(idf_data_raw))
+    if sample_key.isalnum():
+        return dict(idf_data_raw), []
+
+    key_regex = re.compile(fr"_{province_code}_([0-9A-Z]+)")
+    idf_data = {}
+    unparsed_keys = []
+    for long_key, idf_station_data in idf_data_raw.items():
+        match = key_regex.search(long_key)
+        if match:
+            idf_data[match.group(1)] = idf_station_data
+        else:
+            unparsed_keys.append(long_key)
+    return idf_data, unparsed_keys
+
+
+def read_province(province_code, province_path):
+    """
+    Read and normalize one province folder.
+
+    Returns None when the folder has no station file, otherwise a dict with
+    'stations', 'idf_data' (None if there is no IDF file), 'idf_file' and
+    'unparsed_keys'. JSON errors propagate to the caller.
+    """
+    stations_file_path, idf_file_path = province_source_files(province_path)
+    if stations_file_path is None:
+        return None
+
+    with open(stations_file_path, 'r', encoding='utf-8') as f:
+        stations = json.load(f)
+
+    idf_data, unparsed_keys = None, []
+    if idf_file_path:
+        with open(idf_file_path, 'r', encoding='utf-8') as f:
+            idf_data, unparsed_keys = normalize_idf_keys(province_code, json.load(f))
+
+    return {
+        'stations': stations,
+        'idf_data': idf_data,
+        'idf_file': idf_file_path,
+        'unparsed_keys': unparsed_keys,
+    }
+
+
+def read_province_timed(province_code, province_path):
+    """
+    read_province for use in a worker process.
+
+    Returns (province_code, province or None, error message or None, elapsed ms)
+    so one bad province is reported instead of aborting the whole load.
+    """
+    start = time.perf_counter()
+    province, error = None, None
+    try:
+        province = read_province(province_code, province_path)
+    except json.JSONDecodeError as e:
+        error = f"Failed to parse JSON data: {e}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return province_code, province, error, (time.perf_counter() - start) * 1000
+
+
+def read_provinces(provinces, workers):
+    """
+    Read every (province_code, path) pair, in parallel when workers > 1.
+
+    Results come back in input order. If a process pool cannot be used here
+    (some serverless sandboxes forbid it) the provinces are read serially.
+    """
+    codes = [code for code, _ in provinces]
+    paths = [path for _, path in provinces]
+    if workers > 1 and len(provinces) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(provinces))) as pool:
+                return list(pool.map(read_province_timed, codes, paths))
+        except (OSError, BrokenProcessPool, NotImplementedError) as e:
+            print(f"Warning: Parallel province loading unavailable ({e}); loading serially.")
+    return [read_province_timed(code, path) for code, path in provinces]
+
+
+def read_annual_maxima(data_dir=DATA_DIR):
+    """
+    Every province's annual maximum series as station id -> (durations, years, depths).
+
+    depths is a float array of shape (years, durations) with NaN for missing years.
+    """
+    series = {}
+    for _, province_path in province_dirs(data_dir):
+        path = os.path.join(province_path, ANNUAL_MAXIMA_FILE_NAME)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        durations = data['durations']
+        for station_id, station in data['stations'].items():
+            depths = np.asarray(station['depths'], dtype=np.float64).reshape(len(durations), len(station['years']))
+            series[station_id] = (durations, np.asarray(station['years'], dtype=np.int32), depths.T)
+    return series
+
+
+def read_idf_coefficients(data_dir=DATA_DIR):
+    """
+    Every province's Table 3 coefficients as (return_periods, station_ids, a, b).
+
+    a and b are float arrays of shape (stations, return periods), NaN where a
+    file did not publish a coefficient.
+    """
+    return_periods, station_ids, a, b = None, [], [], []
+    for _, province_path in province_dirs(data_dir):
+        path = os.path.join(province_path, IDF_COEFFICIENTS_FILE_NAME)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if return_periods is None:
+            return_periods = data['return_periods']
+        elif data['return_periods'] != return_periods:
+            print(f"Warning: {path} uses return periods {data['return_periods']}; skipped.")
+            continue
+        for station_id, coefficients in data['stations'].items():
+            station_ids.append(station_id)
+            a.append(coefficients['a'])
+            b.append(coefficients['b'])
+    columns = len(return_periods or [])
+    return (
+        return_periods or [],
+        station_ids,
+        np.asarray(a, dtype=np.float64).reshape(len(station_ids), columns),
+        np.asarray(b, dtype=np.float64).reshape(len(station_ids), columns),
+    )
+
+
+def dataset_fingerprint(data_dir=DATA_DIR):
+    """Content hash of every source file load_data and the IDF engines would read."""
+    digest = hashlib.sha256()
+    for province_code, province_path in province_dirs(data_dir):
+        derived_paths = [os.path.join(province_path, name) for name in DERIVED_FILE_NAMES]
+        for file_path in (*province_source_files(province_path), *derived_paths):
+            if file_path is None or not os.path.exists(file_path):
+                continue
+            digest.update(f"{province_code}/{os.path.basename(file_path)}\0".encode('utf-8'))
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
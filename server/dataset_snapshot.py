@@ -0,0 +1,272 @@
+"""
+Compiled, memory-mappable snapshot of every province under server/data/.
+
+Build it after changing any data file:
+
+    python dataset_snapshot.py
+
+load_data() opens the snapshot when its fingerprint (a hash of the JSON
+sources) still matches and falls back to reading the JSON files otherwise,
+so a stale or missing snapshot only costs the old startup time.
+
+File layout: an 8-byte magic, a little-endian uint32 format version, a
+uint32 header length, a JSON header, then 8-byte aligned raw arrays whose
+dtype, shape and offset are listed in the header.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from data_loader import DATA_DIR, dataset_fingerprint, province_dirs, read_province
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_MAGIC = b'IDFSNAP\x00'
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'dataset.snapshot')
+SNAPSHOT_RETURN_PERIODS = ['2', '5', '10', '25', '50', '100']
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _encode_strings(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _float_or_nan(value):
+    if value is None:
+        return math.nan
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"Non-numeric IDF value {value!r}")
+    return float(value)
+
+
+def _compile(data_dir):
+    """Read every province through the JSON path and lay it out as flat arrays."""
+    provinces = []
+    province_offsets = [0]
+    station_ids, station_records, lats, lons, station_provinces = [], [], [], [], []
+    idf_data = {}
+    idf_provinces = {}
+
+    for province_code, province_path in province_dirs(data_dir):
+        province = read_province(province_code, province_path)
+        if province is None:
+            continue
+        province_index = len(provinces)
+        provinces.append(province_code)
+        for station in province['stations']:
+            station_ids.append(str(station.get('stationId', '')))
+            station_records.append(json.dumps(station, separators=(',', ':')))
+            try:
+                lats.append(float(station['lat']))
+                lons.append(float(station['lon']))
+            except (KeyError, TypeError, ValueError):
+                lats.append(math.nan)
+                lons.append(math.nan)
+            station_provinces.append(province_index)
+        province_offsets.append(len(station_ids))
+        if province['idf_data']:
+            idf_data.update(province['idf_data'])
+            idf_provinces.update(dict.fromkeys(province['idf_data'], province_index))
+
+    durations = []
+    for table in idf_data.values():
+        for entry in table:
+            if entry.get('duration') not in durations:
+                durations.append(entry.get('duration'))
+    if any(not isinstance(d, str) for d in durations):
+        raise ValueError("IDF table with a missing or non-string duration")
+
+    max_rows = max((len(table) for table in idf_data.values()), default=0)
+    depths = np.full((len(idf_data), max_rows, len(SNAPSHOT_RETURN_PERIODS)), np.nan, dtype=np.float64)
+    row_durations = np.full((len(idf_data), max_rows), -1, dtype=np.int16)
+    expected_keys = {'duration', *SNAPSHOT_RETURN_PERIODS}
+    for i, table in enumerate(idf_data.values()):
+        for j, entry in enumerate(table):
+            if set(entry) != expected_keys:
+                raise ValueError(f"IDF row with unexpected columns: {sorted(entry)}")
+            row_durations[i, j] = durations.index(entry['duration'])
+            depths[i, j] = [_float_or_nan(entry[rp]) for rp in SNAPSHOT_RETURN_PERIODS]
+
+    arrays = {
+        'province_offsets': np.asarray(province_offsets, dtype=np.int64),
+        'station_lat': np.asarray(lats, dtype=np.float64),
+        'station_lon': np.asarray(lons, dtype=np.float64),
+        'station_province': np.asarray(station_provinces, dtype=np.uint8),
+        'idf_depths': depths,
+        'idf_row_durations': row_durations,
+        'idf_station_province': np.asarray([idf_provinces[sid] for sid in idf_data], dtype=np.uint8),
+    }
+    for name, strings in (
+        ('station_ids', station_ids),
+        ('station_records', station_records),
+        ('idf_station_ids', list(idf_data)),
+    ):
+        arrays[f'{name}_offsets'], arrays[f'{name}_blob'] = _encode_strings(strings)
+
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'fingerprint': dataset_fingerprint(data_dir),
+        'provinces': provinces,
+        'durations': durations,
+        'return_periods': SNAPSHOT_RETURN_PERIODS,
+    }
+    return header, arrays
+
+
+def build_snapshot(data_dir=DATA_DIR, output_path=SNAPSHOT_PATH):
+    header, arrays = _compile(data_dir)
+
+    directory = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = (offset + 7) & ~7
+        directory[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+    header['arrays'] = directory
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    data_start = (_PREAMBLE.size + len(header_bytes) + 7) & ~7
+
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + directory[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, output_path)
+    return header
+
+
+class DatasetSnapshot:
+    """Read-only view over a snapshot file; arrays are backed by the shared mapping."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a dataset snapshot")
+        self.version = version
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_len])
+        data_start = (_PREAMBLE.size + header_len + 7) & ~7
+
+        self.arrays = {}
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            if count == 0:
+                self.arrays[name] = np.empty(spec['shape'], dtype=dtype)
+                continue
+            self.arrays[name] = np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+
+    @property
+    def fingerprint(self):
+        return self.header['fingerprint']
+
+    @property
+    def provinces(self):
+        return self.header['provinces']
+
+    def strings(self, table, start=0, stop=None):
+        offsets = self.arrays[f'{table}_offsets']
+        stop = len(offsets) - 1 if stop is None else stop
+        offsets = offsets[start:stop + 1].tolist()
+        if not offsets or offsets[0] == offsets[-1]:
+            return [''] * max(len(offsets) - 1, 0)
+        blob = self.arrays[f'{table}_blob'][offsets[0]:offsets[-1]].tobytes()
+        base = offsets[0]
+        return [blob[offsets[i] - base:offsets[i + 1] - base].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    def province_stations(self, province_code):
+        """Rebuild the station dicts that came from one province folder."""
+        i = self.provinces.index(province_code)
+        offsets = self.arrays['province_offsets']
+        records = self.strings('station_records', offsets[i], offsets[i + 1])
+        # One decode per province is markedly cheaper than one per station
+        return json.loads('[' + ','.join(records) + ']')
+
+    def stations_by_province(self):
+        return {code: self.province_stations(code) for code in self.provinces}
+
+    def idf_station_provinces(self):
+        """Map every IDF station id to the province folder its table came from."""
+        provinces = self.provinces
+        return {
+            station_id: provinces[i]
+            for station_id, i in zip(self.strings('idf_station_ids'), self.arrays['idf_station_province'].tolist())
+        }
+
+    def idf_station_coordinates(self):
+        """(station_id, lat, lon, province_code) for every station row with an IDF table, read from the columns only."""
+        idf_ids = set(self.strings('idf_station_ids'))
+        provinces = self.provinces
+        return [
+            (station_id, lat, lon, provinces[province])
+            for station_id, lat, lon, province in zip(
+                self.strings('station_ids'),
+                self.arrays['station_lat'].tolist(),
+                self.arrays['station_lon'].tolist(),
+                self.arrays['station_province'].tolist(),
+            )
+            if station_id in idf_ids and lat == lat and lon == lon
+        ]
+
+    def idf_data(self, province_code=None):
+        """Rebuild IDF_DATA (or one province's part): station id -> list of {'duration', '<rp>': depth or None} rows."""
+        durations = self.header['durations']
+        return_periods = self.header['return_periods']
+        rows = np.arange(len(self.arrays['idf_station_province']))
+        if province_code is not None:
+            rows = np.flatnonzero(self.arrays['idf_station_province'] == self.provinces.index(province_code))
+        station_ids = self.strings('idf_station_ids')
+        depths = self.arrays['idf_depths'][rows].tolist()
+        row_durations = self.arrays['idf_row_durations'][rows].tolist()
+        idf_data = {}
+        for row, station_rows, station_durations in zip(rows.tolist(), depths, row_durations):
+            station_id = station_ids[row]
+            table = []
+            for values, duration_index in zip(station_rows, station_durations):
+                if duration_index < 0:
+                    break
+                entry = {'duration': durations[duration_index]}
+                for rp, value in zip(return_periods, values):
+                    entry[rp] = None if value != value else value
+                table.append(entry)
+            idf_data[station_id] = table
+        return idf_data
+
+
+def open_snapshot(path=SNAPSHOT_PATH, data_dir=DATA_DIR):
+    """Return the snapshot at path, or None if it is missing, unreadable or out of date."""
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = DatasetSnapshot(path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"Warning: Ignoring unreadable dataset snapshot {path}: {e}")
+        return None
+    if snapshot.version != SNAPSHOT_VERSION:
+        print(f"Warning: Dataset snapshot version {snapshot.version} does not match {SNAPSHOT_VERSION}.")
+        return None
+    if snapshot.fingerprint != dataset_fingerprint(data_dir):
+        print("Warning: Dataset snapshot is stale; the JSON data files have changed since it was built.")
+        return None
+    return snapshot
+
+
+if __name__ == '__main__':
+    output_path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    header = build_snapshot(output_path=output_path)
+    print(f"Wrote {output_path} (version {header['version']}, provinces: {', '.join(header['provinces'])}, "
+          f"{os.path.getsize(output_path)} bytes)")
@@ -0,0 +1,70 @@
+"""
+MongoDB indexes the API relies on, created when the app starts.
+
+    python db_indexes.py
+
+runs the same step by hand. create_index is a no-op for an index that already
+exists, so every worker can run it. The unique username index also makes
+/api/register safe against two sign-ups racing for one name; if the
+collection already holds duplicates it cannot be built until
+remove_duplicate_users.py has cleaned them up.
+"""
+import os
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import OperationFailure
+
+INDEXES = {
+    'users': [
+        # login and register look users up by name
+        {'keys': [('username', ASCENDING)], 'name': 'username_unique', 'unique': True},
+    ],
+    'revoked_refresh_tokens': [
+        # Entries are dropped once the token they revoke has expired
+        {'keys': [('expires_at', ASCENDING)], 'name': 'expires_at_ttl', 'expireAfterSeconds': 0},
+        # Incremental syncs read the recently revoked jtis
+        {'keys': [('revoked_at', ASCENDING)], 'name': 'revoked_at'},
+    ],
+}
+
+
+def ensure_indexes(db, indexes=INDEXES):
+    """Create any missing index; returns {collection: {index name: 'ok' or the error}}."""
+    report = {}
+    for collection_name, specs in indexes.items():
+        for spec in specs:
+            options = {key: value for key, value in spec.items() if key != 'keys'}
+            try:
+                db[collection_name].create_index(spec['keys'], **options)
+                status = 'ok'
+            except OperationFailure as e:
+                if e.code == 11000:
+                    status = f"duplicate keys, run remove_duplicate_users.py: {e}"
+                else:
+                    status = f"failed: {e}"
+            except Exception as e:  # e.g. the server is unreachable
+                status = f"failed: {e}"
+            if status != 'ok':
+                print(f"Warning: Could not create index {spec['name']} on {collection_name}: {status}")
+            report.setdefault(collection_name, {})[spec['name']] = status
+    return report
+
+
+def main():
+    load_dotenv()
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        raise SystemExit("MONGO_URI not set in environment")
+    client = MongoClient(mongo_uri)
+    try:
+        report = ensure_indexes(client.get_default_database(default=os.getenv('DB_NAME', 'contactDB')))
+    finally:
+        client.close()
+    for collection_name, statuses in report.items():
+        for name, status in statuses.items():
+            print(f"{collection_name}.{name}: {status}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Parser for ECCC short-duration rainfall IDF text files (idf_v*.txt).
+
+parse_eccc_file reads a file once, line by line, with a small state machine
+keyed on the 'Table 1', 'Table 2a', 'Table 2b' and 'Table 3' banners. Numeric
+columns come back as NumPy arrays with NaN for the -99.9 missing-data marker:
+
+    table1   annual maximum depths (mm): years x durations, plus the summary rows
+    table2a  return period depths (mm): durations x return periods
+    table2b  return period rates (mm/h) and their 95% confidence half-widths
+    table3   R = A*T^B interpolation coefficients and fit statistics per return period
+"""
+import math
+import re
+
+import numpy as np
+
+ECCC_ENCODING = 'latin-1'
+# Missing data is written as -99.9 (occasionally -99.0 or -99.90); no real value is that low
+MISSING_VALUE = -99.0
+
+_LAT_LON = re.compile(r"Latitude:\s*(\d+)\s+(\d+(?:\.\d+)?)'\s*([NS])\s*Longitude:\s*(\d+)\s+(\d+(?:\.\d+)?)'\s*([EW])")
+_ELEVATION = re.compile(r'Altitude:\s*(-?\d+(?:\.\d+)?)')
+_YEARS = re.compile(r':\s*(\d{4})\s*-\s*(\d{4})\s*#[^:]*:\s*(\d+)')
+# Fixed-width columns can overflow into '*******' and run into their neighbour
+_VALUE = re.compile(r'\*+|-?\d+(?:\.\d+)?')
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)\s+(min|h)\b')
+
+# Summary rows under Table 1 and the rows of Table 3, by the English label they start with
+_TABLE1_SUMMARY = (('# Yrs.', 'n_years'), ('Mean', 'mean'), ('Std. Dev.', 'std_dev'), ('Skew.', 'skew'), ('Kurtosis', 'kurtosis'))
+_TABLE3_ROWS = (
+    ('Mean of RR', 'mean_rate'),
+    ('Std. Dev.', 'std_dev'),
+    ('Std. Error', 'std_error'),
+    ('Coefficient (A)', 'coefficient_a'),
+    ('Exponent', 'exponent_b'),
+    ('Mean % Error', 'mean_error_pct'),
+)
+_TABLE_BANNERS = (('Table 1', 'table1'), ('Table 2a', 'table2a'), ('Table 2b', 'table2b'), ('Table 3', 'table3'))
+
+
+class ECCCParseError(ValueError):
+    """The file is not an ECCC IDF text file, or is missing its station header."""
+
+
+def _degrees(degrees, minutes, hemisphere):
+    value = float(degrees) + float(minutes) / 60
+    return -value if hemisphere in ('S', 'W') else value
+
+
+def _values(text):
+    """Floats in a row of columns; missing-data markers are kept and masked when the arrays are built."""
+    try:
+        return list(map(float, text.split()))
+    except ValueError:
+        return [math.nan if token[0] == '*' else float(token) for token in _VALUE.findall(text)]
+
+
+def _array(rows, columns=None):
+    array = np.asarray(rows, dtype=np.float64)
+    if columns is not None:
+        array = array.reshape(len(rows), columns)
+    array[array <= MISSING_VALUE] = math.nan
+    return array
+
+
+def _row_label(line, labels):
+    """(key, rest of the line) for the first label the line starts with, or (None, None)."""
+    for prefix, key in labels:
+        if line.startswith(prefix):
+            return key, line[len(prefix):]
+    return None, None
+
+
+def _duration_prefix(line):
+    """Split '5 min  80.6 ...' into ('5 min', '80.6 ...'), or None if the line is not a duration row."""
+    parts = line.split(None, 2)
+    if len(parts) < 2 or parts[1] not in ('min', 'h'):
+        return None
+    try:
+        float(parts[0])
+    except ValueError:
+        return None
+    return f'{parts[0]} {parts[1]}', parts[2] if len(parts) > 2 else ''
+
+
+def parse_station_line(line):
+    """Split ' BIG TROUT LAKE     ON     6010738' into (name, province, station_id)."""
+    fields = re.split(r'\s{2,}', line.strip())
+    if len(fields) < 3:
+        return None
+    return ' '.join(fields[:-2]), fields[-2], fields[-1]
+
+
+def parse_eccc_file(path):
+    """
+    Parse the station header and all four tables of one file.
+
+    Returns a dict with stationName, province, stationId, lat, lon,
+    elevation (m), first_year, last_year, years_of_record and one dict per
+    table (see the module docstring). Raises ECCCParseError if the station
+    header cannot be found.
+    """
+    header = {}
+    separators = 0
+    state = 'header'
+
+    durations_1, years_1, rows_1, summary_1 = [], [], [], {}
+    return_periods = []
+    durations_2a, rows_2a, n_years_2a = [], [], []
+    durations_2b, rows_2b, confidence_2b, n_years_2b = [], [], [], []
+    rows_3 = {}
+
+    with open(path, 'r', encoding=ECCC_ENCODING) as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped:
+                continue
+
+            if state == 'header':
+                if stripped.startswith('===='):
+                    separators += 1
+                    if separators == 2:
+                        state = 'body'
+                elif separators == 1:
+                    if 'station' not in header:
+                        header['station'] = parse_station_line(stripped)
+                    elif stripped.startswith('Latitude'):
+                        match = _LAT_LON.search(stripped)
+                        if match:
+                            header['lat'] = _degrees(*match.group(1, 2, 3))
+                            header['lon'] = _degrees(*match.group(4, 5, 6))
+                        match = _ELEVATION.search(stripped)
+                        if match:
+                            header['elevation'] = float(match.group(1))
+                    elif stripped.startswith('Years'):
+                        match = _YEARS.search(stripped)
+                        if match:
+                            header['years'] = tuple(int(v) for v in match.groups())
+                continue
+
+            if stripped.startswith('Table'):
+                for banner, name in _TABLE_BANNERS:
+                    if stripped.startswith(banner):
+                        state = name
+                        break
+                continue
+
+            if state == 'table1':
+                if not durations_1:
+                    if stripped.startswith('Year'):
+                        durations_1 = [f'{v} {unit}' for v, unit in _DURATION.findall(stripped)]
+                    continue
+                if not summary_1 and stripped[:4].isdigit():
+                    values = _values(stripped[4:])
+                    if len(values) == len(durations_1):
+                        years_1.append(int(stripped[:4]))
+                        rows_1.append(values)
+                    continue
+                key, rest = _row_label(stripped, _TABLE1_SUMMARY)
+                if key and key not in summary_1:
+                    summary_1[key] = _values(rest)[:len(durations_1)]
+
+            elif state in ('table2a', 'table2b'):
+                if not return_periods or stripped.startswith('Duration'):
+                    if stripped.startswith('Duration'):
+                        return_periods = re.findall(r'\d+', stripped)
+                    continue
+                if state == 'table2b' and stripped.startswith('+/-'):
+                    confidence_2b.append(_values(stripped.replace('+/-', ' '))[:len(return_periods)])
+                    continue
+                row = _duration_prefix(stripped)
+                if row is None:
+                    continue
+                duration, rest = row
+                values = _values(rest)
+                numbers = values[:len(return_periods)]
+                if len(numbers) != len(return_periods):
+                    continue
+                n_years = values[len(return_periods)] if len(values) > len(return_periods) else 0
+                n_years = 0 if n_years != n_years else int(n_years)
+                if state == 'table2a':
+                    durations_2a.append(duration)
+                    rows_2a.append(numbers)
+                    n_years_2a.append(n_years)
+                else:
+                    durations_2b.append(duration)
+                    rows_2b.append(numbers)
+                    n_years_2b.append(n_years)
+
+            elif state == 'table3':
+                key, rest = _row_label(stripped, _TABLE3_ROWS)
+                if key and key not in rows_3:
+                    # Labels are bilingual ('Exponent/Exposant (B)'); the values are the last columns
+                    values = _values(rest)
+                    rows_3[key] = values[len(values) - len(return_periods):]
+
+    if not header.get('station') or 'lat' not in header:
+        raise ECCCParseError(f"{path}: no ECCC station header")
+    station_name, province, station_id = header['station']
+    first_year, last_year, years_of_record = header.get('years', (None, None, None))
+
+    return {
+        'stationName': station_name,
+        'province': province,
+        'stationId': station_id,
+        'lat': header['lat'],
+        'lon': header['lon'],
+        'elevation': header.get('elevation'),
+        'first_year': first_year,
+        'last_year': last_year,
+        'years_of_record': years_of_record,
+        'table1': {
+            'durations': durations_1,
+            'years': np.asarray(years_1, dtype=np.int32),
+            'depths': _array(rows_1, len(durations_1)),
+            'n_years': np.nan_to_num(summary_1.get('n_years', [0] * len(durations_1))).astype(np.int32),
+            **{
+                key: _array(summary_1.get(key, [math.nan] * len(durations_1)))
+                for _, key in _TABLE1_SUMMARY[1:]
+            },
+        },
+        'table2a': {
+            'durations': durations_2a,
+            'return_periods': return_periods,
+            'depths': _array(rows_2a, len(return_periods)),
+            'n_years': np.asarray(n_years_2a, dtype=np.int32),
+        },
+        'table2b': {
+            'durations': durations_2b,
+            'return_periods': return_periods,
+            'rates': _array(rows_2b, len(return_periods)),
+            'confidence': _array(confidence_2b, len(return_periods)),
+            'n_years': np.asarray(n_years_2b, dtype=np.int32),
+        },
+        'table3': {
+            'return_periods': return_periods,
+            **{
+                key: _array(rows_3.get(key, [math.nan] * len(return_periods)))
+                for _, key in _TABLE3_ROWS
+            },
+        },
+    }
+
+
+def idf_rows(station):
+    """Table 2a as the [{'duration': '5 min', '2': mm, ...}] rows stored in idf_data_by_station*.json."""
+    table = station['table2a']
+    rows = []
+    for duration, depths in zip(table['durations'], table['depths'].tolist()):
+        row = {'duration': duration}
+        row.update((rp, None if value != value else value) for rp, value in zip(table['return_periods'], depths))
+        rows.append(row)
+    return rows
+
+
+def station_record(station):
+    """The master_stations_enriched_validated.json entry for a parsed file."""
+    record = {key: station[key] for key in ('stationName', 'province', 'stationId', 'lat', 'lon')}
+    record['idf_data'] = idf_rows(station)
+    return record
+
+
+def to_json(station):
+    """JSON-safe copy of a parsed file: arrays become lists, NaN becomes None."""
+    def encode(value):
+        if isinstance(value, dict):
+            return {key: encode(item) for key, item in value.items()}
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind == 'f':
+                return np.where(np.isnan(value), None, value).tolist()
+            return value.tolist()
+        return value
+    return encode(station)
+
+
+def from_json(data):
+    """Inverse of to_json."""
+    station = dict(data)
+    for name in ('table1', 'table2a', 'table2b', 'table3'):
+        table = dict(data[name])
+        for key, value in table.items():
+            if key in ('durations', 'return_periods'):
+                continue
+            dtype = np.int32 if key in ('years', 'n_years') else np.float64
+            array = np.asarray(value, dtype=dtype)
+            if key in ('depths', 'rates', 'confidence'):
+                columns = len(table['durations']) if name == 'table1' else len(table['return_periods'])
+                array = array.reshape(len(value), columns)
+            table[key] = array
+        station[name] = table
+    return station
@@ -1,54 +1,85 @@
 # free_access.py
 
 from functools import wraps
-from flask import request, jsonify, g
+from flask import jsonify, g
 from datetime import datetime, timedelta, timezone
 #from pymongo import MongoClient
 from db import mongo  # Use the shared Flask-PyMongo instance
 
-import os
+import time
 
 # Set up your DB connection here (or import from your main app module)
 db = mongo.db
 
 DEFAULT_TRIAL_DAYS = 7  # configurable default
 
-def is_trial_active(user):
+def trial_end(user):
+    """When the user's trial runs out (aware datetime), or None without a trial_start."""
     try:
         trial_start = user.get('trial_start')
-        
+
         if not trial_start:
-            return False
-        
+            return None
+
         if isinstance(trial_start, str):
             trial_start = datetime.fromisoformat(trial_start)
-            # Make timezone-aware if naive
-            if trial_start.tzinfo is None:
-                trial_start = trial_start.replace(tzinfo=timezone.utc)
+        # Make timezone-aware if naive
+        if trial_start.tzinfo is None:
+            trial_start = trial_start.replace(tzinfo=timezone.utc)
         duration = user.get('trial_duration_days', DEFAULT_TRIAL_DAYS)
-        now = datetime.now(timezone.utc)
-        return trial_start + timedelta(days=duration) > now
-        
+        return trial_start + timedelta(days=duration)
+
     except Exception as e:
         print('Trial check error:', str(e))
-        return False
+        return None
+
+def is_trial_active(user):
+    end = trial_end(user)
+    return end is not None and end > datetime.now(timezone.utc)
+
+def entitlement_claims(user):
+    """
+    Access-token claims that let require_trial_access decide without loading
+    the user: the role and the trial end as a Unix timestamp (None if no trial).
+    """
+    end = trial_end(user)
+    return {'role': user.get('role', 'user'), 'trial_end': int(end.timestamp()) if end else None}
+
+def has_trial_access(user=None, claims=None):
+    """Trial check from token claims when the token carries them, else from the user document."""
+    if claims is not None and 'role' in claims:
+        if claims['role'] == 'admin':
+            return True
+        return claims.get('trial_end') is not None and claims['trial_end'] > time.time()
+    # Exempt admin user roles from trial expiration checks
+    return user.get('role') == 'admin' or is_trial_active(user)
 
 def require_trial_access(f):
-    
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Tokens issued with entitlement_claims are decided without a database hit;
+        # older tokens fall back to the user document
+        claims = getattr(g, 'token_claims', None)
+        user = None
+        if claims is None or 'role' not in claims:
+            user = getattr(g, 'user', None)
+            if not user:
+                return jsonify({'error': 'Login required.'}), 401
+        if has_trial_access(user, claims):
+            return f(*args, **kwargs)
+        return jsonify({'error': 'Your free trial has expired. Please upgrade.'}), 403
+    return decorated_function
+
+
+def require_admin(f):
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from flask import g, jsonify
-        print("require_trial_access DECORATOR CALLED")    # <--- Add this line
         user = getattr(g, 'user', None)
         if not user:
-            print("NO USER, returning 401")              # <--- Add this line
             return jsonify({'error': 'Login required.'}), 401
-        # Exempt admin user roles from trial expiration checks
-        if user.get('role') == 'admin':
-            return f(*args, **kwargs)
-        if is_trial_active(user):
-            print("TRIAL ACTIVE, access allowed")        # <--- Add this
-            return f(*args, **kwargs)
-        print("TRIAL EXPIRED, returning 403")            # <--- Add this
-        return jsonify({'error': 'Your free trial has expired. Please upgrade.'}), 403
+        if user.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required.'}), 403
+        return f(*args, **kwargs)
     return decorated_function
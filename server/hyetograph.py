@@ -0,0 +1,159 @@
+"""
+Design storm hyetographs built from a station's IDF depth table.
+
+Every generator works on all return periods at once: depths are arrays of
+shape (time steps, return periods), in mm per step.
+
+    alternating_block  blocks from the depth-duration curve, largest in the middle
+    chicago            Keifer-Chu storm from an i = a * t^b fit of the IDF curve
+    scs_type_ii        NRCS Type II 24 h mass curve, scaled to the IDF depth
+"""
+import numpy as np
+
+from idf_tables import RETURN_PERIODS, duration_to_minutes
+
+METHODS = ('alternating_block', 'chicago', 'scs_type_ii')
+MIN_DURATION_MINUTES = 5
+MAX_DURATION_MINUTES = 24 * 60
+# Share of the storm before its peak for the Chicago method
+CHICAGO_PEAK_RATIO = 0.5
+
+# NRCS (TR-55) Type II cumulative rainfall fraction over 24 h, by hour
+SCS_TYPE_II_HOURS = np.array([
+    0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 11.5, 11.75, 12, 12.5, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24,
+])
+SCS_TYPE_II_FRACTIONS = np.array([
+    0, .011, .022, .035, .048, .063, .080, .098, .120, .147, .181, .235, .283, .357, .663, .735, .772, .820,
+    .854, .880, .902, .921, .938, .952, .965, .977, .989, 1.0,
+])
+
+
+def depth_table(idf_station_data):
+    """
+    Split IDF_DATA rows into (minutes, depths): durations sorted ascending and
+    a (durations, RETURN_PERIODS) depth array with NaN for missing values.
+    """
+    rows = []
+    for entry in idf_station_data:
+        minutes = duration_to_minutes(entry.get('duration'))
+        if minutes:
+            rows.append((minutes, [
+                np.nan if entry.get(rp) is None else float(entry[rp]) for rp in RETURN_PERIODS
+            ]))
+    rows.sort(key=lambda row: row[0])
+    minutes = np.array([row[0] for row in rows], dtype=np.float64)
+    depths = np.array([row[1] for row in rows], dtype=np.float64).reshape(len(rows), len(RETURN_PERIODS))
+    return minutes, depths
+
+
+def interpolate_depths(minutes, depths, t):
+    """
+    Depth at durations t for every return period, interpolated log-log.
+
+    Below the shortest tabulated duration the first segment's slope is
+    extended; return periods with fewer than two values give NaN.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    out = np.full((len(t), depths.shape[1]), np.nan)
+    log_t = np.log(t)
+    for column in range(depths.shape[1]):
+        valid = ~np.isnan(depths[:, column]) & (depths[:, column] > 0)
+        if valid.sum() < 2:
+            continue
+        x, y = np.log(minutes[valid]), np.log(depths[valid, column])
+        values = np.interp(log_t, x, y)
+        below = log_t < x[0]
+        values[below] = y[0] + (log_t[below] - x[0]) * (y[1] - y[0]) / (x[1] - x[0])
+        above = log_t > x[-1]
+        values[above] = y[-1] + (log_t[above] - x[-1]) * (y[-1] - y[-2]) / (x[-1] - x[-2])
+        out[:, column] = np.exp(values)
+    return out
+
+
+def _step_ends(duration, time_step):
+    return np.arange(1, duration // time_step + 1, dtype=np.float64) * time_step
+
+
+def alternating_block(minutes, depths, duration, time_step):
+    ends = _step_ends(duration, time_step)
+    cumulative = interpolate_depths(minutes, depths, ends)
+    blocks = np.diff(cumulative, axis=0, prepend=0.0)
+    # Largest block in the middle, the rest alternating right then left of it
+    n = len(ends)
+    center = (n - 1) // 2
+    offsets = np.arange(n)
+    positions = center + np.where(offsets % 2 == 1, (offsets + 1) // 2, -(offsets // 2))
+    ordered = -np.sort(-blocks, axis=0)
+    hyetograph = np.empty_like(blocks)
+    hyetograph[positions] = ordered
+    return hyetograph
+
+
+def fit_power_law(minutes, depths):
+    """Least-squares (a, b) of i = a * t^b per return period; i in mm/h, t in minutes."""
+    a = np.full(depths.shape[1], np.nan)
+    b = np.full(depths.shape[1], np.nan)
+    intensities = depths / (minutes[:, None] / 60.0)
+    for column in range(depths.shape[1]):
+        valid = ~np.isnan(intensities[:, column]) & (intensities[:, column] > 0)
+        if valid.sum() < 2:
+            continue
+        slope, intercept = np.polyfit(np.log(minutes[valid]), np.log(intensities[valid, column]), 1)
+        a[column], b[column] = np.exp(intercept), slope
+    return a, b
+
+
+def chicago(minutes, depths, duration, time_step, peak_ratio=CHICAGO_PEAK_RATIO):
+    a, b = fit_power_law(minutes, depths)
+
+    def window_depth(width):
+        # Depth of the most intense window of this width, mm
+        return a * np.power(width[:, None], 1 + b) / 60.0
+
+    peak = peak_ratio * duration
+    edges = np.arange(0, duration // time_step + 1, dtype=np.float64) * time_step
+    before = edges <= peak
+    cumulative = np.empty((len(edges), len(a)))
+    cumulative[before] = peak_ratio * (
+        window_depth(np.array([peak / peak_ratio])) - window_depth((peak - edges[before]) / peak_ratio)
+    )
+    cumulative[~before] = peak_ratio * window_depth(np.array([peak / peak_ratio])) + (1 - peak_ratio) * window_depth(
+        (edges[~before] - peak) / (1 - peak_ratio)
+    )
+    return np.diff(cumulative, axis=0)
+
+
+def scs_type_ii(minutes, depths, duration, time_step):
+    """Type II distribution over the central `duration` of the 24 h curve, scaled to the IDF depth for that duration."""
+    start = 12 * 60 - duration / 2
+    edges = start + np.arange(0, duration // time_step + 1, dtype=np.float64) * time_step
+    fractions = np.interp(edges / 60.0, SCS_TYPE_II_HOURS, SCS_TYPE_II_FRACTIONS)
+    fractions = (fractions - fractions[0]) / (fractions[-1] - fractions[0])
+    total = interpolate_depths(minutes, depths, [duration])[0]
+    return np.diff(fractions)[:, None] * total[None, :]
+
+
+GENERATORS = {
+    'alternating_block': alternating_block,
+    'chicago': chicago,
+    'scs_type_ii': scs_type_ii,
+}
+
+
+def validate_storm(duration, time_step):
+    """Raise ValueError unless duration (minutes) and time step describe a supported storm."""
+    if not MIN_DURATION_MINUTES <= duration <= MAX_DURATION_MINUTES:
+        raise ValueError(f"duration must be between {MIN_DURATION_MINUTES} and {MAX_DURATION_MINUTES} minutes")
+    if time_step < 1 or duration % time_step:
+        raise ValueError("timeStep must be a whole number of minutes that divides the duration")
+
+
+def build_hyetographs(idf_station_data, method, duration, time_step):
+    """
+    Hyetographs of one station for every return period in RETURN_PERIODS.
+
+    Returns (step end times in minutes, depths of shape (steps, return periods)).
+    """
+    validate_storm(duration, time_step)
+    minutes, depths = depth_table(idf_station_data)
+    return _step_ends(duration, time_step), GENERATORS[method](minutes, depths, duration, time_step)
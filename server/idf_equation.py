@@ -0,0 +1,81 @@
+"""
+Continuous IDF intensities from the ECCC Table 3 interpolation equation.
+
+Each station publishes, per return period, R = A * T^B with R in mm/h and T
+the duration in hours, fitted over the tabulated 5 min to 24 h durations.
+Evaluations are broadcast over stations x durations x return periods in one
+NumPy expression.
+"""
+import threading
+
+import numpy as np
+
+# The equation is only fitted over the tabulated range
+MIN_DURATION_MINUTES = 5
+MAX_DURATION_MINUTES = 24 * 60
+MAX_EVALUATIONS = 500_000
+
+
+class IDFEquation:
+    """
+    Table 3 coefficients for every station, loaded on first use.
+
+    load_coefficients() returns (return_periods, station_ids, a, b) with a and
+    b of shape (stations, return periods).
+    """
+
+    def __init__(self, load_coefficients):
+        self._load_coefficients = load_coefficients
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def _tables(self):
+        if self._loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    return_periods, station_ids, a, b = self._load_coefficients()
+                    rows = {station_id: i for i, station_id in enumerate(station_ids)}
+                    self._loaded = (return_periods, rows, a, b)
+        return self._loaded
+
+    def reset(self):
+        """Forget the coefficients; the next use loads them again."""
+        with self._lock:
+            self._loaded = None
+
+    @property
+    def return_periods(self):
+        return self._tables()[0]
+
+    def has_station(self, station_id):
+        return station_id in self._tables()[1]
+
+    def intensities(self, station_ids, durations_minutes, return_periods):
+        """
+        Intensity (mm/h) array of shape (stations, durations, return periods).
+
+        Unknown stations and return periods raise KeyError; durations outside
+        the fitted range raise ValueError. Coefficients a file did not
+        publish give NaN.
+        """
+        published, rows, a, b = self._tables()
+        durations = np.asarray(durations_minutes, dtype=np.float64)
+        if durations.size and (
+            np.isnan(durations).any()
+            or durations.min() < MIN_DURATION_MINUTES
+            or durations.max() > MAX_DURATION_MINUTES
+        ):
+            raise ValueError(f"durations must be between {MIN_DURATION_MINUTES} and {MAX_DURATION_MINUTES} minutes")
+        missing = [station_id for station_id in station_ids if station_id not in rows]
+        if missing:
+            raise KeyError(missing)
+        unknown = [rp for rp in return_periods if rp not in published]
+        if unknown:
+            raise KeyError(unknown)
+
+        station_rows = np.fromiter((rows[s] for s in station_ids), dtype=np.intp, count=len(station_ids))
+        rp_columns = np.fromiter((published.index(rp) for rp in return_periods), dtype=np.intp, count=len(return_periods))
+        a_sel = a[np.ix_(station_rows, rp_columns)][:, None, :]
+        b_sel = b[np.ix_(station_rows, rp_columns)][:, None, :]
+        hours = (durations / 60.0)[None, :, None]
+        return a_sel * hours ** b_sel
@@ -0,0 +1,216 @@
+"""
+Precomputed lat/lon grid of IDF depths covering Canada.
+
+Build it after changing any data file (and after dataset_snapshot.py, which
+it does not depend on):
+
+    python idf_raster.py [--step 0.1] [--neighbours 4] [--power 2]
+
+Every cell holds the inverse-distance-weighted blend of the depth tables of
+its k nearest IDF stations, evaluated at the cell centre, on the standard
+durations x RETURN_PERIODS. Cells farther than MAX_DISTANCE_KM from every
+station are NaN. The server maps the file read-only, so a point or tile
+query is index arithmetic on pages the OS shares between worker processes.
+
+File layout: an 8-byte magic, a little-endian uint32 format version, a
+uint32 header length, a JSON header, then one 8-byte aligned float32
+array of shape (rows, cols, durations, return periods), row 0 at the south.
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from data_loader import DATA_DIR, dataset_fingerprint, province_dirs, read_province
+from hyetograph import depth_table, interpolate_depths
+from idf_tables import RETURN_PERIODS
+from idw import DEFAULT_NEIGHBOURS, DEFAULT_POWER, blend, inverse_distance_weights
+from rational import DURATION_GRID_MINUTES
+from spatial_index import StationMatrix
+
+RASTER_VERSION = 1
+RASTER_MAGIC = b'IDFGRID\x00'
+RASTER_PATH = os.path.join(DATA_DIR, 'idf_raster.grid')
+# south, west, north, east in degrees
+CANADA_BOUNDS = (41.5, -141.5, 83.5, -52.0)
+DEFAULT_STEP = 0.1
+MAX_DISTANCE_KM = 250
+MAX_TILE_CELLS = 250_000
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def read_idf_stations(data_dir=DATA_DIR):
+    """
+    Coordinates and depth tables of every station load_data would index.
+
+    Returns (lats, lons, depths) with depths (stations, DURATION_GRID_MINUTES,
+    RETURN_PERIODS) resampled log-log onto the standard durations.
+    """
+    lats, lons, tables = [], [], []
+    for province_code, province_path in province_dirs(data_dir):
+        province = read_province(province_code, province_path)
+        if province is None or not province['idf_data']:
+            continue
+        for station in province['stations']:
+            idf_station_data = province['idf_data'].get(str(station.get('stationId')))
+            if not idf_station_data:
+                continue
+            try:
+                lat, lon = float(station['lat']), float(station['lon'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            minutes, depths = depth_table(idf_station_data)
+            if len(minutes) < 2:
+                continue
+            lats.append(lat)
+            lons.append(lon)
+            tables.append(interpolate_depths(minutes, depths, DURATION_GRID_MINUTES))
+    return np.asarray(lats), np.asarray(lons), np.asarray(tables).reshape(-1, len(DURATION_GRID_MINUTES), len(RETURN_PERIODS))
+
+
+def build_raster(data_dir=DATA_DIR, output_path=RASTER_PATH, step=DEFAULT_STEP, k=DEFAULT_NEIGHBOURS,
+                 power=DEFAULT_POWER, bounds=CANADA_BOUNDS, max_distance_km=MAX_DISTANCE_KM):
+    south, west, north, east = bounds
+    rows, cols = int(round((north - south) / step)), int(round((east - west) / step))
+    lats, lons, station_depths = read_idf_stations(data_dir)
+    if not len(lats):
+        raise ValueError("no IDF stations to interpolate")
+    matrix = StationMatrix([{'lat': lat, 'lon': lon} for lat, lon in zip(lats, lons)], [None] * len(lats))
+
+    header = {
+        'version': RASTER_VERSION,
+        'fingerprint': dataset_fingerprint(data_dir),
+        'bounds': [south, west, north, east],
+        'step': step,
+        'shape': [rows, cols, len(DURATION_GRID_MINUTES), len(RETURN_PERIODS)],
+        'durations': DURATION_GRID_MINUTES.astype(int).tolist(),
+        'return_periods': RETURN_PERIODS,
+        'neighbours': k,
+        'power': power,
+        'max_distance_km': max_distance_km,
+        'stations': len(lats),
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    data_start = (_PREAMBLE.size + len(header_bytes) + 7) & ~7
+
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(RASTER_MAGIC, RASTER_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.seek(data_start)
+        cell_lons = west + (np.arange(cols) + 0.5) * step
+        # One grid row at a time keeps the build's memory flat
+        for row in range(rows):
+            cell_lats = np.full(cols, south + (row + 0.5) * step)
+            positions, distances = matrix.k_nearest_positions(cell_lats, cell_lons, k)
+            depths, _ = blend(station_depths[positions], inverse_distance_weights(distances, power))
+            depths[distances[:, 0] > max_distance_km] = np.nan
+            f.write(depths.astype('<f4').tobytes())
+    os.replace(tmp_path, output_path)
+    return header
+
+
+class IDFRaster:
+    """Read-only view over a raster file; the depth array is backed by the shared mapping."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != RASTER_MAGIC:
+            raise ValueError(f"{path} is not an IDF raster")
+        self.version = version
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_len])
+        data_start = (_PREAMBLE.size + header_len + 7) & ~7
+        shape = self.header['shape']
+        self.depths = np.frombuffer(
+            self._mmap, dtype='<f4', count=int(np.prod(shape, dtype=np.int64)), offset=data_start
+        ).reshape(shape)
+        self.south, self.west, self.north, self.east = self.header['bounds']
+        self.step = self.header['step']
+        self.durations = self.header['durations']
+        self.return_periods = self.header['return_periods']
+
+    @property
+    def fingerprint(self):
+        return self.header['fingerprint']
+
+    def cell_index(self, lat, lon):
+        """(row, col) of the cell containing a point, or None outside the grid."""
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        row = math.floor((lat - self.south) / self.step)
+        col = math.floor((lon - self.west) / self.step)
+        if 0 <= row < self.depths.shape[0] and 0 <= col < self.depths.shape[1]:
+            return row, col
+        return None
+
+    def cell_center(self, row, col):
+        return self.south + (row + 0.5) * self.step, self.west + (col + 0.5) * self.step
+
+    def point(self, lat, lon):
+        """((row, col), depths (durations x return periods)) for a point, or None outside the grid."""
+        index = self.cell_index(lat, lon)
+        if index is None:
+            return None
+        return index, self.depths[index]
+
+    def tile(self, south, west, north, east, duration_index, return_period_index, stride=1):
+        """
+        Depths of one duration and return period over a bounding box.
+
+        Returns (first row, first col, view of shape (rows, cols)) with rows
+        from south to north, every stride-th cell; raises ValueError when the
+        box misses the grid or covers more than MAX_TILE_CELLS cells.
+        """
+        if not all(map(math.isfinite, (south, west, north, east))):
+            raise ValueError("the box bounds must be finite")
+        rows, cols = self.depths.shape[:2]
+        row0 = max(0, math.floor((south - self.south) / self.step))
+        row1 = min(rows, math.floor((north - self.south) / self.step) + 1)
+        col0 = max(0, math.floor((west - self.west) / self.step))
+        col1 = min(cols, math.floor((east - self.west) / self.step) + 1)
+        if row0 >= row1 or col0 >= col1:
+            raise ValueError("the box does not overlap the grid")
+        if math.ceil((row1 - row0) / stride) * math.ceil((col1 - col0) / stride) > MAX_TILE_CELLS:
+            raise ValueError(f"the tile covers more than {MAX_TILE_CELLS} cells; use a larger stride")
+        return row0, col0, self.depths[row0:row1:stride, col0:col1:stride, duration_index, return_period_index]
+
+
+def open_raster(path=RASTER_PATH, fingerprint=None, data_dir=DATA_DIR):
+    """Return the raster at path, or None if it is missing, unreadable or built from other data."""
+    if not os.path.exists(path):
+        return None
+    try:
+        raster = IDFRaster(path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"Warning: Ignoring unreadable IDF raster {path}: {e}")
+        return None
+    if raster.version != RASTER_VERSION:
+        print(f"Warning: IDF raster version {raster.version} does not match {RASTER_VERSION}.")
+        return None
+    if raster.fingerprint != (fingerprint or dataset_fingerprint(data_dir)):
+        print("Warning: IDF raster is stale; rebuild it with python idf_raster.py.")
+        return None
+    return raster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the gridded IDF raster from the station data.")
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP, help="Cell size in degrees")
+    parser.add_argument('--neighbours', type=int, default=DEFAULT_NEIGHBOURS, help="Stations blended per cell")
+    parser.add_argument('--power', type=float, default=DEFAULT_POWER, help="Inverse distance weighting power")
+    parser.add_argument('--output', default=RASTER_PATH)
+    args = parser.parse_args()
+    header = build_raster(output_path=args.output, step=args.step, k=args.neighbours, power=args.power)
+    print(f"Wrote {args.output} ({header['shape'][0]} x {header['shape'][1]} cells from {header['stations']} stations, "
+          f"{os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
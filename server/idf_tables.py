@@ -0,0 +1,57 @@
+import json
+
+RETURN_PERIODS = ['2', '5', '10', '25', '50', '100']
+
+
+def duration_to_minutes(duration_str):
+    if not isinstance(duration_str, str):
+        return None
+    duration_str = duration_str.lower().strip()
+    if 'min' in duration_str:
+        return int(duration_str.replace('min', '').strip())
+    elif 'h' in duration_str:
+        return int(float(duration_str.replace('h', '').strip()) * 60)
+    return None
+
+
+def build_intensity_curve(idf_station_data):
+    """Convert a station's depth table (mm per duration) into intensities (mm/h) sorted by duration."""
+    processed_data = []
+    for entry in idf_station_data:
+        duration_in_minutes = duration_to_minutes(entry.get('duration'))
+        if duration_in_minutes is not None and duration_in_minutes > 0:
+            data_point = {'duration': duration_in_minutes}
+            for rp in RETURN_PERIODS:
+                depth = entry.get(rp)
+                if depth is not None:
+                    try:
+                        data_point[rp] = float(depth) / (duration_in_minutes / 60.0)
+                    except (ValueError, TypeError):
+                        continue
+            if len(data_point) > 1:
+                processed_data.append(data_point)
+
+    processed_data.sort(key=lambda x: x['duration'])
+    return processed_data
+
+
+def serialize_curve(curve):
+    return json.dumps({"data": curve}, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def build_curve_tables(idf_data):
+    """
+    Precompute the /api/idf/curves payload for every station.
+
+    Returns (curves, curves_json): the structured curve per station id and
+    the response body already serialized to bytes.
+    """
+    curves = {}
+    curves_json = {}
+    for station_id, idf_station_data in idf_data.items():
+        if not idf_station_data:
+            continue
+        curve = build_intensity_curve(idf_station_data)
+        curves[station_id] = curve
+        curves_json[station_id] = serialize_curve(curve)
+    return curves, curves_json
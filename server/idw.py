@@ -0,0 +1,91 @@
+"""
+Inverse-distance-weighted (IDW) blending of neighbouring stations' IDF curves.
+
+A site between stations gets, for every duration and return period,
+sum(w_k * i_k) / sum(w_k) with w_k = 1 / d_k^power over the stations that
+have a value there. A site within SNAP_DISTANCE_KM of a station takes that
+station's curve unchanged.
+"""
+import math
+
+import numpy as np
+
+from idf_tables import RETURN_PERIODS
+from spatial_index import EARTH_RADIUS_KM
+
+DEFAULT_NEIGHBOURS = 4
+MAX_NEIGHBOURS = 10
+DEFAULT_POWER = 2.0
+MAX_POWER = 6.0
+SNAP_DISTANCE_KM = 0.05
+# Sites are rounded to this many degrees (about 1 km) so nearby map clicks share a neighbour lookup;
+# distances and weights still come from the exact site
+COORDINATE_QUANTUM = 0.01
+# Farthest a site can be from the point it is rounded to
+CELL_RADIUS_KM = math.radians(COORDINATE_QUANTUM / math.sqrt(2)) * EARTH_RADIUS_KM
+
+
+def quantize(value):
+    return round(round(value / COORDINATE_QUANTUM) * COORDINATE_QUANTUM, 6)
+
+
+def inverse_distance_weights(distances_km, power=DEFAULT_POWER):
+    """
+    Normalized weights along the last axis of distances_km; a site closer than
+    SNAP_DISTANCE_KM to a station puts all its weight on the first such station.
+    """
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    snapped = distances_km < SNAP_DISTANCE_KM
+    with np.errstate(divide='ignore'):
+        weights = np.where(snapped, 0.0, distances_km) ** -power
+    at_station = snapped.any(axis=-1)
+    if at_station.any():
+        first = snapped.argmax(axis=-1)[..., None]
+        one_hot = np.arange(distances_km.shape[-1]) == first
+        weights = np.where(at_station[..., None], one_hot.astype(np.float64), weights)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+def blend(values, weights):
+    """
+    Weighted mean over the station axis of values (..., stations, durations,
+    return periods) with weights (..., stations), skipping NaN values.
+
+    Returns (blended, total weight per cell); cells no station has are NaN.
+    """
+    valid = ~np.isnan(values)
+    w = np.where(valid, weights[..., None, None], 0.0)
+    total = w.sum(axis=-3)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        blended = (w * np.where(valid, values, 0.0)).sum(axis=-3) / total
+    return blended, total
+
+
+def curve_matrix(curves):
+    """(durations, values): the union of durations and a (stations, durations, RETURN_PERIODS) array, NaN where missing."""
+    durations = sorted({row['duration'] for curve in curves for row in curve})
+    column = {duration: i for i, duration in enumerate(durations)}
+    values = np.full((len(curves), len(durations), len(RETURN_PERIODS)), np.nan)
+    for s, curve in enumerate(curves):
+        for row in curve:
+            values[s, column[row['duration']]] = [row.get(rp, np.nan) for rp in RETURN_PERIODS]
+    return durations, values
+
+
+def blend_curves(curves, distances_km, power=DEFAULT_POWER):
+    """
+    Blend IDF_CURVES rows of several stations into one curve in the same layout.
+
+    Returns (rows, weights); a value is left out when no station has it.
+    """
+    weights = inverse_distance_weights(distances_km, power)
+    durations, values = curve_matrix(curves)
+    blended, total = blend(values, weights)
+
+    rows = []
+    for duration, row_values, row_total in zip(durations, blended.tolist(), total.tolist()):
+        row = {'duration': duration}
+        row.update((rp, value) for rp, value, weight in zip(RETURN_PERIODS, row_values, row_total) if weight > 0)
+        if len(row) > 1:
+            rows.append(row)
+    return rows, weights
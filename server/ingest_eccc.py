@@ -0,0 +1,295 @@
+"""
+Incremental ingestion of the ECCC IDF text files under server/data/*/*_txt_files.
+
+Parse results are cached by file content hash in data/.ingest_cache/<PROV>.json, so a run only
+parses files that are new or changed, and only provinces with changes have
+their outputs rewritten:
+
+    idf_data_by_station.json            every parsed table, keyed by file name without the
+                                        idf_vX-Y_ prefix (or the key the file already has)
+    idf_data_by_station_corrected.json  tables merged in by station id (what load_data reads)
+    annual_maxima.json                  Table 1 annual maximum series by station id, columnar
+    idf_coefficients.json               Table 3 R = A*T^B coefficients by station id
+    master_stations_enriched_validated.json  only with --write-master, since some
+                                        provinces have hand-curated station lists
+
+Every output is merged into the existing file, so entries that did not come
+from a text file are kept. A file whose station matches nothing in the
+master list is reported at the end, and the run exits with status 1 unless
+--allow-unmatched is given.
+
+Usage: python ingest_eccc.py [--province ON ...] [--workers N] [--force] [--write-master] [--allow-unmatched]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from data_loader import (
+    ANNUAL_MAXIMA_FILE_NAME, CORRECTED_IDF_FILE_NAME, DATA_DIR, IDF_COEFFICIENTS_FILE_NAME, ORIGINAL_IDF_FILE_NAME,
+    STATIONS_FILE_NAME,
+)
+from eccc_parser import ECCCParseError, from_json, parse_eccc_file, station_record, to_json
+from station_names import normalize_name
+
+CACHE_DIR_NAME = '.ingest_cache'
+# Bump when the parser output or the set of outputs changes so every province is redone
+PARSER_VERSION = 4
+# ECCC file names start with the dataset version, which idf_data_by_station.json keys leave out
+FILE_VERSION_PREFIX = re.compile(r'^idf_v[\d.-]+_')
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def province_txt_files(data_dir=DATA_DIR):
+    """Map province code -> sorted .txt paths from every data/<PROV>/*_txt_files folder."""
+    files = {}
+    for folder in sorted(glob.glob(os.path.join(data_dir, '*', '*_txt_files'))):
+        province_code = os.path.basename(os.path.dirname(folder))
+        files.setdefault(province_code, []).extend(
+            sorted(glob.glob(os.path.join(folder, '*.txt')))
+        )
+    return files
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_file(path):
+    """Worker entry point: (path, parsed file as JSON or None, error message or None)."""
+    try:
+        return path, to_json(parse_eccc_file(path)), None
+    except (ECCCParseError, UnicodeDecodeError, ValueError) as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def parse_files(paths, workers):
+    """Parse paths in a process pool when workers > 1, serially otherwise; results in input order."""
+    if workers > 1 and len(paths) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+                return list(pool.map(parse_file, paths, chunksize=8))
+        except (OSError, BrokenProcessPool, NotImplementedError) as e:
+            print(f"Warning: Parallel parsing unavailable ({e}); parsing serially.")
+    return [parse_file(path) for path in paths]
+
+
+def _cache_path(data_dir, province_code):
+    return os.path.join(data_dir, CACHE_DIR_NAME, f'{province_code}.json')
+
+
+def load_cache(data_dir, province_code):
+    try:
+        with open(_cache_path(data_dir, province_code), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if cache.get('parser_version') != PARSER_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(data_dir, province_code, entries):
+    path = _cache_path(data_dir, province_code)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_json(path, {'parser_version': PARSER_VERSION, 'files': entries}, indent=None)
+
+
+def read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_json(path, data, indent=2):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+
+def resolve_station_id(parsed, master_ids, master_ids_by_name):
+    """Station id the master list uses for a parsed file: its own id, else a name match, else None."""
+    if parsed['stationId'] in master_ids:
+        return parsed['stationId']
+    return master_ids_by_name.get(normalize_name(parsed['stationName']))
+
+
+def write_province_outputs(province_path, parsed_by_file, write_master=False):
+    """
+    Emit the files load_data reads from the parsed stations of one province.
+
+    Returns (number of tables merged into the corrected IDF file, names of
+    the files no master station matches).
+    """
+    names = sorted(parsed_by_file)
+    parsed = [from_json(parsed_by_file[name]) for name in names]
+    stations = [station_record(station) for station in parsed]
+    raw_path = os.path.join(province_path, ORIGINAL_IDF_FILE_NAME)
+    raw = read_json(raw_path, {})
+    for name, station in zip(names, stations):
+        stem = os.path.splitext(name)[0]
+        raw[stem if stem in raw else FILE_VERSION_PREFIX.sub('', stem)] = station['idf_data']
+    write_json(raw_path, raw)
+
+    stations_file_path = os.path.join(province_path, STATIONS_FILE_NAME)
+    if write_master:
+        write_json(stations_file_path, stations, indent=4)
+    master = read_json(stations_file_path, None)
+    if master is None:
+        print(f"Warning: No {STATIONS_FILE_NAME} in {province_path}; skipping {CORRECTED_IDF_FILE_NAME}.")
+        return 0, []
+
+    master_ids = {str(s['stationId']) for s in master if 'stationId' in s}
+    master_ids_by_name = {}
+    for s in master:
+        if 'stationId' in s:
+            name = s.get('normalizedName') or s.get('stationName') or s.get('name')
+            master_ids_by_name.setdefault(normalize_name(name), str(s['stationId']))
+
+    corrected_path = os.path.join(province_path, CORRECTED_IDF_FILE_NAME)
+    corrected = read_json(corrected_path, {})
+
+    merged = 0
+    unmatched = []
+    annual_maxima, coefficients = {}, {}
+    for name, station, parsed_station in zip(names, stations, parsed):
+        station_id = resolve_station_id(station, master_ids, master_ids_by_name)
+        if station_id is None:
+            unmatched.append(f"{name} ({station['stationName']}, {station['stationId']})")
+            continue
+        corrected[station_id] = station['idf_data']
+        annual_maxima[station_id] = parsed_station['table1']
+        coefficients[station_id] = parsed_station['table3']
+        merged += 1
+    write_json(corrected_path, corrected)
+    write_annual_maxima(os.path.join(province_path, ANNUAL_MAXIMA_FILE_NAME), annual_maxima)
+    write_idf_coefficients(os.path.join(province_path, IDF_COEFFICIENTS_FILE_NAME), coefficients)
+    return merged, unmatched
+
+
+def write_annual_maxima(path, tables):
+    """
+    Store Table 1 columnar: per station, the years and one depth list per duration.
+
+    {"durations": [...], "stations": {id: {"years": [...], "depths": [[5 min...], [10 min...], ...]}}}
+    with null for missing years. Every station shares the first table's durations;
+    stations already in the file with those durations are kept.
+    """
+    existing = read_json(path, {})
+    durations = next(iter(tables.values()))['durations'] if tables else existing.get('durations', [])
+    stations = dict(existing.get('stations', {})) if existing.get('durations') == durations else {}
+    for station_id, table in sorted(tables.items()):
+        if table['durations'] != durations:
+            print(f"Warning: Table 1 of {station_id} has durations {table['durations']}; not stored.")
+            continue
+        stations[station_id] = {
+            'years': table['years'].tolist(),
+            'depths': to_json({'depths': table['depths'].T})['depths'],
+        }
+    write_json(path, {'durations': durations, 'stations': stations}, indent=None)
+
+
+def write_idf_coefficients(path, tables):
+    """
+    Store the Table 3 coefficients of every station:
+
+    {"return_periods": [...], "stations": {id: {"a": [...], "b": [...]}}}, null where missing.
+    Stations already in the file with the same return periods are kept.
+    """
+    existing = read_json(path, {})
+    return_periods = next(iter(tables.values()))['return_periods'] if tables else existing.get('return_periods', [])
+    stations = dict(existing.get('stations', {})) if existing.get('return_periods') == return_periods else {}
+    for station_id, table in sorted(tables.items()):
+        if table['return_periods'] != return_periods:
+            print(f"Warning: Table 3 of {station_id} has return periods {table['return_periods']}; not stored.")
+            continue
+        stations[station_id] = to_json({'a': table['coefficient_a'], 'b': table['exponent_b']})
+    write_json(path, {'return_periods': return_periods, 'stations': stations}, indent=None)
+
+
+def ingest(data_dir=DATA_DIR, provinces=None, workers=0, force=False, write_master=False):
+    """
+    Parse new or changed text files and rewrite the outputs of provinces that changed.
+
+    Returns {province code: files no master station matches} for the provinces rewritten.
+    """
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    txt_files = province_txt_files(data_dir)
+    if provinces:
+        txt_files = {code: paths for code, paths in txt_files.items() if code in provinces}
+
+    caches, hashes, to_parse = {}, {}, []
+    for province_code, paths in txt_files.items():
+        caches[province_code] = load_cache(data_dir, province_code)
+        for path in paths:
+            hashes[path] = file_sha256(path)
+            cached = caches[province_code].get(os.path.basename(path))
+            if force or cached is None or cached['sha256'] != hashes[path]:
+                to_parse.append(path)
+
+    start = time.perf_counter()
+    parsed = {path: (result, error) for path, result, error in parse_files(to_parse, workers)}
+    print(f"Parsed {len(parsed)} of {len(hashes)} files in {time.perf_counter() - start:.2f}s "
+          f"({len(hashes) - len(parsed)} unchanged).")
+
+    unmatched = {}
+    for province_code, paths in txt_files.items():
+        old = caches[province_code]
+        entries = {}
+        for path in paths:
+            name = os.path.basename(path)
+            if path in parsed:
+                result, error = parsed[path]
+                entries[name] = {'sha256': hashes[path], 'result': result, 'error': error}
+                if error:
+                    print(f"Warning: {province_code}/{name} skipped: {error}")
+            else:
+                entries[name] = old[name]
+        if not force and entries == old:
+            continue
+
+        parsed_by_file = {name: entry['result'] for name, entry in entries.items() if entry['result']}
+        merged, unmatched_files = write_province_outputs(
+            os.path.join(data_dir, province_code), parsed_by_file, write_master)
+        save_cache(data_dir, province_code, entries)
+        print(f"{province_code}: {len(parsed_by_file)} stations parsed, {merged} tables merged into {CORRECTED_IDF_FILE_NAME}.")
+        if unmatched_files:
+            unmatched[province_code] = unmatched_files
+
+    for province_code, files in unmatched.items():
+        print(f"ERROR: {len(files)} {province_code} files match no station in {STATIONS_FILE_NAME}; "
+              f"their tables were not merged (existing entries are kept):")
+        for name in files:
+            print(f"  {name}")
+    return unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest ECCC IDF text files into the per-province JSON data.")
+    parser.add_argument('--province', action='append', dest='provinces', help="Only ingest this province (repeatable)")
+    parser.add_argument('--workers', type=int, default=0, help="Parser processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="Ignore the cache and reparse every file")
+    parser.add_argument('--write-master', action='store_true', help=f"Also rewrite {STATIONS_FILE_NAME} from the file headers")
+    parser.add_argument('--allow-unmatched', action='store_true',
+                        help=f"Exit with status 0 even when some files match no station in {STATIONS_FILE_NAME}")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    args = parser.parse_args()
+    unmatched = ingest(args.data_dir, args.provinces, args.workers, args.force, args.write_master)
+    if unmatched and not args.allow_unmatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
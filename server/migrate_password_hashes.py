@@ -0,0 +1,148 @@
+"""
+Normalize stored password hashes across the users collection.
+
+    python migrate_password_hashes.py [--batch-size 500] [--resume] [--dry-run]
+
+Hashes can only be re-derived from the plain password, which the login route
+does (see PASSWORD_HASH_METHOD in app.py). This tool does the part that needs
+no password:
+
+- moves a legacy 'password' field into 'password_hash' when there is none
+  (what utils/migrate_password_fields.py did one update at a time)
+- rewrites the 4-part legacy scrypt layout into scrypt-base64, which carries
+  its N:r:p, so no stored hash depends on hard-coded parameters
+
+Users are streamed in _id order and updated with one unordered bulk_write per
+batch; each update matches the hash it read, so a login that upgrades a hash
+mid-run wins. The last _id of every finished batch goes to --state-file, and
+--resume carries on after it. At the end it prints how many users are on
+each scheme and how many still wait for a login to reach the target method.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from password_hashes import DEFAULT_METHOD, canonical_hash, hash_scheme, needs_rehash
+
+DEFAULT_BATCH_SIZE = 500
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'password_hash_migration.json')
+PROJECTION = {'_id': 1, 'password': 1, 'password_hash': 1}
+
+
+def plan_update(user):
+    """(filter, update) for one user document, or None when it is already normalized."""
+    password_hash = user.get('password_hash')
+    if password_hash is None and user.get('password') is not None:
+        return ({'_id': user['_id'], 'password_hash': {'$exists': False}},
+                {'$set': {'password_hash': canonical_hash(user['password'])}, '$unset': {'password': ''}})
+    normalized = canonical_hash(password_hash)
+    if normalized != password_hash:
+        return {'_id': user['_id'], 'password_hash': password_hash}, {'$set': {'password_hash': normalized}}
+    return None
+
+
+def read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_state(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def migrate(users, batch_size=DEFAULT_BATCH_SIZE, state_path=STATE_PATH, resume=False, dry_run=False,
+            target_method=DEFAULT_METHOD, log=print):
+    state = read_state(state_path) if resume else None
+    state = state or {'last_id': None, 'processed': 0, 'updated': 0, 'schemes': {}}
+    query = {'_id': {'$gt': ObjectId(state['last_id'])}} if state['last_id'] else {}
+    if state['last_id']:
+        log(f"Resuming after {state['last_id']} ({state['processed']} users done).")
+
+    total = state['processed'] + users.count_documents(query)
+    schemes = Counter(state['schemes'])
+    started = time.perf_counter()
+    seen = 0
+
+    cursor = users.find(query, PROJECTION, no_cursor_timeout=True).sort('_id', 1).batch_size(batch_size)
+    try:
+        batch, operations = [], []
+        for user in cursor:
+            batch.append(user)
+            planned = plan_update(user)
+            if planned is not None:
+                operations.append(UpdateOne(*planned))
+            if len(batch) == batch_size:
+                seen += _flush(users, batch, operations, state, schemes, target_method, dry_run)
+                if not dry_run:
+                    write_state(state_path, state)
+                rate = seen / max(time.perf_counter() - started, 1e-9)
+                log(f"{state['processed']}/{total} users, {state['updated']} updated ({rate:.0f} users/s)")
+                batch, operations = [], []
+        if batch:
+            seen += _flush(users, batch, operations, state, schemes, target_method, dry_run)
+    finally:
+        cursor.close()
+
+    if not dry_run and os.path.exists(state_path):
+        os.remove(state_path)
+    log(f"Done: {state['processed']} users, {state['updated']} {'would be ' if dry_run else ''}updated "
+        f"in {time.perf_counter() - started:.1f} s.")
+    for scheme, count in sorted(schemes.items()):
+        log(f"  {scheme}: {count}")
+    return state
+
+
+def _flush(users, batch, operations, state, schemes, target_method, dry_run):
+    if operations and not dry_run:
+        result = users.bulk_write(operations, ordered=False)
+        state['updated'] += result.modified_count
+    elif dry_run:
+        state['updated'] += len(operations)
+    for user in batch:
+        password_hash = canonical_hash(user.get('password_hash') or user.get('password'))
+        scheme = hash_scheme(password_hash) or 'unknown'
+        schemes[scheme] += 1
+        if scheme != 'unknown' and needs_rehash(password_hash, target_method):
+            schemes['awaiting rehash on login'] += 1
+    state['processed'] += len(batch)
+    state['last_id'] = str(batch[-1]['_id'])
+    state['schemes'] = dict(schemes)
+    return len(batch)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Normalize stored password hashes in the users collection.")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--state-file', default=STATE_PATH, help="Checkpoint written after every batch")
+    parser.add_argument('--resume', action='store_true', help="Continue after the checkpoint in --state-file")
+    parser.add_argument('--dry-run', action='store_true', help="Count what would change without writing")
+    parser.add_argument('--target-method', default=os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        raise SystemExit("MONGO_URI not set in environment")
+    client = MongoClient(mongo_uri)
+    try:
+        users = client.get_default_database(default=os.getenv('DB_NAME', 'contactDB'))['users']
+        migrate(users, batch_size=args.batch_size, state_path=args.state_file, resume=args.resume,
+                dry_run=args.dry_run, target_method=args.target_method)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Password hash formats found in the users collection, and the checks for them.
+
+    pbkdf2          pbkdf2:sha256:<iterations>$<salt>$<hex key>    (werkzeug)
+    bcrypt          $2a$ / $2b$ / $2y$                            (bcrypt, bcryptjs)
+    scrypt          scrypt:N:r:p$<salt>$<hex key>                 (werkzeug)
+    scrypt-base64   scrypt:N:r:p$<base64 salt>$<base64 key>
+    scrypt-legacy   scrypt:...$<params>$<base64 salt>$<base64 key>, always N=32768, r=8, p=1
+
+New hashes are made with generate_password_hash and a werkzeug method string
+(PASSWORD_HASH_METHOD in app.py). needs_rehash tells whether a stored hash
+was made with anything else, in which case the login route replaces it.
+"""
+import base64
+import hmac
+import logging
+import re
+
+import bcrypt
+import scrypt
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# About 0.12 s and 32 MiB per hash or check on one core, as much as the werkzeug and legacy scrypt
+# hashes most users already have, which therefore need no rehash. werkzeug's own pbkdf2 default
+# (1,000,000 iterations) costs about 0.5 s.
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+LEGACY_SCRYPT_PARAMS = (32768, 8, 1)
+
+_HEX = re.compile(r'[0-9a-f]+')
+
+
+def hash_scheme(password_hash):
+    """One of the scheme names in the module docstring, or None for anything else."""
+    if not password_hash or not isinstance(password_hash, str):
+        return None
+    if password_hash.startswith('pbkdf2:'):
+        return 'pbkdf2'
+    if password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        return 'bcrypt'
+    if password_hash.startswith('scrypt:'):
+        parts = password_hash.split('$')
+        if len(parts) == 4:
+            return 'scrypt-legacy'
+        if len(parts) == 3:
+            # werkzeug stores the key as lowercase hex; base64 keys have other characters and padding
+            return 'scrypt' if _HEX.fullmatch(parts[2]) else 'scrypt-base64'
+    return None
+
+
+def _scrypt_base64(plain_password, params, salt_b64, key_b64):
+    n, r, p = params
+    salt = base64.b64decode(salt_b64)
+    key = base64.b64decode(key_b64)
+    derived = scrypt.hash(plain_password, salt, N=n, r=r, p=p, buflen=len(key))
+    return hmac.compare_digest(derived, key)
+
+
+def check_password(plain_password, password_hash):
+    """True if plain_password matches password_hash in any supported scheme."""
+    scheme = hash_scheme(password_hash)
+    try:
+        if scheme in ('pbkdf2', 'scrypt'):
+            return check_password_hash(password_hash, plain_password)
+        if scheme == 'bcrypt':
+            return bcrypt.checkpw(plain_password.encode('utf-8'), password_hash.encode('utf-8'))
+        if scheme == 'scrypt-base64':
+            method, salt_b64, key_b64 = password_hash.split('$')
+            params = tuple(int(value) for value in method.split(':')[1:])
+            return _scrypt_base64(plain_password, params, salt_b64, key_b64)
+        if scheme == 'scrypt-legacy':
+            _, _, salt_b64, key_b64 = password_hash.split('$')
+            return _scrypt_base64(plain_password, LEGACY_SCRYPT_PARAMS, salt_b64, key_b64)
+    except Exception as e:
+        logging.error(f"Error verifying {scheme} hash: {e}")
+    return False
+
+
+def canonical_hash(password_hash):
+    """
+    The same hash with the legacy scrypt layout rewritten to scrypt-base64, so
+    it carries its own parameters; other hashes are returned unchanged.
+    """
+    if hash_scheme(password_hash) != 'scrypt-legacy':
+        return password_hash
+    _, _, salt_b64, key_b64 = password_hash.split('$')
+    n, r, p = LEGACY_SCRYPT_PARAMS
+    return f"scrypt:{n}:{r}:{p}${salt_b64}${key_b64}"
+
+
+def method_prefix(method=DEFAULT_METHOD):
+    """The part before the first '$' of hashes generate_password_hash makes with method."""
+    name, *args = method.split(':')
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    raise ValueError(f"Unsupported password hash method {method!r}")
+
+
+def needs_rehash(password_hash, method=DEFAULT_METHOD):
+    return not (isinstance(password_hash, str) and password_hash.startswith(method_prefix(method) + '$'))
+
+
+def hash_password(plain_password, method=DEFAULT_METHOD):
+    return generate_password_hash(plain_password, method=method)
@@ -0,0 +1,176 @@
+"""
+Password hash checks run in a small process pool so login bursts do not hold
+request threads.
+
+scrypt (N=32768, r=8, p=1) costs about 32 MB and tens of milliseconds of CPU
+per check, and bcrypt and pbkdf2 are similar. PasswordPool caps the checks in
+flight, workers plus PASSWORD_POOL_MAX_QUEUED waiting ones, and raises
+PasswordPoolBusy straight away when that cap is hit. The login route turns it
+into a 503 rather than letting requests pile up behind the hashes.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from password_hashes import check_password, hash_password, needs_rehash
+
+DEFAULT_WORKERS = min(2, os.cpu_count() or 1)
+DEFAULT_MAX_QUEUED = 8
+DEFAULT_TIMEOUT_SECONDS = 5.0
+LATENCY_SAMPLES = 1024
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the pool is at its cap or a check does not finish in time."""
+
+
+def _timed_check(plain_password, password_hash, rehash_method=None):
+    # Runs in the worker; the compute time lets the caller split out the queue wait
+    start = time.perf_counter()
+    ok = check_password(plain_password, password_hash)
+    new_hash = None
+    if ok and rehash_method and needs_rehash(password_hash, rehash_method):
+        new_hash = hash_password(plain_password, rehash_method)
+    return ok, new_hash, time.perf_counter() - start
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    pick = lambda q: round(ordered[min(last, int(q * len(ordered)))] * 1000, 2)
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+class PasswordPool:
+    """
+    Runs check_password in up to workers processes with at most max_queued more
+    checks waiting. workers=0 checks inline on the calling thread under the
+    same cap, for single-core hosts and tests, and so does a check that
+    cannot be handed to a worker process.
+
+    The executor is created on first use and again after a fork, so each
+    gunicorn worker owns its pool even with --preload.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED, timeout=DEFAULT_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max_queued)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._in_flight = 0
+        self.completed = self.rejected = self.timeouts = self.errors = 0
+        self._latency = deque(maxlen=LATENCY_SAMPLES)
+        self._compute = deque(maxlen=LATENCY_SAMPLES)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _record(self, started, compute_seconds):
+        with self._lock:
+            self.completed += 1
+            self._latency.append(time.perf_counter() - started)
+            self._compute.append(compute_seconds)
+
+    def verify(self, plain_password, password_hash):
+        return self.verify_and_rehash(plain_password, password_hash)[0]
+
+    def verify_and_rehash(self, plain_password, password_hash, rehash_method=None):
+        """
+        check_password through the pool; raises PasswordPoolBusy if the pool
+        is full or the check takes longer than timeout seconds.
+
+        Returns (ok, new_hash). new_hash is the password hashed with
+        rehash_method when it matched but password_hash was made otherwise,
+        else None.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy("too many password checks in progress")
+        with self._lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+
+        if self.workers <= 0:
+            return self._verify_inline(started, plain_password, password_hash, rehash_method)
+
+        try:
+            future = self._get_executor().submit(_timed_check, plain_password, password_hash, rehash_method)
+        except (OSError, BrokenProcessPool, NotImplementedError) as e:
+            # No worker processes here (e.g. a sandbox that forbids them); check on this thread instead
+            with self._lock:
+                self.errors += 1
+                if isinstance(e, BrokenProcessPool):
+                    self._executor = None
+            logging.warning(f"Password pool unavailable ({e}); checking inline.")
+            return self._verify_inline(started, plain_password, password_hash, rehash_method)
+        except Exception:
+            self._release()
+            raise
+        # The slot is held until the worker is done, not until this caller gives up
+        future.add_done_callback(self._release)
+        try:
+            ok, new_hash, compute_seconds = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordPoolBusy("password check timed out")
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (e.g. OOM killed); start a fresh pool on the next check
+                    self._executor = None
+            logging.error(f"Password check failed in the pool: {e}")
+            return False, None
+        self._record(started, compute_seconds)
+        return ok, new_hash
+
+    def _verify_inline(self, started, plain_password, password_hash, rehash_method):
+        # Called holding a slot, which is released here
+        try:
+            ok, new_hash, compute_seconds = _timed_check(plain_password, password_hash, rehash_method)
+        finally:
+            self._release()
+        self._record(started, compute_seconds)
+        return ok, new_hash
+
+    def stats(self):
+        with self._lock:
+            latency, compute = list(self._latency), list(self._compute)
+            return {
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "timeout_seconds": self.timeout,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "latency": _percentiles(latency),
+                "compute": _percentiles(compute),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
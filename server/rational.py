@@ -0,0 +1,174 @@
+"""
+Batch Rational Method peak flows, Q = C * i * A / 360.
+
+Q is in m^3/s, C is the runoff coefficient, i the rainfall intensity (mm/h)
+at the time of concentration and A the catchment area (ha). Intensities come
+from each station's IDF depth table, interpolated log-log in duration the
+same way as the design storms, so a whole batch is a handful of array
+operations once the stations are resolved.
+"""
+import math
+import threading
+
+import numpy as np
+
+from hyetograph import depth_table, interpolate_depths
+from idf_tables import RETURN_PERIODS
+
+# Standard ECCC durations; station tables are resampled onto this grid
+DURATION_GRID_MINUTES = np.array([5, 10, 15, 30, 60, 120, 360, 720, 1440], dtype=np.float64)
+MIN_TC_MINUTES = 5
+MAX_TC_MINUTES = 24 * 60
+MAX_CATCHMENTS = 250_000
+# mm/h * ha -> m^3/s
+UNIT_FACTOR = 1 / 360
+FIELDS = ('lat', 'lon', 'c', 'area', 'tc', 'returnPeriod')
+
+
+class IntensityTable:
+    """
+    Log depths of every station of a StationMatrix on DURATION_GRID_MINUTES.
+
+    load_idf_data(station) returns the station's IDF_DATA rows or None. Rows
+    are built the first time a station is used, so lazily loaded provinces
+    only cost something once they are queried.
+    """
+
+    def __init__(self, stations, load_idf_data):
+        self.stations = stations
+        self.station_ids = [str(station.get('stationId')) for station in stations]
+        self._load_idf_data = load_idf_data
+        self._log_grid = np.log(DURATION_GRID_MINUTES)
+        self._log_depths = np.full((len(stations), len(DURATION_GRID_MINUTES), len(RETURN_PERIODS)), np.nan)
+        self._filled = np.zeros(len(stations), dtype=bool)
+        self._lock = threading.Lock()
+
+    def _fill(self, positions):
+        pending = np.unique(positions[~self._filled[positions]])
+        if not pending.size:
+            return
+        with self._lock:
+            for position in pending.tolist():
+                if self._filled[position]:
+                    continue
+                idf_station_data = self._load_idf_data(self.stations[position])
+                if idf_station_data:
+                    minutes, depths = depth_table(idf_station_data)
+                    if len(minutes) >= 2:
+                        with np.errstate(divide='ignore', invalid='ignore'):
+                            self._log_depths[position] = np.log(interpolate_depths(minutes, depths, DURATION_GRID_MINUTES))
+                self._filled[position] = True
+
+    def intensities(self, positions, tc_minutes, return_period_columns):
+        """Intensity (mm/h) for every (station position, tc, return period column) triple; NaN without data."""
+        positions = np.asarray(positions, dtype=np.intp)
+        self._fill(positions)
+        log_tc = np.log(tc_minutes)
+        upper = np.searchsorted(self._log_grid, log_tc).clip(1, len(self._log_grid) - 1)
+        lower = upper - 1
+        weight = (log_tc - self._log_grid[lower]) / (self._log_grid[upper] - self._log_grid[lower])
+        y0 = self._log_depths[positions, lower, return_period_columns]
+        y1 = self._log_depths[positions, upper, return_period_columns]
+        return np.exp(y0 + weight * (y1 - y0)) * (60.0 / tc_minutes)
+
+
+def _float_column(values, n):
+    """Column of floats, NaN where a value is missing or not a number; a scalar is repeated."""
+    if not isinstance(values, list):
+        values = [values] * n
+    try:
+        column = np.asarray(values, dtype=np.float64)
+        if column.ndim == 1:
+            return column
+    except (TypeError, ValueError):
+        pass
+
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return math.nan
+    return np.fromiter((to_float(value) for value in values), dtype=np.float64, count=len(values))
+
+
+def _list_column(values, n):
+    return values if isinstance(values, list) else [values] * n
+
+
+def parse_catchments(body):
+    """
+    Columns of a batch request body, either of
+
+        {"catchments": [{"lat", "lon", "c", "area", "tc", "returnPeriod", "province"?, "id"?}, ...]}
+        {"lat": [...], "lon": [...], "c": [...], "area": [...], "tc": [...], "returnPeriod": [...] or one value, ...}
+
+    Returns a dict of NumPy float columns plus 'returnPeriod' (as given),
+    'province' and 'id' lists. Raises ValueError when the body has neither shape or is too large.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("expected a JSON object")
+    catchments = body.get('catchments')
+    if isinstance(catchments, list):
+        if not all(isinstance(catchment, dict) for catchment in catchments):
+            raise ValueError("every catchment must be an object")
+        body = {
+            key: [catchment.get(key) for catchment in catchments]
+            for key in FIELDS + ('province', 'id')
+        }
+    elif not isinstance(body.get('lat'), list):
+        raise ValueError("expected a 'catchments' array or 'lat', 'lon', 'c', 'area', 'tc' and 'returnPeriod' columns")
+
+    n = len(body['lat'])
+    if not n:
+        raise ValueError("no catchments given")
+    if n > MAX_CATCHMENTS:
+        raise ValueError(f"at most {MAX_CATCHMENTS} catchments per request")
+    for key, values in body.items():
+        if isinstance(values, list) and len(values) != n:
+            raise ValueError(f"'{key}' has {len(values)} values, expected {n}")
+
+    columns = {key: _float_column(body.get(key), n) for key in FIELDS[:5]}
+    columns['returnPeriod'] = _list_column(body.get('returnPeriod'), n)
+    columns['province'] = [code if isinstance(code, str) else None for code in _list_column(body.get('province'), n)]
+    ids = body.get('id')
+    # Catchments without an id are identified by their position in the request
+    columns['id'] = [i if value is None else value for i, value in enumerate(ids)] if isinstance(ids, list) else list(range(n))
+    return columns
+
+
+def validate_catchments(columns):
+    """
+    (errors, return period columns): an error message or None per catchment,
+    and the RETURN_PERIODS column of each one (-1 where invalid).
+    """
+    lat, lon, c, area, tc = (columns[key] for key in FIELDS[:5])
+    # Return periods may be given as '10', 10 or 10.0
+    rp_index = {key: i for i, rp in enumerate(RETURN_PERIODS) for key in (rp, int(rp))}
+    try:
+        rp_columns = np.fromiter((rp_index.get(rp, -1) for rp in columns['returnPeriod']), dtype=np.intp, count=len(lat))
+    except TypeError:
+        rp_columns = np.fromiter(
+            (rp_index.get(rp, -1) if isinstance(rp, (str, int, float)) else -1 for rp in columns['returnPeriod']),
+            dtype=np.intp, count=len(lat),
+        )
+    with np.errstate(invalid='ignore'):
+        checks = (
+            (~((np.abs(lat) <= 90) & (np.abs(lon) <= 180)), "Invalid latitude or longitude."),
+            (~((c > 0) & (c <= 1)), "Runoff coefficient 'c' must be in (0, 1]."),
+            (~(area > 0), "'area' must be a positive number of hectares."),
+            (~((tc >= MIN_TC_MINUTES) & (tc <= MAX_TC_MINUTES)),
+             f"'tc' must be between {MIN_TC_MINUTES} and {MAX_TC_MINUTES} minutes."),
+            (rp_columns < 0, f"'returnPeriod' must be one of {', '.join(RETURN_PERIODS)}."),
+        )
+    errors = [None] * len(lat)
+    # Report the first failing check of each catchment
+    for failed, message in reversed(checks):
+        for i in np.flatnonzero(failed).tolist():
+            errors[i] = message
+    rp_columns[[i for i, error in enumerate(errors) if error]] = -1
+    return errors, rp_columns
+
+
+def peak_flows(c, intensity, area):
+    """Q (m^3/s) from the runoff coefficient, intensity (mm/h) and area (ha)."""
+    return c * intensity * area * UNIT_FACTOR
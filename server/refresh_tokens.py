@@ -0,0 +1,178 @@
+"""
+Revocation list for rotating refresh tokens.
+
+Each refresh token carries a jti. /api/auth/refresh-token gives out a new
+pair and marks the presented jti used; logout marks it revoked. Either way the
+jti goes into a Bloom filter at once and into the revoked_refresh_tokens
+collection at the next sync. The collection stays small because a TTL index
+(db_indexes.py) drops each entry when its token would have expired anyway.
+
+A check that misses the filter, which is almost every legitimate refresh,
+touches no database. A hit is confirmed against the not yet written jtis and
+then MongoDB, so a false positive never logs anyone out. Every sync pulls in
+the jtis other worker processes revoked since the last one. A token replayed
+on another worker before that sync is accepted once.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import BulkWriteError
+
+from bloom_filter import BloomFilter
+
+DEFAULT_CAPACITY = 100_000
+DEFAULT_ERROR_RATE = 1e-6
+DEFAULT_SYNC_SECONDS = 30
+REBUILD_SECONDS = 3600
+# Pull entries this much older than the last sync, in case of clock skew between workers
+SYNC_OVERLAP_SECONDS = 5
+
+
+class RefreshTokenRevocations:
+    """
+    collection is a callable returning the pymongo collection, so it can be
+    made before the app has connected.
+    """
+
+    def __init__(self, collection, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE,
+                 sync_seconds=DEFAULT_SYNC_SECONDS, rebuild_seconds=REBUILD_SECONDS, clock=time.time):
+        self._collection = collection
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._clock = clock
+        self._filter = BloomFilter(capacity, error_rate)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._pid = None
+        self._synced_at = None
+        self._rebuilt_at = None
+        self.checks = self.filter_hits = self.false_positives = self.syncs = self.sync_errors = 0
+
+    def _ensure_syncing(self):
+        # One sync thread per process; started lazily so it survives gunicorn forking after import
+        if self._pid == os.getpid() or self.sync_seconds <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        # The first load happens before the first check is answered
+        self.sync()
+        threading.Thread(target=self._sync_forever, name='refresh-token-sync', daemon=True).start()
+
+    def _sync_forever(self):
+        while True:
+            time.sleep(self.sync_seconds)
+            self.sync()
+
+    def revoke(self, jti, user_id, expires_at):
+        """Mark a jti used or revoked; expires_at is the token's exp (Unix time)."""
+        self._ensure_syncing()
+        with self._lock:
+            self._add(jti, user_id, expires_at)
+
+    def _add(self, jti, user_id, expires_at):
+        self._filter.add(jti)
+        self._pending[jti] = {
+            '_id': jti,
+            'user_id': str(user_id),
+            'revoked_at': datetime.fromtimestamp(self._clock(), timezone.utc),
+            'expires_at': datetime.fromtimestamp(expires_at, timezone.utc),
+        }
+
+    def use(self, jti, user_id, expires_at):
+        """Mark a jti used and return True, or return False if it already was used or revoked."""
+        if self.is_revoked(jti):
+            return False
+        with self._lock:
+            # Two refreshes racing with the same token in this process: only the first gets through
+            if jti in self._pending:
+                return False
+            self._add(jti, user_id, expires_at)
+        return True
+
+    def is_revoked(self, jti):
+        self._ensure_syncing()
+        with self._lock:
+            self.checks += 1
+            if jti not in self._filter:
+                return False
+            self.filter_hits += 1
+            if jti in self._pending:
+                return True
+        try:
+            revoked = self._collection().find_one({'_id': jti}, {'_id': 1}) is not None
+        except Exception as e:
+            print(f"Warning: Could not confirm refresh token revocation, rejecting it: {e}")
+            return True
+        if not revoked:
+            with self._lock:
+                self.false_positives += 1
+        return revoked
+
+    def _flush(self, collection):
+        with self._lock:
+            docs = list(self._pending.values())
+        if not docs:
+            return
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Already stored (e.g. by an earlier flush that timed out) is fine; anything else is retried
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+        with self._lock:
+            for doc in docs:
+                self._pending.pop(doc['_id'], None)
+
+    def sync(self):
+        """Write pending jtis, then load the ones revoked elsewhere; rebuilds the filter hourly."""
+        with self._sync_lock:
+            now = self._clock()
+            try:
+                collection = self._collection()
+                self._flush(collection)
+                if self._rebuilt_at is None or now - self._rebuilt_at >= self.rebuild_seconds:
+                    self._rebuild(collection, now)
+                else:
+                    since = datetime.fromtimestamp(self._synced_at - SYNC_OVERLAP_SECONDS, timezone.utc)
+                    jtis = [doc['_id'] for doc in collection.find({'revoked_at': {'$gte': since}}, {'_id': 1})]
+                    with self._lock:
+                        for jti in jtis:
+                            self._filter.add(jti)
+                self._synced_at = now
+                self.syncs += 1
+            except Exception as e:
+                self.sync_errors += 1
+                print(f"Warning: Refresh token revocation sync failed: {e}")
+
+    def _rebuild(self, collection, now):
+        # Bloom filters cannot forget, so expired jtis are shed by starting over
+        live = [doc['_id'] for doc in collection.find(
+            {'expires_at': {'$gt': datetime.fromtimestamp(now, timezone.utc)}}, {'_id': 1})]
+        with self._lock:
+            fresh = BloomFilter(max(self.capacity, 2 * (len(live) + len(self._pending))), self.error_rate)
+            for jti in live:
+                fresh.add(jti)
+            for jti in self._pending:
+                fresh.add(jti)
+            self._filter = fresh
+        self._rebuilt_at = now
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._filter.stats(),
+                pending=len(self._pending),
+                checks=self.checks,
+                filter_hits=self.filter_hits,
+                false_positives=self.false_positives,
+                syncs=self.syncs,
+                sync_errors=self.sync_errors,
+                sync_seconds=self.sync_seconds,
+            )
@@ -0,0 +1,224 @@
+"""
+Storm sewer network design with the Rational Method.
+
+Pipes are sized from the most upstream inlets down. The design flow of a
+pipe is Q = i * sum(C * A) / 360 over everything it drains, with i read
+from the station's IDF curve at the time of concentration of its upstream
+node. That time is the longest of the node's inlet time and the arrival
+times (upstream time + full-flow travel time) of the pipes that feed it.
+Each pipe gets the smallest standard diameter whose full-flow Manning
+capacity carries its design flow, unless a diameter is given, in which
+case the pipe is only checked.
+
+Networks must be dendritic: every node drains through at most one pipe.
+"""
+import bisect
+import math
+from collections import deque
+
+import numpy as np
+
+MANNING_N = 0.013
+DEFAULT_INLET_TIME_MINUTES = 10
+# Shorter times of concentration are read off the curve at this duration
+MIN_TC_MINUTES = 5
+MAX_PIPES = 50_000
+# Standard circular pipe sizes, mm
+STANDARD_DIAMETERS_MM = (
+    200, 250, 300, 375, 450, 525, 600, 675, 750, 825, 900, 975, 1050, 1200, 1350, 1500, 1650, 1800, 1950,
+    2100, 2250, 2400, 2700, 3000,
+)
+# Full circular pipe: Q = (pi / 4^(5/3)) / n * D^(8/3) * S^(1/2)
+_FULL_FLOW_FACTOR = math.pi / 4 ** (5 / 3)
+
+
+class IntensityCurve:
+    """
+    One return period of a station's intensity curve (the IDF_CURVES rows),
+    interpolated log-log in duration and extended with the end slopes.
+    """
+
+    def __init__(self, curve, return_period):
+        points = [(row['duration'], row[return_period]) for row in curve if row.get(return_period, 0) > 0]
+        if len(points) < 2:
+            raise ValueError(f"the station has fewer than two IDF values for the {return_period}-year return period")
+        self.log_minutes = [math.log(minutes) for minutes, _ in points]
+        self.log_intensities = [math.log(intensity) for _, intensity in points]
+
+    def __call__(self, minutes):
+        """Intensity (mm/h) for a duration in minutes."""
+        x = math.log(max(minutes, MIN_TC_MINUTES))
+        upper = min(max(bisect.bisect_left(self.log_minutes, x), 1), len(self.log_minutes) - 1)
+        x0, x1 = self.log_minutes[upper - 1], self.log_minutes[upper]
+        y0, y1 = self.log_intensities[upper - 1], self.log_intensities[upper]
+        return math.exp(y0 + (x - x0) * (y1 - y0) / (x1 - x0))
+
+
+def full_flow_capacity(diameter_m, slope, n):
+    """Full-flow capacity (m^3/s) of a circular pipe by Manning's equation."""
+    return _FULL_FLOW_FACTOR / n * diameter_m ** (8 / 3) * math.sqrt(slope)
+
+
+def required_diameter(flow, slope, n):
+    """Smallest circular diameter (m) whose full-flow capacity is flow."""
+    return (flow * n / (_FULL_FLOW_FACTOR * math.sqrt(slope))) ** (3 / 8)
+
+
+def _number(item, key, default=None, positive=False):
+    value = item.get(key, default)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        value = math.nan
+    if not math.isfinite(value) or value < 0 or (positive and value == 0):
+        kind = "a positive" if positive else "a non-negative"
+        raise ValueError(f"'{key}' of {item.get('id')!r} must be {kind} number")
+    return value
+
+
+def _is_id(value):
+    # Ids key dicts and come back in the JSON result, so lists, objects and booleans are out
+    return isinstance(value, (str, int)) and not isinstance(value, bool)
+
+
+class SewerNetwork:
+    """
+    A pipe network held as parallel lists indexed by node and pipe position.
+
+    nodes: [{"id", "area" (ha), "c", "inletTime" (min, optional)}]; nodes
+    only named by pipes (junctions, outfalls) drain nothing themselves.
+    pipes: [{"id", "from", "to", "length" (m), "slope" (m/m), "n"?, "diameter" (mm)?}]
+
+    Raises ValueError for malformed input, split flows or cycles.
+    """
+
+    def __init__(self, nodes, pipes):
+        if not isinstance(nodes, list) or not isinstance(pipes, list) or not pipes:
+            raise ValueError("expected 'nodes' and a non-empty 'pipes' array")
+        if len(pipes) > MAX_PIPES:
+            raise ValueError(f"at most {MAX_PIPES} pipes per network")
+
+        self.node_ids = []
+        self.node_index = {}
+        self.ca = []
+        self.area = []
+        self.inlet_time = []
+        for node in nodes:
+            if not isinstance(node, dict) or not _is_id(node.get('id')):
+                raise ValueError("every node needs a string or integer 'id'")
+            if node['id'] in self.node_index:
+                raise ValueError(f"duplicate node {node['id']!r}")
+            area = _number(node, 'area', 0)
+            c = _number(node, 'c', 0)
+            if c > 1:
+                raise ValueError(f"'c' of {node['id']!r} must be at most 1")
+            self._add_node(node['id'], area, c * area, _number(node, 'inletTime', DEFAULT_INLET_TIME_MINUTES))
+
+        self.pipe_ids = []
+        self.upstream, self.downstream = [], []
+        self.length, self.slope, self.roughness, self.diameter = [], [], [], []
+        for pipe in pipes:
+            if not isinstance(pipe, dict) or not _is_id(pipe.get('id')):
+                raise ValueError("every pipe needs a string or integer 'id'")
+            try:
+                up, down = self._node(pipe['from']), self._node(pipe['to'])
+            except KeyError:
+                raise ValueError(f"pipe {pipe['id']!r} needs 'from' and 'to' node ids")
+            if up == down:
+                raise ValueError(f"pipe {pipe['id']!r} starts and ends at the same node")
+            self.pipe_ids.append(pipe['id'])
+            self.upstream.append(up)
+            self.downstream.append(down)
+            self.length.append(_number(pipe, 'length', positive=True))
+            self.slope.append(_number(pipe, 'slope', positive=True))
+            self.roughness.append(_number(pipe, 'n', MANNING_N, positive=True))
+            self.diameter.append(_number(pipe, 'diameter', positive=True) / 1000 if pipe.get('diameter') is not None else None)
+
+        self.outlet = [-1] * len(self.node_ids)
+        for pipe, up in enumerate(self.upstream):
+            if self.outlet[up] >= 0:
+                raise ValueError(f"node {self.node_ids[up]!r} drains through more than one pipe")
+            self.outlet[up] = pipe
+
+    def _add_node(self, node_id, area, ca, inlet_time):
+        self.node_index[node_id] = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.area.append(area)
+        self.ca.append(ca)
+        # A node that drains nothing itself sets no time of concentration
+        self.inlet_time.append(inlet_time if ca > 0 else 0.0)
+
+    def _node(self, node_id):
+        if not _is_id(node_id):
+            raise KeyError(node_id)
+        if node_id not in self.node_index:
+            self._add_node(node_id, 0.0, 0.0, 0.0)
+        return self.node_index[node_id]
+
+    def topological_order(self):
+        """Pipe positions ordered so every pipe comes after all pipes that feed it."""
+        inflows = [0] * len(self.node_ids)
+        for down in self.downstream:
+            inflows[down] += 1
+        ready = deque(node for node, count in enumerate(inflows) if count == 0)
+        order = []
+        while ready:
+            pipe = self.outlet[ready.popleft()]
+            if pipe < 0:
+                continue
+            order.append(pipe)
+            down = self.downstream[pipe]
+            inflows[down] -= 1
+            if inflows[down] == 0:
+                ready.append(down)
+        if len(order) < len(self.pipe_ids):
+            raise ValueError("the pipe network contains a cycle")
+        return order
+
+    def design(self, intensity):
+        """
+        Size or check every pipe; intensity(minutes) returns mm/h.
+
+        Returns a dict of NumPy arrays in pipe input order: tc (min),
+        intensity (mm/h), area (ha), ca (ha), flow (m^3/s), diameter (mm),
+        capacity (m^3/s), velocity (m/s), travelTime (min) and surcharged.
+        """
+        count = len(self.pipe_ids)
+        tc, area, ca = list(self.inlet_time), list(self.area), list(self.ca)
+        out = {key: [0.0] * count for key in ('tc', 'intensity', 'area', 'ca', 'flow', 'diameter', 'capacity', 'velocity', 'travelTime')}
+        surcharged = [False] * count
+        largest = STANDARD_DIAMETERS_MM[-1] / 1000
+
+        for pipe in self.topological_order():
+            up, down = self.upstream[pipe], self.downstream[pipe]
+            slope, n = self.slope[pipe], self.roughness[pipe]
+            i = intensity(tc[up])
+            flow = i * ca[up] / 360
+            diameter = self.diameter[pipe]
+            if diameter is None:
+                required_mm = required_diameter(flow, slope, n) * 1000
+                index = bisect.bisect_left(STANDARD_DIAMETERS_MM, required_mm - 1e-9)
+                diameter = STANDARD_DIAMETERS_MM[index] / 1000 if index < len(STANDARD_DIAMETERS_MM) else largest
+            capacity = full_flow_capacity(diameter, slope, n)
+            velocity = capacity / (math.pi * diameter * diameter / 4)
+            travel = self.length[pipe] / velocity / 60
+
+            out['tc'][pipe] = tc[up]
+            out['intensity'][pipe] = i
+            out['area'][pipe] = area[up]
+            out['ca'][pipe] = ca[up]
+            out['flow'][pipe] = flow
+            out['diameter'][pipe] = diameter * 1000
+            out['capacity'][pipe] = capacity
+            out['velocity'][pipe] = velocity
+            out['travelTime'][pipe] = travel
+            surcharged[pipe] = flow > capacity
+
+            area[down] += area[up]
+            ca[down] += ca[up]
+            if tc[up] + travel > tc[down]:
+                tc[down] = tc[up] + travel
+
+        result = {key: np.asarray(values) for key, values in out.items()}
+        result['surcharged'] = np.asarray(surcharged)
+        return result
@@ -0,0 +1,323 @@
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def to_unit_vector(lat, lon):
+    """Convert a lat/lon pair in degrees to a point on the unit sphere."""
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat, lon, precision=7):
+    """Standard base-32 geohash of a point; 7 characters is a cell of about 150 m."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def chord_to_km(chord):
+    # Straight-line distance between two unit vectors -> great-circle distance
+    return EARTH_RADIUS_KM * 2 * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(distance_km):
+    angle = min(math.pi, distance_km / EARTH_RADIUS_KM)
+    return 2 * math.sin(angle / 2)
+
+
+class StationIndex:
+    """
+    Static k-d tree over stations projected onto the unit sphere.
+
+    Euclidean (chord) distance between unit vectors grows monotonically with
+    great-circle distance, so nearest neighbours in 3D are the nearest
+    stations on the ground and no haversine is needed during the search.
+    """
+
+    def __init__(self, stations):
+        points = []
+        for station in stations:
+            try:
+                lat = float(station['lat'])
+                lon = float(station['lon'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            points.append((to_unit_vector(lat, lon), station))
+        self._size = len(points)
+        self._root = self._build(points, 0)
+
+    def __len__(self):
+        return self._size
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        vec, station = points[mid]
+        return (
+            vec,
+            station,
+            axis,
+            self._build(points[:mid], depth + 1),
+            self._build(points[mid + 1:], depth + 1),
+        )
+
+    def nearest(self, lat, lon, k=1):
+        """Return up to k (distance_km, station) pairs, closest first."""
+        if k <= 0 or self._root is None:
+            return []
+        target = to_unit_vector(lat, lon)
+        heap = []  # max-heap on squared chord via negated keys
+        counter = 0
+        # Each entry carries the squared distance to its splitting plane so
+        # branches can be skipped once k closer stations are already known
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, plane_d2 = stack.pop()
+            if node is None:
+                continue
+            if len(heap) == k and plane_d2 >= -heap[0][0]:
+                continue
+            vec, station, axis, left, right = node
+            d2 = (vec[0] - target[0]) ** 2 + (vec[1] - target[1]) ** 2 + (vec[2] - target[2]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, counter, station))
+                counter += 1
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, counter, station))
+                counter += 1
+
+            diff = target[axis] - vec[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # Push the far side first so the near side is explored first
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+
+        results = sorted((-neg_d2, c, station) for neg_d2, c, station in heap)
+        return [(chord_to_km(math.sqrt(d2)), station) for d2, _, station in results]
+
+    def within(self, lat, lon, radius_km):
+        """Return all (distance_km, station) pairs within radius_km, closest first."""
+        if self._root is None:
+            return []
+        target = to_unit_vector(lat, lon)
+        max_chord = km_to_chord(radius_km)
+        max_d2 = max_chord * max_chord
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            vec, station, axis, left, right = node
+            d2 = (vec[0] - target[0]) ** 2 + (vec[1] - target[1]) ** 2 + (vec[2] - target[2]) ** 2
+            if d2 <= max_d2:
+                found.append((d2, len(found), station))
+            diff = target[axis] - vec[axis]
+            if diff < 0 or diff * diff <= max_d2:
+                stack.append(left)
+            if diff >= 0 or diff * diff <= max_d2:
+                stack.append(right)
+        found.sort()
+        return [(chord_to_km(math.sqrt(d2)), station) for d2, _, station in found]
+
+
+class StationMatrix:
+    """
+    Station coordinates held as NumPy arrays so many query points can be
+    resolved with one vectorized haversine pass instead of one scan each.
+    """
+
+    def __init__(self, stations, province_codes):
+        self.stations = []
+        lats, lons, provinces = [], [], []
+        for station, code in zip(stations, province_codes):
+            try:
+                lat = float(station['lat'])
+                lon = float(station['lon'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.stations.append(station)
+            lats.append(lat)
+            lons.append(lon)
+            provinces.append(code)
+        self.lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+        self.lon_rad = np.radians(np.asarray(lons, dtype=np.float64))
+        self.provinces = np.asarray(provinces, dtype=object)
+        cos_phi = np.cos(self.lat_rad)
+        self.vectors = np.stack([cos_phi * np.cos(self.lon_rad), cos_phi * np.sin(self.lon_rad), np.sin(self.lat_rad)], axis=-1)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def haversine_km(self, lats, lons, columns=None):
+        """Distance matrix (points x stations) in km, optionally restricted to some station columns."""
+        lat_rad = self.lat_rad if columns is None else self.lat_rad[columns]
+        lon_rad = self.lon_rad if columns is None else self.lon_rad[columns]
+        phi1 = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+        lam1 = np.radians(np.asarray(lons, dtype=np.float64))[:, None]
+        a = (np.sin((lat_rad - phi1) / 2) ** 2
+             + np.cos(phi1) * np.cos(lat_rad) * np.sin((lon_rad - lam1) / 2) ** 2)
+        return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def nearest_positions(self, lats, lons, province_codes=None, known_provinces=(), chunk_size=1024):
+        """
+        Position in self.stations of the nearest station to every query point,
+        and its distance in km, as arrays; position -1 (distance NaN) where none.
+
+        Candidates are ranked by the dot product of unit vectors, which orders
+        them exactly like great-circle distance, so the whole search is one
+        matrix product per chunk. Points whose province is in known_provinces
+        only match stations of that province.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        positions = np.full(len(lats), -1, dtype=np.intp)
+        if not self.stations or not len(lats):
+            return positions, np.full(len(lats), np.nan)
+        phi, lam = np.radians(lats), np.radians(lons)
+        points = np.stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=-1)
+
+        groups = {None: np.arange(len(lats))}
+        if province_codes is not None:
+            codes = np.asarray(province_codes, dtype=object)
+            restricted = np.fromiter((code in known_provinces for code in codes), dtype=bool, count=len(codes))
+            groups = {None: np.flatnonzero(~restricted)}
+            for code in set(codes[restricted].tolist()):
+                groups[code] = np.flatnonzero(codes == code)
+
+        for code, point_ids in groups.items():
+            columns = None if code is None else np.flatnonzero(self.provinces == code)
+            if columns is not None and columns.size == 0:
+                continue
+            vectors = self.vectors if columns is None else self.vectors[columns]
+            for start in range(0, len(point_ids), chunk_size):
+                chunk = point_ids[start:start + chunk_size]
+                best = (points[chunk] @ vectors.T).argmax(axis=1)
+                positions[chunk] = best if columns is None else columns[best]
+
+        distances = np.full(len(lats), np.nan)
+        found = positions >= 0
+        if found.any():
+            # Exact distances for the chosen pairs only
+            phi1, lam1 = phi[found], lam[found]
+            phi2, lam2 = self.lat_rad[positions[found]], self.lon_rad[positions[found]]
+            a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lam2 - lam1) / 2) ** 2
+            distances[found] = EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        return positions, distances
+
+    def k_nearest_positions(self, lats, lons, k, chunk_size=1024):
+        """
+        Positions (points x k) of the k nearest stations to every query point,
+        closest first, and their distances in km. k is capped at len(self).
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        k = min(k, len(self.stations))
+        phi, lam = np.radians(lats), np.radians(lons)
+        points = np.stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=-1)
+        positions = np.empty((len(lats), k), dtype=np.intp)
+        for start in range(0, len(lats), chunk_size):
+            similarity = points[start:start + chunk_size] @ self.vectors.T
+            best = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(similarity, best, axis=1), axis=1)
+            positions[start:start + chunk_size] = np.take_along_axis(best, order, axis=1)
+
+        phi2, lam2 = self.lat_rad[positions], self.lon_rad[positions]
+        a = (np.sin((phi2 - phi[:, None]) / 2) ** 2
+             + np.cos(phi[:, None]) * np.cos(phi2) * np.sin((lam2 - lam[:, None]) / 2) ** 2)
+        return positions, EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def nearest_many(self, lats, lons, province_codes, known_provinces):
+        """
+        Return a (distance_km, station) pair, or None, for every query point.
+
+        Points whose province is in known_provinces only match stations of
+        that province; any other point is matched against every station.
+        """
+        positions, distances = self.nearest_positions(lats, lons, province_codes, known_provinces)
+        return [
+            None if position < 0 else (distance_km, self.stations[position])
+            for position, distance_km in zip(positions.tolist(), distances.tolist())
+        ]
+
+
+class StationGrid:
+    """
+    Uniform lat/lon grid over a station list for map-viewport queries.
+
+    Cells hold positions into the list, so results can be returned in the
+    list's own order and paged by position.
+    """
+
+    def __init__(self, stations, cell_deg=1.0):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.coords = []
+        for position, station in enumerate(stations):
+            try:
+                lat = float(station['lat'])
+                lon = float(station['lon'])
+            except (KeyError, TypeError, ValueError):
+                self.coords.append(None)
+                continue
+            self.coords.append((lat, lon))
+            self.cells.setdefault(self._cell(lat, lon), []).append(position)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Sorted positions of stations inside the box (edges included)."""
+        lo_row, lo_col = self._cell(min_lat, min_lon)
+        hi_row, hi_col = self._cell(max_lat, max_lon)
+        if (hi_row - lo_row + 1) * (hi_col - lo_col + 1) > len(self.cells):
+            # Wide boxes: walking the occupied cells is cheaper than walking the box
+            cells = [
+                members for (row, col), members in self.cells.items()
+                if lo_row <= row <= hi_row and lo_col <= col <= hi_col
+            ]
+        else:
+            cells = [
+                self.cells.get((row, col), ())
+                for row in range(lo_row, hi_row + 1)
+                for col in range(lo_col, hi_col + 1)
+            ]
+        positions = []
+        for members in cells:
+            for position in members:
+                lat, lon = self.coords[position]
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                    positions.append(position)
+        positions.sort()
+        return positions
+
+
+def build_province_indexes(stations_by_province):
+    """Build one StationIndex per province code."""
+    return {code: StationIndex(stations) for code, stations in stations_by_province.items()}
@@ -0,0 +1,116 @@
+import re
+import unicodedata
+
+# Example alias map for known station name variants
+ALIAS_MAP = {
+    'sherbrooke a': 'sherbrooke',
+    'montreal st hubert a': 'montreal st hubert',
+    'baie comeau a': 'baie comeau',
+    'lourdes de blanc sablon a': 'lourdes de blanc sablon',
+    'charlevoix (mrc)': 'charlevoix',
+    'gagnon a': 'gagnon',
+    'havre saint pierre a': 'havre saint pierre',
+    'natashquan a': 'natashquan',
+    'iles de la madeleine': 'iles de la madeleine',
+    'la pocatiere': 'la pocatiere',
+    'bagotville a': 'bagotville',
+    'roberval a': 'roberval',
+    'la baie': 'la baie',
+    'la tuque': 'la tuque',
+    'la grande riviere a': 'la grande riviere',
+    'la sarre': 'la sarre',
+    'matagami a': 'matagami',
+    'val d or': 'val d or',
+    'kuujjuaq a': 'kuujjuaq',
+    # Add more aliases here as needed
+}
+
+
+def normalize_name(name):
+    """Normalize station names for matching."""
+    if not name:
+        return ''
+    # Remove accents
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join([c for c in name if not unicodedata.combining(c)])
+    # Lowercase
+    name = name.lower()
+    # Remove extra punctuation and replace underscores/hyphens with spaces
+    name = re.sub(r'[\(\)\[\]\.\,]', '', name)
+    name = name.replace('_', ' ').replace('-', ' ')
+    # Remove trailing designators like ' a', ' b', or year spans e.g. ' (1963-1991)'
+    name = re.sub(r'\s+[ab]\b', '', name)
+    name = re.sub(r'\s*\(\d{4}.*\)', '', name)
+    # Collapse multiple spaces to one
+    name = ' '.join(name.split())
+    # Apply alias map
+    if name in ALIAS_MAP:
+        name = ALIAS_MAP[name]
+    return name
+
+
+def compact_name(name):
+    """normalize_name without spaces, so 'St. Hubert' and 'sthubert' compare equal."""
+    return normalize_name(name).replace(' ', '')
+
+
+class StationNameIndex:
+    """
+    N-gram index over normalized station names for substring and typeahead lookups.
+
+    Stations are identified by their position in the list the index was built
+    from; every gram of length 1 to NGRAM keeps a sorted posting list, so a
+    query only verifies stations that contain all of its grams.
+    """
+
+    NGRAM = 3
+
+    def __init__(self, stations, province_of):
+        self.stations = stations
+        self.names = []
+        self.provinces = []
+        self.postings = {}
+        for position, station in enumerate(stations):
+            name = compact_name(station.get('stationName') or station.get('name') or '')
+            self.names.append(name)
+            self.provinces.append(province_of(station))
+            grams = set()
+            for n in range(1, self.NGRAM + 1):
+                grams.update(name[i:i + n] for i in range(len(name) - n + 1))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(position)
+
+    def _candidates(self, query):
+        n = min(self.NGRAM, len(query))
+        grams = {query[i:i + n] for i in range(len(query) - n + 1)}
+        lists = sorted((self.postings.get(gram, []) for gram in grams), key=len)
+        if not lists or not lists[0]:
+            return []
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                return []
+        return candidates
+
+    def search(self, query, province=None, limit=10):
+        """
+        Positions of stations whose name contains the query, best first.
+
+        Exact names rank before prefixes, prefixes before other substrings,
+        and ties keep list order.
+        """
+        query = compact_name(query)
+        if not query:
+            return []
+        ranked = []
+        for position in self._candidates(query):
+            if province is not None and self.provinces[position] != province:
+                continue
+            name = self.names[position]
+            if query not in name:
+                continue
+            rank = 0 if name == query else 1 if name.startswith(query) else 2
+            ranked.append((rank, position))
+        ranked.sort()
+        return [position for _, position in ranked[:limit]]
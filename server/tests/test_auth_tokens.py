@@ -0,0 +1,209 @@
+import json
+import os
+import shutil
+
+import pytest
+from bson import ObjectId
+from flask_jwt_extended import decode_token
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/test')
+os.environ['PASSWORD_POOL_WORKERS'] = '0'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+os.environ['ENSURE_INDEXES'] = '0'
+os.environ['REFRESH_REVOCATION_SYNC_SECONDS'] = '0'
+
+import app as server  # noqa: E402
+from password_hashes import hash_password  # noqa: E402
+
+
+class Collection:
+    """The pymongo calls the auth routes make, over a list of documents."""
+
+    def __init__(self):
+        self.docs = []
+        self.unique_username = True
+
+    def _matches(self, doc, query):
+        return all(doc.get(key) == value for key, value in query.items())
+
+    def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                if projection is None:
+                    return dict(doc)
+                return {key: value for key, value in doc.items() if key == '_id' or key in projection}
+        return None
+
+    def insert_one(self, doc):
+        if self.unique_username and any(d.get('username') == doc.get('username') for d in self.docs):
+            raise DuplicateKeyError("E11000 duplicate key error")
+        doc['_id'] = ObjectId()
+        self.docs.append(doc)
+
+    def update_one(self, query, update):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                doc.update(update.get('$set', {}))
+                return type('Result', (), {'modified_count': 1})()
+        return type('Result', (), {'modified_count': 0})()
+
+    def find(self, query, projection=None):
+        return []
+
+    def insert_many(self, docs, ordered):
+        self.docs.extend(docs)
+
+
+class Database:
+    def __init__(self):
+        self.users = Collection()
+        self.revoked_refresh_tokens = Collection()
+        self.revoked_refresh_tokens.unique_username = False
+
+
+@pytest.fixture
+def client():
+    flask_app = server.create_app()
+    server.mongo.db = Database()
+    server.invalidate_user()
+    server.mongo.db.users.docs.append({
+        '_id': ObjectId(), 'username': 'trial', 'password_hash': hash_password('pw', 'pbkdf2:sha256:1000'),
+        'role': 'user', 'trial_start': datetime.now(timezone.utc),
+    })
+    return flask_app.test_client()
+
+
+def login(client, username='trial', password='pw'):
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_refresh_tokens_are_not_access_tokens(client):
+    tokens = login(client)
+    response = client.get('/api/idf/return-periods?stationId=none', headers={'Authorization': 'Bearer ' + tokens['refreshToken']})
+    assert response.status_code == 401
+    response = client.get('/api/idf/return-periods?stationId=none', headers={'Authorization': 'Bearer ' + tokens['accessToken']})
+    assert response.status_code == 404
+
+
+def test_refresh_picks_up_entitlement_changes(client):
+    tokens = login(client)
+    user = server.mongo.db.users.docs[0]
+    user['role'] = 'admin'
+    server.invalidate_user(user['_id'])
+    response = client.post('/api/auth/refresh-token', json={'token': tokens['refreshToken']})
+    assert response.status_code == 200
+    with client.application.app_context():
+        assert decode_token(response.get_json()['accessToken'])['role'] == 'admin'
+
+
+
+def test_a_rotated_refresh_token_only_fails_itself(client):
+    tokens = login(client)
+    first = client.post('/api/auth/refresh-token', json={'token': tokens['refreshToken']})
+    # A second tab presenting the same token right after gets the same pair
+    second = client.post('/api/auth/refresh-token', json={'token': tokens['refreshToken']})
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+
+    server.ROTATED_REFRESH_TOKENS.clear()
+    late = client.post('/api/auth/refresh-token', json={'token': tokens['refreshToken']})
+    assert late.status_code == 401
+    # The rest of the user's sessions keep working
+    headers = {'Authorization': 'Bearer ' + first.get_json()['accessToken']}
+    assert client.get('/api/idf/return-periods?stationId=none', headers=headers).status_code == 404
+    other = login(client)
+    assert client.post('/api/auth/refresh-token', json={'token': other['refreshToken']}).status_code == 200
+
+def test_register_rejects_taken_names_without_the_unique_index(client):
+    server.mongo.db.users.unique_username = False
+    assert client.post('/api/register', json={'username': 'new', 'password': 'pw'}).status_code == 201
+    assert client.post('/api/register', json={'username': 'new', 'password': 'pw'}).status_code == 409
+    assert client.post('/api/register', json={'username': 'trial', 'password': 'pw'}).status_code == 409
+    assert len(server.mongo.db.users.docs) == 2
+
+
+def test_interpolated_curves_need_a_province_with_stations(client):
+    headers = {'Authorization': 'Bearer ' + login(client)['accessToken']}
+    url = '/api/idf/curves/interpolated?lat=45.42&lon=-75.69'
+    assert client.get(url + '&province=XX', headers=headers).status_code == 400
+    assert client.get(url + '&province=NU', headers=headers).status_code == 404
+    response = client.get(url + '&province=ON', headers=headers)
+    assert response.status_code == 200 and response.get_json()['stations']
+
+
+def test_interpolation_snaps_from_the_exact_site(client):
+    headers = {'Authorization': 'Bearer ' + login(client)['accessToken']}
+    # A station off the 0.01 degree grid, and a site 30 m north of it that rounds to a point about 300 m away
+    station = next(
+        station for station in server.STATIONS_DATA
+        if str(station.get('stationId')) in server.IDF_CURVES and station.get('lat') is not None
+        and abs(server.quantize(float(station['lat']) + 0.00027) - float(station['lat'])) > 0.003
+    )
+    lat, lon = float(station['lat']) + 0.00027, float(station['lon'])
+    result = client.get(f'/api/idf/curves/interpolated?lat={lat}&lon={lon}', headers=headers).get_json()
+    assert result['stations'][0]['stationId'] == str(station['stationId'])
+    assert [s['weight'] for s in result['stations']] == [1.0, 0.0, 0.0, 0.0]
+    assert result['data'] == server.IDF_CURVES[str(station['stationId'])]
+
+
+def test_revocation_cuts_off_tokens_from_earlier_seconds_only(monkeypatch):
+    monkeypatch.setattr(server.time, 'time', lambda: 1_700_000_000.7)
+    server.revoke_user_tokens('u1')
+    assert server.token_revoked({'sub': 'u1', 'iat': 1_699_999_999})
+    # A login right after the revocation, in the same second
+    assert not server.token_revoked({'sub': 'u1', 'iat': 1_700_000_000})
+    assert not server.token_revoked({'sub': 'u2', 'iat': 1})
+
+
+@pytest.fixture
+def doubled_ontario(tmp_path, monkeypatch):
+    """Reload from a copy of the Ontario data with every annual maximum and 'a' coefficient doubled."""
+    source = os.path.join(server.DATA_DIR, 'ON')
+    province = tmp_path / 'ON'
+    province.mkdir()
+    for name in os.listdir(source):
+        if name.endswith('.json'):
+            shutil.copy(os.path.join(source, name), province / name)
+    for name, field in (('annual_maxima.json', 'depths'), ('idf_coefficients.json', 'a')):
+        data = json.loads((province / name).read_text())
+        for station in data['stations'].values():
+            station[field] = [[v and 2 * v for v in row] if isinstance(row, list) else row and 2 * row
+                              for row in station[field]]
+        (province / name).write_text(json.dumps(data))
+    monkeypatch.setattr(server, 'DATA_DIR', str(tmp_path))
+    server.load_data()
+    yield
+    monkeypatch.undo()
+    server.load_data()
+
+
+def test_reloaded_data_reaches_the_lazily_loaded_tables(client, request):
+    headers = {'Authorization': 'Bearer ' + login(client)['accessToken']}
+    urls = ['/api/idf/return-periods?stationId=6010738', '/api/idf/intensity?stationIds=6010738&durations=60']
+    before = [client.get(url, headers=headers) for url in urls]
+    request.getfixturevalue('doubled_ontario')
+    after = [client.get(url, headers=headers) for url in urls]
+    for old, new in zip(before, after):
+        assert old.status_code == new.status_code == 200
+        assert old.get_json() != new.get_json()
+    assert before[0].headers.get('ETag') != after[0].headers.get('ETag')
+
+
+def test_hyetographs_leave_out_return_periods_without_a_curve(client, monkeypatch):
+    headers = {'Authorization': 'Bearer ' + login(client)['accessToken']}
+    table = [
+        {'duration': '5 min', '2': 6.7, '5': 9.3, '10': 11.0, '25': 13.2, '50': 14.8, '100': 16.4},
+        {'duration': '1 h', '2': 16.8, '5': 22.1, '10': 25.6, '25': 30.0, '50': 33.3, '100': None},
+    ]
+    monkeypatch.setitem(server.IDF_DATA, 'SPARSE', table)
+    server.station_hyetographs.cache_clear()
+    for method in server.HYETOGRAPH_METHODS:
+        response = client.get(f'/api/idf/hyetograph?stationId=SPARSE&method={method}', headers=headers)
+        assert response.status_code == 200 and b'NaN' not in response.data
+        body = response.get_json()
+        assert set(body['depths']) == set(body['intensities']) == {'2', '5', '10', '25', '50'}
+    server.station_hyetographs.cache_clear()
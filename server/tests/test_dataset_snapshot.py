@@ -0,0 +1,59 @@
+import json
+
+from data_loader import province_dirs, read_province
+from dataset_snapshot import build_snapshot, open_snapshot
+
+
+def write_province(data_dir, code, stations, idf_data):
+    province_dir = data_dir / code
+    province_dir.mkdir(parents=True)
+    (province_dir / 'master_stations_enriched_validated.json').write_text(json.dumps(stations), encoding='utf-8')
+    (province_dir / 'idf_data_by_station_corrected.json').write_text(json.dumps(idf_data), encoding='utf-8')
+
+
+def make_dataset(tmp_path):
+    data_dir = tmp_path / 'data'
+    write_province(
+        data_dir, 'ON',
+        [{'stationName': 'OTTAWA', 'province': 'ON', 'stationId': '6105976', 'lat': 45.38, 'lon': -75.72}],
+        {'6105976': [
+            {'duration': '5 min', '2': 7.1, '5': 9.5, '10': 11.0, '25': 13.0, '50': 14.5, '100': 16.0},
+            {'duration': '1 h', '2': 22.0, '5': None, '10': 33.5, '25': 38.9, '50': 42.9, '100': 46.9},
+        ]},
+    )
+    write_province(
+        data_dir, 'QC',
+        [{'name': 'montreal', 'provinceCode': 'QC', 'stationId': '7025250', 'lat': 45.47, 'lon': -73.74},
+         {'name': 'no coordinates'}],
+        {'7025250': [{'duration': '10 min', '2': 11.2, '5': 14.5, '10': 16.7, '25': 19.4, '50': 21.5, '100': 23.5}]},
+    )
+    return data_dir
+
+
+def test_snapshot_round_trips_json_sources(tmp_path):
+    data_dir = make_dataset(tmp_path)
+    snapshot_path = str(tmp_path / 'dataset.snapshot')
+    build_snapshot(str(data_dir), snapshot_path)
+
+    snapshot = open_snapshot(snapshot_path, str(data_dir))
+    assert snapshot is not None
+    assert snapshot.provinces == ['ON', 'QC']
+
+    expected_stations, expected_idf = {}, {}
+    for code, path in province_dirs(str(data_dir)):
+        province = read_province(code, path)
+        expected_stations[code] = province['stations']
+        expected_idf.update(province['idf_data'])
+    assert snapshot.stations_by_province() == expected_stations
+    assert snapshot.idf_data() == expected_idf
+    assert snapshot.arrays['idf_depths'].shape == (2, 2, 6)
+
+
+def test_stale_or_missing_snapshot_is_ignored(tmp_path):
+    data_dir = make_dataset(tmp_path)
+    snapshot_path = str(tmp_path / 'dataset.snapshot')
+    assert open_snapshot(snapshot_path, str(data_dir)) is None
+
+    build_snapshot(str(data_dir), snapshot_path)
+    (data_dir / 'ON' / 'idf_data_by_station_corrected.json').write_text('{"6105976": []}', encoding='utf-8')
+    assert open_snapshot(snapshot_path, str(data_dir)) is None
@@ -0,0 +1,30 @@
+from pymongo.errors import OperationFailure
+
+from db_indexes import INDEXES, ensure_indexes
+
+
+class Collection:
+    def __init__(self, name, created):
+        self.name = name
+        self.created = created
+
+    def create_index(self, keys, **options):
+        if self.name == 'users':
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+        self.created.append((self.name, keys, options))
+
+
+class Database:
+    def __init__(self):
+        self.created = []
+
+    def __getitem__(self, name):
+        return Collection(name, self.created)
+
+
+def test_ensure_indexes_reports_duplicates_and_carries_on():
+    db = Database()
+    report = ensure_indexes(db)
+    assert report['users']['username_unique'].startswith('duplicate keys')
+    assert report['revoked_refresh_tokens'] == {'expires_at_ttl': 'ok', 'revoked_at': 'ok'}
+    assert len(db.created) == len(INDEXES['revoked_refresh_tokens'])
@@ -0,0 +1,27 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from free_access import entitlement_claims, has_trial_access, is_trial_active, trial_end
+
+
+def test_trial_end_accepts_strings_and_naive_datetimes():
+    start = datetime(2024, 1, 1)
+    assert trial_end({'trial_start': start}) == datetime(2024, 1, 8, tzinfo=timezone.utc)
+    assert trial_end({'trial_start': '2024-01-01T00:00:00', 'trial_duration_days': 30}) == datetime(2024, 1, 31, tzinfo=timezone.utc)
+    assert trial_end({}) is None
+    assert not is_trial_active({'trial_start': start})
+
+
+def test_claims_decide_like_the_user_document():
+    active = {'role': 'user', 'trial_start': datetime.now(timezone.utc)}
+    expired = {'role': 'user', 'trial_start': datetime.now(timezone.utc) - timedelta(days=30)}
+    admin = {'role': 'admin'}
+    for user in (active, expired, admin):
+        claims = entitlement_claims(user)
+        assert has_trial_access(claims=claims) == has_trial_access(user)
+    assert entitlement_claims(admin) == {'role': 'admin', 'trial_end': None}
+    assert entitlement_claims(active)['trial_end'] > time.time()
+
+
+def test_tokens_without_claims_fall_back_to_the_user():
+    assert has_trial_access({'role': 'admin'}, claims={'sub': 'abc'})
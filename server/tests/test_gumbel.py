@@ -0,0 +1,68 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from eccc_parser import parse_eccc_file
+from gumbel import GumbelEngine, fit_moments, frequency_factors, parse_return_periods
+
+BIG_TROUT_LAKE = os.path.join(
+    os.path.dirname(__file__), '..', 'data', 'ON', 'ON_txt_files',
+    'idf_v3-30_2022_10_31_601_ON_6010738_BIG_TROUT_LAKE.txt',
+)
+
+
+def engine_for(path, station_id):
+    station = parse_eccc_file(path)
+    table = station['table1']
+    loads = []
+
+    def load_series():
+        loads.append(1)
+        return {station_id: (table['durations'], table['years'], table['depths'])}
+    return GumbelEngine(load_series), station, loads
+
+
+def test_frequency_factors():
+    # K_T used by the method of moments for T = 2 and 100 years
+    assert frequency_factors([2, 100]).round(4).tolist() == [-0.1643, 3.1367]
+
+
+def test_fit_moments_skips_missing_years_and_short_columns():
+    depths = np.array([[1.0, 5.0], [3.0, math.nan], [math.nan, math.nan]])
+    mean, std, n = fit_moments(depths)
+    assert mean[0] == 2.0 and std[0] == pytest.approx(math.sqrt(2))
+    assert n.tolist() == [2, 1]
+    assert math.isnan(mean[1]) and math.isnan(std[1])
+
+
+def test_refit_reproduces_table_2a():
+    engine, station, _ = engine_for(BIG_TROUT_LAKE, '6010738')
+    table = engine.return_period_table('6010738', [2, 5, 10, 25, 50, 100])
+    published = station['table2a']['depths']
+    refit = np.array([[row[key] for key in ('2', '5', '10', '25', '50', '100')] for row in table['depths']])
+    assert np.abs(refit - published).max() <= 0.051
+    first = table['intensities'][0]
+    assert first['duration'] == 5
+    assert first['2'] == pytest.approx(table['depths'][0]['2'] * 12)
+
+
+def test_engine_serves_any_return_period_and_caches_parameters():
+    engine, _, loads = engine_for(BIG_TROUT_LAKE, '6010738')
+    table = engine.return_period_table('6010738', [20, 200, 500])
+    row = table['depths'][0]
+    assert set(row) == {'duration', '20', '200', '500'}
+    assert row['20'] < row['200'] < row['500']
+    assert table['years'][0] == {'duration': 5, 'years': 25}
+
+    assert engine.params('6010738') is engine.params('6010738')
+    assert engine.return_period_table('missing', [2]) is None
+    assert len(loads) == 1
+
+
+def test_parse_return_periods():
+    assert parse_return_periods('500, 2,20,2') == [2.0, 20.0, 500.0]
+    for bad in ('', '1', '0.5', 'abc', 'inf', ','.join(str(t) for t in range(2, 60))):
+        with pytest.raises(ValueError):
+            parse_return_periods(bad)
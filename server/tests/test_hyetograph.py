@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from hyetograph import METHODS, build_hyetographs, depth_table, interpolate_depths, validate_storm
+
+TABLE = [
+    {'duration': '1 h', '2': 16.8, '5': 22.1, '10': 25.6, '25': 30.0, '50': 33.3, '100': 36.6},
+    {'duration': '5 min', '2': 6.7, '5': 9.3, '10': 11.0, '25': 13.2, '50': 14.8, '100': None},
+    {'duration': '30 min', '2': 14.4, '5': 19.7, '10': 23.2, '25': 27.6, '50': 30.9, '100': 34.2},
+    {'duration': '24 h', '2': 41.1, '5': 54.5, '10': 63.4, '25': 74.7, '50': 83.0, '100': 91.3},
+]
+
+
+def test_depth_table_sorts_durations_and_marks_missing():
+    minutes, depths = depth_table(TABLE)
+    assert minutes.tolist() == [5, 30, 60, 1440]
+    assert depths.shape == (4, 6)
+    assert np.isnan(depths[0, 5])
+
+
+def test_interpolate_depths_hits_tabulated_points():
+    minutes, depths = depth_table(TABLE)
+    values = interpolate_depths(minutes, depths, [30, 60, 45])
+    assert values[0].tolist() == pytest.approx(depths[1].tolist())
+    assert values[1].tolist() == pytest.approx(depths[2].tolist())
+    assert (values[1] > values[2]).all() and (values[2] > values[0]).all()
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_hyetographs_cover_the_storm(method):
+    times, depths = build_hyetographs(TABLE, method, 60, 5)
+    assert times.tolist() == list(range(5, 65, 5))
+    assert depths.shape == (12, 6)
+    assert (depths >= 0).all()
+    if method != 'chicago':
+        # Chicago totals follow its power-law fit; the others reproduce the table
+        assert depths.sum(axis=0).tolist() == pytest.approx([16.8, 22.1, 25.6, 30.0, 33.3, 36.6])
+    assert 4 <= int(np.argmax(depths[:, 0])) <= 6
+
+
+def test_alternating_block_puts_the_five_minute_depth_first_in_the_middle():
+    _, depths = build_hyetographs(TABLE, 'alternating_block', 60, 5)
+    assert depths[5, 0] == pytest.approx(6.7)
+    assert depths[6, 0] >= depths[4, 0] >= depths[7, 0]
+
+
+def test_validate_storm():
+    validate_storm(1440, 60)
+    for duration, time_step in ((4, 1), (1441, 1), (60, 7), (60, 0), (60, 61)):
+        with pytest.raises(ValueError):
+            validate_storm(duration, time_step)
@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+import pytest
+
+from idf_equation import IDFEquation
+
+
+def make_equation():
+    loads = []
+
+    def load():
+        loads.append(1)
+        a = np.array([[16.2, 36.9], [20.0, math.nan]])
+        b = np.array([[-0.69, -0.702], [-0.7, -0.7]])
+        return ['2', '100'], ['6010738', '123'], a, b
+    return IDFEquation(load), loads
+
+
+def test_intensities_broadcast_over_stations_durations_and_return_periods():
+    equation, loads = make_equation()
+    result = equation.intensities(['6010738', '123'], [60, 120, 17], ['100', '2'])
+    assert result.shape == (2, 3, 2)
+    assert result[0, 0].tolist() == [36.9, 16.2]
+    assert result[0, 1, 1] == pytest.approx(16.2 * 2 ** -0.69)
+    assert result[1, 2, 1] == pytest.approx(20.0 * (17 / 60) ** -0.7)
+    assert math.isnan(result[1, 0, 0])
+    assert len(loads) == 1
+
+
+def test_intensities_reject_unknown_inputs():
+    equation, _ = make_equation()
+    with pytest.raises(KeyError):
+        equation.intensities(['missing'], [60], ['2'])
+    with pytest.raises(KeyError):
+        equation.intensities(['123'], [60], ['20'])
+    for durations in ([1], [1441], ['abc'], [None]):
+        with pytest.raises(ValueError):
+            equation.intensities(['123'], durations, ['2'])
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+
+from idf_raster import build_raster, open_raster, read_idf_stations
+from idw import blend, inverse_distance_weights
+from spatial_index import StationMatrix
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+BOUNDS = (44.0, -80.0, 46.0, -74.0)
+
+
+@pytest.fixture(scope='module')
+def raster_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('raster') / 'idf_raster.grid')
+    build_raster(DATA_DIR, path, step=0.5, k=3, bounds=BOUNDS)
+    return path
+
+
+def test_raster_cells_hold_the_idw_blend_at_their_centre(raster_path):
+    raster = open_raster(raster_path, data_dir=DATA_DIR)
+    assert raster.depths.shape == (4, 12, 9, 6)
+    (row, col), depths = raster.point(45.4, -75.7)
+    assert (row, col) == (2, 8)
+    lat, lon = raster.cell_center(row, col)
+    assert (lat, lon) == (45.25, -75.75)
+
+    lats, lons, station_depths = read_idf_stations(DATA_DIR)
+    matrix = StationMatrix([{'lat': a, 'lon': b} for a, b in zip(lats, lons)], [None] * len(lats))
+    positions, distances = matrix.k_nearest_positions([lat], [lon], 3)
+    expected, _ = blend(station_depths[positions], inverse_distance_weights(distances))
+    assert np.allclose(depths, expected[0], rtol=1e-6)
+
+
+def test_raster_point_and_tile_bounds(raster_path):
+    raster = open_raster(raster_path, data_dir=DATA_DIR)
+    assert raster.point(43.9, -75.0) is None
+    assert raster.point(45.0, -73.9) is None
+    assert raster.point(float('nan'), -76.0) is None
+    assert raster.point(45.0, float('-inf')) is None
+    row0, col0, tile = raster.tile(44.6, -79.0, 45.4, -77.2, 4, 2)
+    assert (row0, col0) == (1, 2)
+    assert tile.shape == (2, 4)
+    assert tile[0, 0] == raster.depths[1, 2, 4, 2]
+    assert raster.tile(40, -90, 50, -70, 0, 0, stride=2)[2].shape == (2, 6)
+    with pytest.raises(ValueError):
+        raster.tile(50, -70, 51, -69, 0, 0)
+    for bounds in ((float('-inf'), -79.0, 45.4, -77.2), (44.6, float('nan'), 45.4, -77.2)):
+        with pytest.raises(ValueError):
+            raster.tile(*bounds, 0, 0)
+
+
+def test_stale_or_missing_raster_is_ignored(raster_path, tmp_path):
+    assert open_raster(str(tmp_path / 'missing.grid'), data_dir=DATA_DIR) is None
+    assert open_raster(raster_path, fingerprint='other data') is None
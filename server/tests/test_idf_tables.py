@@ -0,0 +1,27 @@
+import json
+
+from idf_tables import build_curve_tables, build_intensity_curve, duration_to_minutes
+
+
+def test_duration_to_minutes():
+    assert duration_to_minutes('5 min') == 5
+    assert duration_to_minutes('1 h') == 60
+    assert duration_to_minutes('0.5 h') == 30
+    assert duration_to_minutes(None) is None
+
+
+def test_build_intensity_curve_sorts_and_skips_missing():
+    table = [
+        {'duration': '1 h', '2': 20.0, '5': None},
+        {'duration': '30 min', '2': 10.0, '5': 'bad'},
+        {'duration': '0 min', '2': 1.0},
+        {'duration': '2 h', '2': None},
+    ]
+    curve = build_intensity_curve(table)
+    assert curve == [{'duration': 30, '2': 20.0}, {'duration': 60, '2': 20.0}]
+
+
+def test_build_curve_tables_serializes_payload():
+    curves, curves_json = build_curve_tables({'123': [{'duration': '15 min', '10': 5.0}], '456': []})
+    assert list(curves) == ['123']
+    assert json.loads(curves_json['123']) == {'data': [{'duration': 15, '10': 20.0}]}
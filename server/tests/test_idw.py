@@ -0,0 +1,28 @@
+import pytest
+
+from idw import blend_curves, inverse_distance_weights, quantize
+
+NEAR = [{'duration': 5, '2': 100.0, '10': 150.0}, {'duration': 60, '2': 20.0, '10': 30.0}]
+FAR = [{'duration': 5, '2': 60.0, '10': 90.0, '100': 120.0}, {'duration': 60, '2': 10.0, '10': 15.0}]
+
+
+def test_weights_fall_off_with_distance_and_snap_to_a_station():
+    assert inverse_distance_weights([10, 20]).tolist() == pytest.approx([0.8, 0.2])
+    assert inverse_distance_weights([10, 20], power=1).tolist() == pytest.approx([2 / 3, 1 / 3])
+    assert inverse_distance_weights([30, 0.01, 0.0]).tolist() == [0.0, 1.0, 0.0]
+
+
+def test_blend_curves_keeps_the_curve_layout():
+    rows, weights = blend_curves([NEAR, FAR], [10, 20])
+    assert weights.tolist() == pytest.approx([0.8, 0.2])
+    assert [row['duration'] for row in rows] == [5, 60]
+    assert rows[0]['2'] == pytest.approx(0.8 * 100 + 0.2 * 60)
+    assert rows[1]['10'] == pytest.approx(0.8 * 30 + 0.2 * 15)
+    # Only the far station has a 100-year value, so it is used as is
+    assert rows[0]['100'] == pytest.approx(120.0)
+    assert '100' not in rows[1]
+
+
+def test_quantize_groups_nearby_clicks():
+    assert quantize(45.40049) == quantize(45.4) == 45.4
+    assert quantize(-75.706) == -75.71
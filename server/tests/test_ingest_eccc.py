@@ -0,0 +1,139 @@
+import json
+import math
+import os
+import shutil
+
+from eccc_parser import from_json, idf_rows, parse_eccc_file, to_json
+from data_loader import read_annual_maxima, read_idf_coefficients
+from ingest_eccc import ingest
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+BIG_TROUT_LAKE = os.path.join(DATA_DIR, 'ON', 'ON_txt_files', 'idf_v3-30_2022_10_31_601_ON_6010738_BIG_TROUT_LAKE.txt')
+DURATIONS = ['5 min', '10 min', '15 min', '30 min', '1 h', '2 h', '6 h', '12 h', '24 h']
+
+
+def test_parse_eccc_file_reads_header():
+    station = parse_eccc_file(BIG_TROUT_LAKE)
+    assert (station['stationName'], station['province'], station['stationId']) == ('BIG TROUT LAKE', 'ON', '6010738')
+    assert round(station['lat'], 4) == 53.8333
+    assert round(station['lon'], 4) == -89.8667
+    assert station['elevation'] == 224.0
+    assert (station['first_year'], station['last_year'], station['years_of_record']) == (1967, 1992, 25)
+
+
+def test_parse_eccc_file_reads_all_tables():
+    station = parse_eccc_file(BIG_TROUT_LAKE)
+
+    table1 = station['table1']
+    assert table1['durations'] == DURATIONS
+    assert table1['depths'].shape == (26, 9)
+    assert table1['years'][0] == 1967 and table1['years'][-1] == 1992
+    assert table1['depths'][0].tolist() == [4.1, 5.3, 7.9, 14.0, 19.3, 22.4, 27.2, 28.7, 28.7]
+    assert math.isnan(table1['depths'][14, 0])  # 1981, -99.9 in the file
+    assert table1['n_years'].tolist() == [25, 25, 25, 25, 26, 26, 26, 26, 26]
+    assert table1['kurtosis'][-1] == 4.44
+
+    assert station['table2a']['durations'] == DURATIONS
+    assert station['table2a']['depths'][0].tolist() == [6.7, 9.3, 11.0, 13.2, 14.8, 16.4]
+    assert station['table2b']['rates'][0].tolist() == [80.6, 111.7, 132.3, 158.3, 177.6, 196.8]
+    assert station['table2b']['confidence'][-1].tolist() == [0.2, 0.4, 0.5, 0.7, 0.8, 1.0]
+    assert station['table3']['coefficient_a'].tolist() == [16.2, 21.7, 25.4, 30.0, 33.5, 36.9]
+    assert station['table3']['exponent_b'][0] == -0.69
+    assert station['table3']['mean_error_pct'][-1] == 6.0
+
+
+def test_parse_eccc_file_round_trips_through_json():
+    station = parse_eccc_file(BIG_TROUT_LAKE)
+    rows = idf_rows(from_json(json.loads(json.dumps(to_json(station)))))
+    assert rows == idf_rows(station)
+    assert [row['duration'] for row in rows] == DURATIONS
+    assert rows[0] == {'duration': '5 min', '2': 6.7, '5': 9.3, '10': 11.0, '25': 13.2, '50': 14.8, '100': 16.4}
+
+
+def test_overflowed_columns_are_missing(tmp_path):
+    lines = open(BIG_TROUT_LAKE, encoding='latin-1').read().replace(
+        'Skew.   0.55   0.81', 'Skew. -99.90*******'
+    )
+    path = tmp_path / 'overflow.txt'
+    path.write_text(lines, encoding='latin-1')
+    skew = parse_eccc_file(str(path))['table1']['skew']
+    assert math.isnan(skew[0]) and math.isnan(skew[1]) and skew[2] == 0.99
+
+
+def make_province(tmp_path):
+    data_dir = tmp_path / 'data'
+    txt_dir = data_dir / 'ON' / 'ON_txt_files'
+    txt_dir.mkdir(parents=True)
+    shutil.copy(BIG_TROUT_LAKE, txt_dir)
+    (txt_dir / 'notes.txt').write_text('not an ECCC file\n', encoding='utf-8')
+    (data_dir / 'ON' / 'master_stations_enriched_validated.json').write_text(json.dumps(
+        [{'stationName': 'BIG TROUT LAKE', 'province': 'ON', 'stationId': '6010738', 'lat': 53.83, 'lon': -89.87}]
+    ), encoding='utf-8')
+    curated = [{'duration': '5 min', '2': 1.0, '5': 2.0, '10': 3.0, '25': 4.0, '50': 5.0, '100': 6.0}]
+    (data_dir / 'ON' / 'idf_data_by_station_corrected.json').write_text(json.dumps({'CURATED1': curated}), encoding='utf-8')
+    (data_dir / 'ON' / 'idf_data_by_station.json').write_text(json.dumps({'PRECIP': curated}), encoding='utf-8')
+    return data_dir
+
+
+def test_ingest_merges_tables_and_keeps_curated_entries(tmp_path):
+    data_dir = make_province(tmp_path)
+    assert ingest(str(data_dir), workers=1) == {}
+
+    corrected = json.loads((data_dir / 'ON' / 'idf_data_by_station_corrected.json').read_text(encoding='utf-8'))
+    assert set(corrected) == {'CURATED1', '6010738'}
+    assert corrected['6010738'] == idf_rows(parse_eccc_file(BIG_TROUT_LAKE))
+    raw = json.loads((data_dir / 'ON' / 'idf_data_by_station.json').read_text(encoding='utf-8'))
+    assert list(raw) == ['PRECIP', '2022_10_31_601_ON_6010738_BIG_TROUT_LAKE']
+
+    durations, years, depths = read_annual_maxima(str(data_dir))['6010738']
+    table1 = parse_eccc_file(BIG_TROUT_LAKE)['table1']
+    assert durations == DURATIONS
+    assert years.tolist() == table1['years'].tolist()
+    assert depths.shape == (26, 9)
+    assert math.isnan(depths[14, 0]) and depths[0, 0] == 4.1
+
+    return_periods, station_ids, a, b = read_idf_coefficients(str(data_dir))
+    assert return_periods == ['2', '5', '10', '25', '50', '100']
+    assert station_ids == ['6010738']
+    assert a[0].tolist() == [16.2, 21.7, 25.4, 30.0, 33.5, 36.9]
+    assert b[0, 0] == -0.69
+
+
+def test_ingest_only_reparses_changed_files(tmp_path, capsys):
+    data_dir = make_province(tmp_path)
+    ingest(str(data_dir), workers=1)
+    capsys.readouterr()
+
+    ingest(str(data_dir), workers=1)
+    assert 'Parsed 0 of 2 files' in capsys.readouterr().out
+
+    with open(data_dir / 'ON' / 'ON_txt_files' / 'notes.txt', 'a', encoding='utf-8') as f:
+        f.write('edited\n')
+    ingest(str(data_dir), workers=1)
+    assert 'Parsed 1 of 2 files' in capsys.readouterr().out
+
+
+def test_ingest_reports_unmatched_files_and_keeps_existing_stations(tmp_path, capsys):
+    data_dir = make_province(tmp_path)
+    ingest(str(data_dir), workers=1)
+    province = data_dir / 'ON'
+    # A file kept under the key it already had, and a station no text file provides any more
+    raw = json.loads((province / 'idf_data_by_station.json').read_text(encoding='utf-8'))
+    raw['idf_v3-30_2022_10_31_601_ON_6010738_BIG_TROUT_LAKE'] = raw.pop('2022_10_31_601_ON_6010738_BIG_TROUT_LAKE')
+    (province / 'idf_data_by_station.json').write_text(json.dumps(raw), encoding='utf-8')
+    for name in ('annual_maxima.json', 'idf_coefficients.json'):
+        data = json.loads((province / name).read_text(encoding='utf-8'))
+        data['stations']['OLD1'] = data['stations']['6010738']
+        (province / name).write_text(json.dumps(data), encoding='utf-8')
+    (province / 'master_stations_enriched_validated.json').write_text('[]', encoding='utf-8')
+    capsys.readouterr()
+
+    unmatched = ingest(str(data_dir), workers=1, force=True)
+    assert unmatched == {'ON': ['idf_v3-30_2022_10_31_601_ON_6010738_BIG_TROUT_LAKE.txt (BIG TROUT LAKE, 6010738)']}
+    assert 'ERROR: 1 ON files match no station' in capsys.readouterr().out
+    raw = json.loads((province / 'idf_data_by_station.json').read_text(encoding='utf-8'))
+    assert set(raw) == {'PRECIP', 'idf_v3-30_2022_10_31_601_ON_6010738_BIG_TROUT_LAKE'}
+    corrected = json.loads((province / 'idf_data_by_station_corrected.json').read_text(encoding='utf-8'))
+    assert set(corrected) == {'CURATED1', '6010738'}
+    assert set(read_annual_maxima(str(data_dir))) == {'6010738', 'OLD1'}
+    assert read_idf_coefficients(str(data_dir))[1] == ['6010738', 'OLD1']
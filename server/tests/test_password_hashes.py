@@ -0,0 +1,140 @@
+import base64
+import time
+
+import bcrypt
+import pytest
+import scrypt
+from bson import ObjectId
+from werkzeug.security import generate_password_hash
+
+from migrate_password_hashes import migrate, plan_update
+from password_hashes import (
+    DEFAULT_METHOD, canonical_hash, check_password, hash_password, hash_scheme, method_prefix, needs_rehash,
+)
+
+SALT = b'0123456789abcdef'
+KEY = scrypt.hash('hunter2', SALT, N=1024, r=8, p=1, buflen=64)
+SCRYPT_BASE64 = f"scrypt:1024:8:1${base64.b64encode(SALT).decode()}${base64.b64encode(KEY).decode()}"
+LEGACY_KEY = scrypt.hash('hunter2', SALT, N=32768, r=8, p=1, buflen=64)
+SCRYPT_LEGACY = f"scrypt:$32768:8:1${base64.b64encode(SALT).decode()}${base64.b64encode(LEGACY_KEY).decode()}"
+HASHES = {
+    'pbkdf2': generate_password_hash('hunter2', method='pbkdf2:sha256:1000'),
+    'bcrypt': bcrypt.hashpw(b'hunter2', bcrypt.gensalt(rounds=4)).decode('utf-8'),
+    'scrypt': generate_password_hash('hunter2', method='scrypt:1024:8:1'),
+    'scrypt-base64': SCRYPT_BASE64,
+    'scrypt-legacy': SCRYPT_LEGACY,
+}
+
+
+@pytest.mark.parametrize('scheme', sorted(HASHES))
+def test_every_stored_layout_is_recognized_and_checked(scheme):
+    assert hash_scheme(HASHES[scheme]) == scheme
+    assert check_password('hunter2', HASHES[scheme])
+    assert not check_password('wrong', HASHES[scheme])
+
+
+def test_canonical_hash_only_rewrites_the_legacy_scrypt_layout():
+    canonical = canonical_hash(SCRYPT_LEGACY)
+    assert canonical.startswith('scrypt:32768:8:1$') and hash_scheme(canonical) == 'scrypt-base64'
+    assert check_password('hunter2', canonical)
+    assert canonical_hash(HASHES['bcrypt']) == HASHES['bcrypt']
+
+
+def test_needs_rehash_compares_against_the_method_parameters():
+    assert method_prefix('scrypt') == 'scrypt:32768:8:1'
+    assert not needs_rehash(HASHES['pbkdf2'], 'pbkdf2:sha256:1000')
+    assert needs_rehash(HASHES['pbkdf2'], 'pbkdf2:sha256')
+    assert needs_rehash(HASHES['bcrypt'], 'pbkdf2:sha256:1000')
+    assert needs_rehash(None)
+    with pytest.raises(ValueError):
+        method_prefix('argon2')
+
+
+
+def test_default_method_stays_within_the_login_budget():
+    # Work and memory of the target: no more than the scrypt hashes users already have
+    assert method_prefix(DEFAULT_METHOD) == 'scrypt:32768:8:1'
+    assert not needs_rehash(canonical_hash(SCRYPT_LEGACY))
+
+    def median_seconds(check, runs=3):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            check()
+            times.append(time.perf_counter() - start)
+        return sorted(times)[runs // 2]
+
+    # Measured against bcrypt cost 10 on the same machine: about 1.4 times, where the 1,000,000
+    # iteration pbkdf2 default was about 6 times
+    target = hash_password('hunter2')
+    bcrypt_10 = bcrypt.hashpw(b'hunter2', bcrypt.gensalt(rounds=10))
+    assert median_seconds(lambda: check_password('hunter2', target)) < 3 * median_seconds(
+        lambda: bcrypt.checkpw(b'hunter2', bcrypt_10))
+
+class Users:
+    """Just the collection calls migrate() makes, over a list of documents."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.bulk_writes = 0
+
+    def _match(self, query):
+        bound = query.get('_id', {}).get('$gt')
+        return [doc for doc in sorted(self.docs, key=lambda d: d['_id']) if bound is None or doc['_id'] > bound]
+
+    def count_documents(self, query):
+        return len(self._match(query))
+
+    def find(self, query, projection, **kwargs):
+        users = self
+
+        class Cursor(list):
+            def sort(self, *args):
+                return self
+
+            def batch_size(self, n):
+                return self
+
+            def close(self):
+                pass
+
+        return Cursor(dict(doc) for doc in users._match(query))
+
+    def bulk_write(self, operations, ordered):
+        self.bulk_writes += 1
+        modified = 0
+        for op in operations:
+            doc = next(d for d in self.docs if d['_id'] == op._filter['_id'])
+            doc.update(op._doc['$set'])
+            for field in op._doc.get('$unset', {}):
+                doc.pop(field, None)
+            modified += 1
+        return type('Result', (), {'modified_count': modified})()
+
+
+def test_migration_normalizes_in_batches_and_resumes(tmp_path):
+    docs = [
+        {'_id': ObjectId(), 'password_hash': SCRYPT_LEGACY},
+        {'_id': ObjectId(), 'password': HASHES['bcrypt']},
+        {'_id': ObjectId(), 'password_hash': HASHES['pbkdf2']},
+    ]
+    assert plan_update(docs[2]) is None
+    users = Users(docs)
+    state_path = str(tmp_path / 'state.json')
+
+    # Stop after the first batch, as if the run had been interrupted
+    lines = []
+    def interrupt(line):
+        lines.append(line)
+        if len(lines) == 1:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        migrate(users, batch_size=2, state_path=state_path, log=interrupt)
+    assert docs[0]['password_hash'] == canonical_hash(SCRYPT_LEGACY)
+    assert docs[1]['password_hash'] == HASHES['bcrypt'] and 'password' not in docs[1]
+
+    state = migrate(users, batch_size=2, state_path=state_path, resume=True, log=lines.append)
+    assert lines[1].startswith('Resuming after')
+    assert (state['processed'], state['updated'], users.bulk_writes) == (3, 2, 1)
+    # The normalized legacy hash already has the target's scrypt parameters
+    assert state['schemes']['scrypt-base64'] == 1 and state['schemes']['awaiting rehash on login'] == 2
@@ -0,0 +1,67 @@
+import bcrypt
+import pytest
+from werkzeug.security import generate_password_hash
+
+from password_hashes import check_password
+from password_pool import PasswordPool, PasswordPoolBusy
+
+PBKDF2 = generate_password_hash('hunter2', method='pbkdf2:sha256:1000')
+BCRYPT = bcrypt.hashpw(b'hunter2', bcrypt.gensalt(rounds=4)).decode('utf-8')
+
+
+def test_check_password_handles_each_hash_format():
+    assert check_password('hunter2', PBKDF2)
+    assert check_password('hunter2', BCRYPT)
+    assert not check_password('wrong', BCRYPT)
+    assert not check_password('hunter2', 'scrypt:32768:8:1$broken')
+    assert not check_password('hunter2', None)
+
+
+def test_pool_verifies_in_worker_processes():
+    pool = PasswordPool(workers=1, max_queued=1)
+    try:
+        assert pool.verify('hunter2', PBKDF2)
+        assert not pool.verify('wrong', PBKDF2)
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert (stats['completed'], stats['in_flight'], stats['rejected']) == (2, 0, 0)
+    assert stats['latency']['max_ms'] >= stats['compute']['max_ms']
+
+
+def test_pool_rejects_checks_beyond_the_cap():
+    pool = PasswordPool(workers=0, max_queued=1)
+    # Occupy both slots as if two checks were already running
+    assert pool._slots.acquire(blocking=False) and pool._slots.acquire(blocking=False)
+    with pytest.raises(PasswordPoolBusy):
+        pool.verify('hunter2', PBKDF2)
+    pool._slots.release()
+    assert pool.verify('hunter2', PBKDF2)
+    assert pool.stats()['rejected'] == 1
+
+
+def test_timed_out_checks_keep_their_slot_until_done():
+    pool = PasswordPool(workers=1, max_queued=0, timeout=0.0001)
+    slow = bcrypt.hashpw(b'hunter2', bcrypt.gensalt(rounds=12)).decode('utf-8')
+    try:
+        with pytest.raises(PasswordPoolBusy):
+            pool.verify('hunter2', slow)
+        assert pool.stats()['timeouts'] == 1
+        with pytest.raises(PasswordPoolBusy, match='in progress'):
+            pool.verify('hunter2', PBKDF2)
+    finally:
+        pool.shutdown()
+
+
+def test_pool_checks_inline_when_workers_cannot_start(monkeypatch):
+    pool = PasswordPool(workers=1, max_queued=0)
+
+    class NoProcesses:
+        def submit(self, *args):
+            raise OSError("process creation not permitted")
+
+    monkeypatch.setattr(pool, '_get_executor', lambda: NoProcesses())
+    assert pool.verify('hunter2', PBKDF2)
+    assert not pool.verify('wrong', PBKDF2)
+    stats = pool.stats()
+    assert (stats['completed'], stats['errors'], stats['in_flight']) == (2, 2, 0)
@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+import pytest
+
+from hyetograph import depth_table, interpolate_depths
+from rational import IntensityTable, parse_catchments, peak_flows, validate_catchments
+
+TABLE = [
+    {'duration': '5 min', '2': 6.7, '5': 9.3, '10': 11.0, '25': 13.2, '50': 14.8, '100': 16.4},
+    {'duration': '10 min', '2': 9.4, '5': 13.0, '10': 15.3, '25': 18.3, '50': 20.5, '100': 22.7},
+    {'duration': '30 min', '2': 14.4, '5': 19.7, '10': 23.2, '25': 27.6, '50': 30.9, '100': None},
+    {'duration': '1 h', '2': 16.8, '5': 22.1, '10': 25.6, '25': 30.0, '50': 33.3, '100': 36.6},
+    {'duration': '24 h', '2': 41.1, '5': 54.5, '10': 63.4, '25': 74.7, '50': 83.0, '100': 91.3},
+]
+STATIONS = [{'stationId': 'A'}, {'stationId': 'B'}]
+
+
+def make_table():
+    return IntensityTable(STATIONS, lambda station: TABLE if station['stationId'] == 'A' else None)
+
+
+def test_intensities_match_the_depth_table_interpolation():
+    table = make_table()
+    tc = np.array([5.0, 10.0, 22.0, 60.0, 240.0, 1440.0])
+    columns = np.array([0, 1, 2, 3, 4, 5])
+    minutes, depths = depth_table(TABLE)
+    expected = interpolate_depths(minutes, depths, tc)[np.arange(len(tc)), columns] / (tc / 60)
+    assert table.intensities(np.zeros(len(tc), dtype=int), tc, columns).tolist() == pytest.approx(expected.tolist())
+    assert table.intensities([0], np.array([10.0]), np.array([0]))[0] == pytest.approx(9.4 * 6)
+
+
+def test_stations_without_idf_data_give_nan():
+    assert math.isnan(make_table().intensities([1], np.array([30.0]), np.array([0]))[0])
+
+
+def test_parse_catchments_accepts_rows_and_columns():
+    rows = parse_catchments({'catchments': [
+        {'lat': 45, 'lon': -75, 'c': 0.9, 'area': 2, 'tc': 15, 'returnPeriod': 10, 'id': 'lot-1'},
+        {'lat': 46, 'lon': -74, 'c': 0.5, 'area': 3, 'tc': 20, 'returnPeriod': '5'},
+    ]})
+    assert rows['returnPeriod'] == [10, '5']
+    assert rows['id'] == ['lot-1', 1]
+    assert rows['province'] == [None, None]
+
+    columns = parse_catchments({'lat': [45, 46], 'lon': [-75, -74], 'c': 0.9, 'area': [2, 3], 'tc': [15, 20],
+                                'returnPeriod': 10, 'province': 'ON'})
+    assert columns['c'].tolist() == [0.9, 0.9]
+    assert columns['province'] == ['ON', 'ON']
+    assert columns['id'] == [0, 1]
+
+    with pytest.raises(ValueError):
+        parse_catchments({'lat': [45, 46], 'lon': [-75]})
+    with pytest.raises(ValueError):
+        parse_catchments({'catchments': []})
+
+
+def test_validate_catchments_reports_the_first_problem_per_row():
+    columns = parse_catchments({'lat': [45, 95, 45, 45, 45], 'lon': [-75] * 5, 'c': [0.5, 0.5, 1.5, 0.5, 0.5],
+                                'area': [1, 1, 1, 'x', 1], 'tc': [15, 15, 15, 15, 2], 'returnPeriod': [10.0, '10', 10, [10], 7]})
+    errors, rp_columns = validate_catchments(columns)
+    assert errors[0] is None and rp_columns[0] == 2
+    assert 'latitude' in errors[1]
+    assert "'c'" in errors[2]
+    assert "'area'" in errors[3]
+    assert "'tc'" in errors[4]
+    assert rp_columns[1:].tolist() == [-1] * 4
+
+
+def test_peak_flows_use_metric_units():
+    # 1 ha of impervious ground under 36 mm/h sheds 0.1 m^3/s
+    assert peak_flows(1.0, 36.0, 1.0) == pytest.approx(0.1)
@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from bloom_filter import BloomFilter
+from refresh_tokens import RefreshTokenRevocations
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=1e-3)
+    keys = [str(uuid.uuid4()) for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10000))
+    assert false_positives < 50
+    assert bloom.stats()['bytes'] < 2000
+
+
+class Collection:
+    """The calls RefreshTokenRevocations makes, over a dict of documents."""
+
+    def __init__(self):
+        self.docs = {}
+        self.find_one_calls = 0
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def insert_many(self, docs, ordered):
+        for doc in docs:
+            self.docs.setdefault(doc['_id'], doc)
+
+    def find_one(self, query, projection):
+        self.find_one_calls += 1
+        return self.docs.get(query['_id'])
+
+    def find(self, query, projection):
+        (field, condition), = query.items()
+        (op, bound), = condition.items()
+        return [doc for doc in self.docs.values() if (doc[field] > bound if op == '$gt' else doc[field] >= bound)]
+
+
+def test_each_refresh_token_works_once():
+    collection = Collection()
+    revocations = RefreshTokenRevocations(lambda: collection, capacity=100, sync_seconds=0)
+    expires = time.time() + 3600
+    assert revocations.use('a', 'user', expires)
+    assert not revocations.use('a', 'user', expires)
+    assert revocations.use('b', 'user', expires)
+    assert collection.find_one_calls == 0
+
+    revocations.sync()
+    assert set(collection.docs) == {'a', 'b'}
+    assert revocations.stats()['pending'] == 0
+    # Written out, a replay is now confirmed against the collection
+    assert revocations.is_revoked('a') and collection.find_one_calls == 1
+
+
+def test_sync_loads_jtis_revoked_by_other_processes():
+    collection = Collection()
+    ours = RefreshTokenRevocations(lambda: collection, capacity=100, sync_seconds=0)
+    theirs = RefreshTokenRevocations(lambda: collection, capacity=100, sync_seconds=0)
+    ours.sync()
+    theirs.revoke('x', 'user', time.time() + 3600)
+    theirs.sync()
+    assert not ours.is_revoked('x')
+    ours.sync()
+    assert ours.is_revoked('x')
@@ -0,0 +1,76 @@
+import math
+
+import pytest
+
+from sewer import IntensityCurve, SewerNetwork, full_flow_capacity, required_diameter
+
+CURVE = [
+    {'duration': 5, '2': 80.4, '10': 132.0},
+    {'duration': 60, '2': 16.8, '10': 25.6},
+    {'duration': 1440, '2': 1.71, '10': 2.64},
+]
+
+
+def test_intensity_curve_interpolates_log_log():
+    curve = IntensityCurve(CURVE, '10')
+    assert curve(60) == pytest.approx(25.6)
+    assert curve(2) == pytest.approx(132.0)  # below MIN_TC_MINUTES
+    expected = math.exp(math.log(132.0) + math.log(30 / 5) / math.log(60 / 5) * math.log(25.6 / 132.0))
+    assert curve(30) == pytest.approx(expected)
+    with pytest.raises(ValueError):
+        IntensityCurve(CURVE, '100')
+
+
+def test_manning_sizing_round_trips():
+    diameter = required_diameter(0.25, 0.005, 0.013)
+    assert full_flow_capacity(diameter, 0.005, 0.013) == pytest.approx(0.25)
+
+
+def test_design_accumulates_area_and_time_downstream():
+    # A and B both drain into C, which drains to the outfall
+    nodes = [
+        {'id': 'A', 'area': 1.0, 'c': 0.5, 'inletTime': 10},
+        {'id': 'B', 'area': 2.0, 'c': 0.9, 'inletTime': 15},
+        {'id': 'C', 'area': 0.5, 'c': 0.6, 'inletTime': 5},
+    ]
+    pipes = [
+        {'id': 'CO', 'from': 'C', 'to': 'OUT', 'length': 50, 'slope': 0.01},
+        {'id': 'AC', 'from': 'A', 'to': 'C', 'length': 100, 'slope': 0.01},
+        {'id': 'BC', 'from': 'B', 'to': 'C', 'length': 100, 'slope': 0.005, 'diameter': 300},
+    ]
+    network = SewerNetwork(nodes, pipes)
+    curve = IntensityCurve(CURVE, '10')
+    design = network.design(curve)
+
+    assert network.topological_order()[-1] == 0
+    assert design['diameter'][2] == 300
+    arrival = max(10 + design['travelTime'][1], 15 + design['travelTime'][2])
+    assert design['tc'][0] == pytest.approx(arrival)
+    assert design['ca'][0] == pytest.approx(0.5 + 1.8 + 0.3)
+    assert design['area'][0] == pytest.approx(3.5)
+    assert design['flow'][0] == pytest.approx(curve(arrival) * 2.6 / 360)
+    assert design['flow'][0] <= design['capacity'][0]
+    assert design['surcharged'][2] == (design['flow'][2] > design['capacity'][2])
+    assert design['velocity'][1] == pytest.approx(design['capacity'][1] / (math.pi * (design['diameter'][1] / 1000) ** 2 / 4))
+
+
+@pytest.mark.parametrize('pipes, message', [
+    ([{'id': 1, 'from': 'a', 'to': 'b', 'length': 10, 'slope': 0.01},
+      {'id': 2, 'from': 'b', 'to': 'a', 'length': 10, 'slope': 0.01}], 'cycle'),
+    ([{'id': 1, 'from': 'a', 'to': 'b', 'length': 10, 'slope': 0.01},
+      {'id': 2, 'from': 'a', 'to': 'c', 'length': 10, 'slope': 0.01}], 'more than one pipe'),
+    ([{'id': 1, 'from': 'a', 'to': 'b', 'length': 10, 'slope': 0}], "'slope'"),
+    ([{'id': 1, 'from': 'a', 'length': 10, 'slope': 0.01}], "'from' and 'to'"),
+    ([{'id': 1, 'from': ['a'], 'to': 'b', 'length': 10, 'slope': 0.01}], "'from' and 'to'"),
+    ([{'id': {'x': 1}, 'from': 'a', 'to': 'b', 'length': 10, 'slope': 0.01}], "string or integer 'id'"),
+])
+def test_invalid_networks_are_rejected(pipes, message):
+    with pytest.raises(ValueError, match=message):
+        SewerNetwork([], pipes).topological_order()
+
+
+def test_node_ids_must_be_strings_or_integers():
+    pipes = [{'id': 1, 'from': 'a', 'to': 'b', 'length': 10, 'slope': 0.01}]
+    for node_id in ([1], {'x': 1}, True, 1.5):
+        with pytest.raises(ValueError, match="string or integer 'id'"):
+            SewerNetwork([{'id': node_id, 'area': 1, 'c': 0.5}], pipes)
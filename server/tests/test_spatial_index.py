@@ -0,0 +1,116 @@
+import math
+import random
+
+from spatial_index import StationGrid, StationIndex, StationMatrix, geohash
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin(math.radians(lat2 - lat1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def make_stations(n=500, seed=1):
+    rng = random.Random(seed)
+    return [
+        {"stationId": str(i), "lat": rng.uniform(42, 62), "lon": rng.uniform(-140, -52)}
+        for i in range(n)
+    ]
+
+
+def test_nearest_matches_brute_force():
+    stations = make_stations()
+    index = StationIndex(stations)
+    rng = random.Random(2)
+    for _ in range(50):
+        lat, lon = rng.uniform(42, 62), rng.uniform(-140, -52)
+        expected = sorted(stations, key=lambda s: haversine(lat, lon, s["lat"], s["lon"]))[:5]
+        result = index.nearest(lat, lon, k=5)
+        assert [s["stationId"] for _, s in result] == [s["stationId"] for s in expected]
+        assert math.isclose(result[0][0], haversine(lat, lon, expected[0]["lat"], expected[0]["lon"]), abs_tol=1e-6)
+
+
+def test_within_radius():
+    stations = make_stations()
+    index = StationIndex(stations)
+    lat, lon = 50.0, -100.0
+    expected = {s["stationId"] for s in stations if haversine(lat, lon, s["lat"], s["lon"]) <= 300}
+    result = index.within(lat, lon, 300)
+    assert {s["stationId"] for _, s in result} == expected
+    assert [d for d, _ in result] == sorted(d for d, _ in result)
+
+
+def test_skips_stations_without_coordinates():
+    index = StationIndex([{"stationId": "1"}, {"stationId": "2", "lat": 45.0, "lon": -75.0}])
+    assert len(index) == 1
+    assert index.nearest(45.0, -75.0)[0][1]["stationId"] == "2"
+    assert StationIndex([]).nearest(45.0, -75.0) == []
+
+
+def test_matrix_nearest_many_respects_province():
+    stations = make_stations()
+    codes = ["ON" if s["lon"] > -95 else "AB" for s in stations]
+    matrix = StationMatrix(stations, codes)
+    index = StationIndex(stations)
+    on_index = StationIndex([s for s, code in zip(stations, codes) if code == "ON"])
+
+    points = [(48.0, -80.0, None), (48.0, -100.0, "ON"), (55.0, -120.0, "XX"), (50.0, -90.0, "SK")]
+    results = matrix.nearest_many(
+        [p[0] for p in points], [p[1] for p in points], [p[2] for p in points], {"ON", "AB", "SK"}
+    )
+    assert results[0][1] is index.nearest(48.0, -80.0)[0][1]
+    assert results[1][1] is on_index.nearest(48.0, -100.0)[0][1]
+    assert math.isclose(results[1][0], on_index.nearest(48.0, -100.0)[0][0], abs_tol=1e-6)
+    assert results[2][1] is index.nearest(55.0, -120.0)[0][1]
+    # Known province without any stations yields no match rather than a fallback
+    assert results[3] is None
+
+
+def test_grid_bbox_matches_filter():
+    stations = make_stations() + [{"stationId": "nocoords"}]
+    grid = StationGrid(stations, cell_deg=2.0)
+    for box in [(-80.0, 44.0, -75.5, 47.3), (-140.0, 42.0, -52.0, 62.0), (-60.0, 60.0, -59.0, 61.0)]:
+        min_lon, min_lat, max_lon, max_lat = box
+        expected = [
+            i for i, s in enumerate(stations)
+            if "lat" in s and min_lat <= s["lat"] <= max_lat and min_lon <= s["lon"] <= max_lon
+        ]
+        assert grid.within_bbox(*box) == expected
+
+
+def test_nearest_positions_match_brute_force():
+    stations = make_stations()
+    matrix = StationMatrix(stations, ["ON" if i % 2 else "QC" for i in range(len(stations))])
+    rng = random.Random(3)
+    points = [(rng.uniform(42, 62), rng.uniform(-140, -52)) for _ in range(200)]
+    codes = [rng.choice(["ON", "QC", "MB", None]) for _ in points]
+    positions, distances = matrix.nearest_positions(
+        [lat for lat, _ in points], [lon for _, lon in points], codes, {"ON", "QC"}
+    )
+    for (lat, lon), code, position, distance_km in zip(points, codes, positions, distances):
+        candidates = [
+            i for i in range(len(stations))
+            if code not in ("ON", "QC") or matrix.provinces[i] == code
+        ]
+        expected = min(candidates, key=lambda i: haversine(lat, lon, stations[i]["lat"], stations[i]["lon"]))
+        assert position == expected
+        assert math.isclose(distance_km, haversine(lat, lon, stations[expected]["lat"], stations[expected]["lon"]), abs_tol=1e-6)
+
+
+def test_k_nearest_positions_match_the_k_d_tree():
+    stations = make_stations()
+    matrix = StationMatrix(stations, [None] * len(stations))
+    index = StationIndex(stations)
+    rng = random.Random(4)
+    points = [(rng.uniform(42, 62), rng.uniform(-140, -52)) for _ in range(100)]
+    positions, distances = matrix.k_nearest_positions([lat for lat, _ in points], [lon for _, lon in points], 5)
+    for (lat, lon), row, row_km in zip(points, positions.tolist(), distances.tolist()):
+        expected = index.nearest(lat, lon, k=5)
+        assert [stations[i]["stationId"] for i in row] == [s["stationId"] for _, s in expected]
+        assert all(math.isclose(a, d, abs_tol=1e-6) for a, (d, _) in zip(row_km, expected))
+
+
+def test_geohash():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash(45.4216, -75.6971) == geohash(45.4207, -75.6963) == "f244mkx"
+    assert len(geohash(45.4215, -75.6972, 5)) == 5
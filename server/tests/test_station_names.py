@@ -0,0 +1,34 @@
+from station_names import StationNameIndex, normalize_name
+
+
+def test_normalize_name_folds_accents_aliases_and_suffixes():
+    assert normalize_name('Montréal St-Hubert A') == 'montreal st hubert'
+    assert normalize_name('BAGOTVILLE A') == 'bagotville'
+    assert normalize_name('Île-Bizard B') == 'ile bizard'
+    assert normalize_name(None) == ''
+
+
+def make_index():
+    stations = [
+        {'stationName': 'MONTREAL JAR BOT', 'province': 'QC'},
+        {'name': 'montreal', 'province': 'QC'},
+        {'name': 'Lac-Mégantic', 'province': 'QC'},
+        {'stationName': 'OTTAWA CDA RCS', 'province': 'ON'},
+        {'stationName': 'NORTH MONTREAL RIVER', 'province': 'ON'},
+    ]
+    return StationNameIndex(stations, lambda station: station['province'])
+
+
+def test_search_ranks_exact_then_prefix_then_substring():
+    index = make_index()
+    assert index.search('Montréal') == [1, 0, 4]
+    assert index.search('montreal', province='QC') == [1, 0]
+    assert index.search('megantic') == [2]
+    assert index.search('ot') == [3, 0]
+
+
+def test_search_without_match():
+    index = make_index()
+    assert index.search('toronto') == []
+    assert index.search('  ') == []
+    assert index.search('montreal', province='AB') == []
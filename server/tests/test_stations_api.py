@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/test')
+os.environ['ENSURE_INDEXES'] = '0'
+
+import app as server  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return server.create_app().test_client()
+
+
+def test_province_codes_match_whole_words_only():
+    assert server.extract_province_code('LEONARD CS                                          NB') == 'NB'
+    assert server.extract_province_code('ANTHONY                                             NL') == 'NL'
+    assert server.extract_province_code('ON') == 'ON'
+    assert server.extract_province_code('LEONARDO') is None
+    assert server.station_province_code({'provinceCode': 'QC'}) == 'QC'
+
+
+def test_station_province_filter_keeps_other_provinces_out(client):
+    stations = client.get('/api/stations?province=ON&limit=5000').get_json()
+    ids = {station['stationId'] for station in stations['stations']}
+    assert ids and not ids & {'810I001', '8403401'}
+    stations = client.get('/api/stations?province=NB&limit=5000').get_json()
+    assert '810I001' in {station['stationId'] for station in stations['stations']}
+
+
+def test_station_cursors_page_through_every_station_once(client):
+    # Some stations share an id and name, so pages are compared with one big page, in order
+    for query in ('limit=100', 'province=QC&limit=40', 'bbox=-80,43,-60,50&limit=30'):
+        paged, cursor = [], None
+        while True:
+            page = client.get(f'/api/stations?{query}' + (f'&cursor={cursor}' if cursor else '')).get_json()
+            paged.extend(page['stations'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        whole = client.get(f'/api/stations?{query.split("limit=")[0]}limit=5000').get_json()['stations']
+        assert paged and paged == whole
+    assert whole == [s for s in client.get('/api/stations').get_json() if s in whole]
+    assert client.get('/api/stations?cursor=ON').status_code == 400
+
+
+def test_nearest_station_rejects_coordinates_off_the_globe(client):
+    for query in ('lat=inf&lon=-75.7', 'lat=nan&lon=-75.7', 'lat=45.4&lon=-181', 'lat=91&lon=-75.7'):
+        assert client.get(f'/api/nearest-station?{query}').status_code == 400
+    assert client.get('/api/nearest-station?lat=45.4&lon=-75.7').status_code == 200
+    response = client.post('/api/nearest-station/batch', json={'points': [{'lat': 45.4, 'lon': 'nan'}]})
+    assert response.status_code == 400
+
+
+def test_reloading_data_drops_memoized_results():
+    server.interpolated_curve_json(45.42, -75.69, None, 4, 2.0)
+    assert server.interpolated_candidates.cache_info().currsize
+    stations = len(server.STATIONS_DATA)
+    server.load_data()
+    assert server.interpolated_candidates.cache_info().currsize == 0
+    assert len(server.STATIONS_DATA) == len(server.STATION_ORDER_KEYS) == stations
+    assert server.station_hyetographs.cache_info().currsize == 0
+
+
+def test_station_bbox_must_be_finite(client):
+    for bbox in ('nan,0,1,1', '-inf,0,1,1', '0,0,1,inf'):
+        assert client.get(f'/api/stations?bbox={bbox}').status_code == 400
+
+
+def test_batch_rejects_non_string_province_and_city(client):
+    point = {'lat': 45.42, 'lon': -75.69}
+    for bad in ({'province': ['ON']}, {'city_name': 5}):
+        response = client.post('/api/nearest-station/batch', json={'points': [point, dict(point, **bad)]})
+        assert response.status_code == 400 and 'index 1' in response.get_json()['error']
+    response = client.post('/api/nearest-station/batch', json={'points': [dict(point, province='ON', city_name='Ottawa')]})
+    assert response.status_code == 200 and 'stationId' in response.get_json()['results'][0]
+
+
+def test_search_limit_must_be_positive(client):
+    for limit in ('0', '-1'):
+        assert client.get(f'/api/stations/search?q=ottawa&limit={limit}').status_code == 400
+    assert len(client.get('/api/stations/search?q=ottawa&limit=1').get_json()['results']) == 1